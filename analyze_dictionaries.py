@@ -4,11 +4,15 @@ Analyze what's inside the compression dictionaries
 """
 
 import json
+import sys
 import zlib
 from pathlib import Path
 from collections import Counter
 import re
 
+sys.path.append(str(Path(__file__).parent / "scripts"))
+from dictionary_builder import create_prefix_dictionary
+
 def load_analysis_data():
     """Load the analysis results"""
     data_path = Path("public/data/three_categories_analysis.json")
@@ -21,23 +25,6 @@ def load_content_file(item_id):
     with open(content_path, 'r', encoding='utf-8', errors='replace') as f:
         return f.read()
 
-def create_dictionary(content, dict_size=1024):
-    """Create a fixed-size dictionary from first 50% of content"""
-    content_bytes = content.encode('utf-8', errors='replace')
-    
-    # Use first 50% of content as dictionary source
-    dict_source_end = len(content_bytes) // 2
-    dict_source = content_bytes[:dict_source_end]
-    
-    # Ensure all dictionaries are exactly the same size
-    if len(dict_source) >= dict_size:
-        # If we have enough content, use first dict_size bytes
-        return dict_source[:dict_size]
-    else:
-        # If not enough content, pad with zeros to reach dict_size
-        padding = b'\x00' * (dict_size - len(dict_source))
-        return dict_source + padding
-
 def analyze_dictionary_bytes(dictionary):
     """Analyze the byte patterns in a dictionary"""
     # Convert back to text for analysis (lossy but informative)
@@ -117,7 +104,7 @@ def main():
             
             # Load content and create dictionary
             content = load_content_file(item_id)
-            dictionary = create_dictionary(content)
+            dictionary = create_prefix_dictionary(content)
             analysis = analyze_dictionary_bytes(dictionary)
             
             print(f"Dictionary size: {analysis['size']} bytes")
@@ -151,7 +138,7 @@ def main():
     dictionaries = {}
     for item_id in items:
         content = load_content_file(item_id)
-        dictionaries[item_id] = create_dictionary(content)
+        dictionaries[item_id] = create_prefix_dictionary(content)
     
     # Find most similar dictionary pairs
     similarities = []
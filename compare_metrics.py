@@ -3,32 +3,24 @@
 Compare the correlation between KL divergence and generalized divergence
 """
 
-import json
+import sys
 import numpy as np
 from pathlib import Path
 from scipy.stats import pearsonr, spearmanr
 
+sys.path.append(str(Path(__file__).parent / "scripts"))
+from matrix_artifact import open_results
+
 def load_analysis_data():
-    """Load the analysis results"""
-    data_path = Path("public/data/three_categories_analysis.json")
-    with open(data_path, 'r') as f:
-        return json.load(f)
+    """Load the analysis results (matrix artifact)"""
+    return open_results("public/data/three_categories_analysis.json")
 
-def extract_paired_distances(kl_matrix, gen_matrix):
-    """Extract corresponding distances from both matrices"""
-    kl_distances = []
-    gen_distances = []
-    pairs = []
-    
-    items = list(kl_matrix.keys())
-    for i, item1 in enumerate(items):
-        for j, item2 in enumerate(items):
-            if i < j:  # Only upper triangle
-                kl_dist = kl_matrix[item1][item2]
-                gen_dist = gen_matrix[item1][item2]
-                kl_distances.append(kl_dist)
-                gen_distances.append(gen_dist)
-                pairs.append((item1, item2))
+def extract_paired_distances(kl_matrix, gen_matrix, items):
+    """Extract corresponding distances from both matrices (N×N arrays over items)"""
+    upper = np.triu_indices(len(items), 1)  # Only upper triangle
+    kl_distances = kl_matrix[upper].tolist()
+    gen_distances = gen_matrix[upper].tolist()
+    pairs = [(items[i], items[j]) for i, j in zip(*upper)]
     
     return kl_distances, gen_distances, pairs
 
@@ -68,10 +60,10 @@ def get_display_name(item_id):
 def main():
     data = load_analysis_data()
     
-    kl_matrix = data['kl_analysis']['baseline']['distance_matrix']
-    gen_matrix = data['generalized_divergence_analysis']['distance_matrix']
+    kl_matrix = data.matrix('kl_analysis.baseline')
+    gen_matrix = data.matrix('generalized_divergence_analysis')
     
-    kl_distances, gen_distances, pairs = extract_paired_distances(kl_matrix, gen_matrix)
+    kl_distances, gen_distances, pairs = extract_paired_distances(kl_matrix, gen_matrix, data.ids)
     
     # Calculate correlations
     pearson_r, pearson_p = pearsonr(kl_distances, gen_distances)
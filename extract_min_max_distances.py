@@ -3,14 +3,16 @@
 Extract 20 minimum and maximum distances from the three categories analysis
 """
 
-import json
+import sys
+import numpy as np
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).parent / "scripts"))
+from matrix_artifact import open_results
+
 def load_analysis_data():
-    """Load the analysis results"""
-    data_path = Path("public/data/three_categories_analysis.json")
-    with open(data_path, 'r') as f:
-        return json.load(f)
+    """Load the analysis results (matrix artifact)"""
+    return open_results("public/data/three_categories_analysis.json")
 
 def get_display_name(item_id):
     """Convert item ID to display name"""
@@ -28,18 +30,16 @@ def get_display_name(item_id):
         return f"🐱 {name}"
     return item_id
 
-def extract_distances(distance_matrix, name):
+def extract_distances(data, matrix_name):
     """Extract all pairwise distances from matrix"""
     distances = []
-    items = list(distance_matrix.keys())
+    items = data.ids
     
-    for i, item1 in enumerate(items):
-        for j, item2 in enumerate(items):
-            if i < j:  # Only upper triangle to avoid duplicates
-                dist = distance_matrix[item1][item2]
-                name1 = get_display_name(item1)
-                name2 = get_display_name(item2)
-                distances.append((dist, name1, name2))
+    upper = np.triu_indices(len(items), 1)  # Only upper triangle to avoid duplicates
+    for i, j, dist in zip(*upper, data.matrix(matrix_name)[upper].tolist()):
+        name1 = get_display_name(items[i])
+        name2 = get_display_name(items[j])
+        distances.append((dist, name1, name2))
     
     return distances
 
@@ -53,7 +53,7 @@ def main():
     print("\nKL DIVERGENCE")
     print("-" * 20)
     
-    kl_distances = extract_distances(data['kl_analysis']['baseline']['distance_matrix'], "KL")
+    kl_distances = extract_distances(data, 'kl_analysis.baseline')
     kl_distances.sort()
     
     print("\n20 MINIMUM distances:")
@@ -68,7 +68,7 @@ def main():
     print("\n\nGENERALIZED DIVERGENCE")
     print("-" * 30)
     
-    gen_distances = extract_distances(data['generalized_divergence_analysis']['distance_matrix'], "Gen")
+    gen_distances = extract_distances(data, 'generalized_divergence_analysis')
     gen_distances.sort()
     
     print("\n20 MINIMUM distances (bits/char):")
@@ -3,19 +3,19 @@
 Extract and format distance matrices for texts from unified content analysis
 """
 
-import json
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).parent / "scripts"))
+from matrix_artifact import open_results
+
 def load_data():
-    """Load the unified content analysis data"""
-    data_path = Path("public/data/unified_content_analysis.json")
-    with open(data_path, 'r') as f:
-        return json.load(f)
+    """Load the unified content analysis data (matrix artifact)"""
+    return open_results("public/data/unified_content_analysis.json")
 
 def get_text_items(data):
     """Get list of text items"""
-    kl_data = data['kl_analysis']['baseline']
-    return [item for item in kl_data['languages'] if item.startswith('text_')]
+    return [item for item in data.ids if item.startswith('text_')]
 
 def format_matrix(matrix_data, text_items, title, description):
     """Format a distance matrix for display"""
@@ -76,7 +76,7 @@ def main():
         print(f"- {clean_names[item]}")
     
     # KL divergence matrix
-    kl_matrix = data['kl_analysis']['baseline']['distance_matrix']
+    kl_matrix = data.view('kl_analysis.baseline')
     format_matrix(
         kl_matrix, 
         text_items,
@@ -85,7 +85,7 @@ def main():
     )
     
     # DEFLATE compression matrix  
-    deflate_matrix = data['deflate_analysis']['distance_matrix']
+    deflate_matrix = data.view('deflate_analysis')
     format_matrix(
         deflate_matrix,
         text_items, 
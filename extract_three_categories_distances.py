@@ -3,22 +3,21 @@
 Extract and format distance matrices for three categories content
 """
 
-import json
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).parent / "scripts"))
+from matrix_artifact import open_results
+
 def load_data():
-    """Load the three categories analysis data"""
-    data_path = Path("public/data/three_categories_analysis.json")
-    with open(data_path, 'r') as f:
-        return json.load(f)
+    """Load the three categories analysis data (matrix artifact)"""
+    return open_results("public/data/three_categories_analysis.json")
 
 def get_items_by_category(data):
     """Get items organized by category"""
-    kl_data = data['kl_analysis']['baseline']
-    
-    countries = [item for item in kl_data['languages'] if item.startswith('country_')]
-    fruits = [item for item in kl_data['languages'] if item.startswith('fruit_')]
-    animals = [item for item in kl_data['languages'] if item.startswith('animal_')]
+    countries = [item for item in data.ids if item.startswith('country_')]
+    fruits = [item for item in data.ids if item.startswith('fruit_')]
+    animals = [item for item in data.ids if item.startswith('animal_')]
     
     return countries, fruits, animals
 
@@ -169,7 +168,7 @@ def main():
         print(f"- {clean_names[item]}")
     
     # KL divergence matrices
-    kl_matrix = data['kl_analysis']['baseline']['distance_matrix']
+    kl_matrix = data.view('kl_analysis.baseline')
     
     format_full_matrix(
         kl_matrix,
@@ -179,7 +178,7 @@ def main():
     )
     
     # Generalized divergence matrices  
-    gen_div_matrix = data['generalized_divergence_analysis']['distance_matrix']
+    gen_div_matrix = data.view('generalized_divergence_analysis')
     
     format_full_matrix(
         gen_div_matrix,
@@ -244,8 +243,8 @@ def main():
     
     for item1 in all_items:
         for item2 in all_items:
-            cat1 = data['kl_analysis']['baseline']['categories'][item1]
-            cat2 = data['kl_analysis']['baseline']['categories'][item2]
+            cat1 = data.categories[item1]
+            cat2 = data.categories[item2]
             if cat1 != cat2:  # Different categories
                 dist = kl_matrix[item1][item2]
                 cross_pairs.append((item1, item2, dist, f"{cat1}-{cat2}"))
@@ -289,8 +288,8 @@ def main():
     cross_pairs_gen = []
     for item1 in all_items:
         for item2 in all_items:
-            cat1 = data['generalized_divergence_analysis']['categories'][item1]
-            cat2 = data['generalized_divergence_analysis']['categories'][item2]
+            cat1 = data.categories[item1]
+            cat2 = data.categories[item2]
             if cat1 != cat2:
                 dist = gen_div_matrix[item1][item2]
                 cross_pairs_gen.append((item1, item2, dist, f"{cat1}-{cat2}"))
@@ -3,21 +3,20 @@
 Extract and format distance matrices for Wikipedia content
 """
 
-import json
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).parent / "scripts"))
+from matrix_artifact import open_results
+
 def load_data():
-    """Load the Wikipedia analysis data"""
-    data_path = Path("public/data/wikipedia_analysis.json")
-    with open(data_path, 'r') as f:
-        return json.load(f)
+    """Load the Wikipedia analysis data (matrix artifact)"""
+    return open_results("public/data/wikipedia_analysis.json")
 
 def get_items_by_category(data):
     """Get items organized by category"""
-    kl_data = data['kl_analysis']['baseline']
-    
-    presidents = [item for item in kl_data['languages'] if item.startswith('president_')]
-    countries = [item for item in kl_data['languages'] if item.startswith('country_')]
+    presidents = [item for item in data.ids if item.startswith('president_')]
+    countries = [item for item in data.ids if item.startswith('country_')]
     
     return presidents, countries
 
@@ -130,7 +129,7 @@ def main():
         print(f"- {clean_names[item]}")
     
     # KL divergence matrices
-    kl_matrix = data['kl_analysis']['baseline']['distance_matrix']
+    kl_matrix = data.view('kl_analysis.baseline')
     
     format_matrix(
         kl_matrix, 
@@ -155,7 +154,7 @@ def main():
     )
     
     # DEFLATE compression matrices  
-    deflate_matrix = data['deflate_analysis']['distance_matrix']
+    deflate_matrix = data.view('deflate_analysis')
     
     format_matrix(
         deflate_matrix,
@@ -5,20 +5,27 @@ Runs both KL divergence and DEFLATE compression analysis.
 """
 
 import os
-import json
 import zlib
-import numpy as np
 from pathlib import Path
-from collections import Counter
 import argparse
 
+from char_frequencies import count_vector, counts_entropy, stack_frequencies
+from compression_engine import CompressionDistanceEngine, DeflateCodec, DictionaryMetric
+from context_model import ContextModelMetric
+from corpus_store import CorpusStore
+from dictionary_builder import create_repeated_dictionary
+from kl_matrix import kl_matrices
+from matrix_artifact import save_results
+
 class UnifiedContentAnalyzer:
-    def __init__(self, output_dir="public/data"):
+    def __init__(self, output_dir="public/data", max_workers=None):
         self.output_dir = Path(output_dir)
+        self.max_workers = max_workers
         self.programming_dir = self.output_dir / "programming_languages"
         self.texts_dir = self.output_dir / "texts"
         
-        self.items = {}  # Will store all content items
+        self.corpus = CorpusStore()
+        self.items = {}  # Will store all content items (mapped CorpusFiles)
         self.categories = {}  # Track which category each item belongs to
         
     def load_programming_languages(self):
@@ -32,12 +39,11 @@ class UnifiedContentAnalyzer:
             lang = file_path.stem.replace("_consolidated", "")
             if lang not in excluded_languages:
                 try:
-                    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                        content = f.read()
+                    content = self.corpus.add(f"lang_{lang}", file_path)
                     
                     self.items[f"lang_{lang}"] = content
                     self.categories[f"lang_{lang}"] = "programming"
-                    print(f"  {lang}: {len(content)} chars")
+                    print(f"  {lang}: {len(content.text)} chars")
                     
                 except Exception as e:
                     print(f"  Error loading {lang}: {e}")
@@ -49,88 +55,41 @@ class UnifiedContentAnalyzer:
         for file_path in self.texts_dir.glob("*.txt"):
             text_name = file_path.stem
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    content = f.read()
+                content = self.corpus.add(f"text_{text_name}", file_path)
                 
                 self.items[f"text_{text_name}"] = content
                 self.categories[f"text_{text_name}"] = "text"
-                print(f"  {text_name}: {len(content)} chars")
+                print(f"  {text_name}: {len(content.text)} chars")
                 
             except Exception as e:
                 print(f"  Error loading {text_name}: {e}")
     
-    def compute_character_frequencies(self, text):
-        """Compute character frequency distribution"""
-        total_chars = len(text)
-        if total_chars == 0:
-            return {}
-        
-        char_counts = Counter(text)
-        frequencies = {}
-        
-        for char, count in char_counts.items():
-            frequencies[char] = count / total_chars
-        
-        return frequencies
-    
-    def compute_kl_divergence(self, freq1, freq2, min_freq=2**-10):
-        """Compute symmetrized KL divergence between two frequency distributions"""
-        # Get all characters that appear in either distribution
-        all_chars = set(freq1.keys()) | set(freq2.keys())
-        
-        # Ensure minimum frequency to avoid log(0)
-        p = np.array([max(freq1.get(char, 0), min_freq) for char in all_chars])
-        q = np.array([max(freq2.get(char, 0), min_freq) for char in all_chars])
-        
-        # Normalize to ensure they sum to 1
-        p = p / np.sum(p)
-        q = q / np.sum(q)
-        
-        # Compute KL divergences in both directions
-        kl_pq = np.sum(p * np.log2(p / q))
-        kl_qp = np.sum(q * np.log2(q / p))
-        
-        # Return symmetrized KL divergence
-        return (kl_pq + kl_qp) / 2
-    
-    def compute_entropy(self, frequencies):
-        """Compute Shannon entropy"""
-        if not frequencies:
-            return 0
-        
-        entropy = 0
-        for freq in frequencies.values():
-            if freq > 0:
-                entropy -= freq * np.log2(freq)
-        
-        return entropy
-    
     def run_kl_analysis(self):
         """Run KL divergence analysis on all content"""
         print("\nRunning KL divergence analysis...")
         
-        # Compute character frequencies for all items
-        frequencies = {}
+        # Count the characters of all items (count vectors share one column layout)
+        char_counts = {}
         entropies = {}
         
         for item_id, content in self.items.items():
-            freq = self.compute_character_frequencies(content)
-            frequencies[item_id] = freq
-            entropies[item_id] = self.compute_entropy(freq)
+            char_counts[item_id] = count_vector(content.encoded)
+            entropies[item_id] = counts_entropy(char_counts[item_id])
             print(f"  {item_id}: entropy = {entropies[item_id]:.3f}")
         
-        # Compute pairwise KL divergences
+        # Compute all pairwise KL divergences at once over a shared alphabet
         item_ids = list(self.items.keys())
+        distributions = stack_frequencies([char_counts[item_id] for item_id in item_ids])
+        kl_matrix = kl_matrices(distributions, min_freq=2**-10)['symmetric'].tolist()
         distance_matrix = {}
         
-        for item1 in item_ids:
+        for i, item1 in enumerate(item_ids):
             distance_matrix[item1] = {}
-            for item2 in item_ids:
+            for j, item2 in enumerate(item_ids):
                 if item1 == item2:
                     distance_matrix[item1][item2] = 0.0
                 else:
-                    kl_dist = self.compute_kl_divergence(frequencies[item1], frequencies[item2])
-                    distance_matrix[item1][item2] = kl_dist
+                    distance_matrix[item1][item2] = kl_matrix[i][j]
         
         return {
             'languages': item_ids,
@@ -139,68 +98,30 @@ class UnifiedContentAnalyzer:
             'categories': self.categories
         }
     
-    def compress_with_deflate(self, data, dictionary=None):
-        """Compress data using DEFLATE with optional dictionary"""
-        data_bytes = data.encode('utf-8') if isinstance(data, str) else data
-        
-        if dictionary:
-            comp = zlib.compressobj(
-                level=9,
-                method=zlib.DEFLATED,
-                wbits=-zlib.MAX_WBITS,  # Raw DEFLATE
-                memLevel=8,
-                strategy=zlib.Z_FIXED,  # Static Huffman
-                zdict=dictionary
-            )
-        else:
-            comp = zlib.compressobj(
-                level=9,
-                method=zlib.DEFLATED,
-                wbits=-zlib.MAX_WBITS,  # Raw DEFLATE
-                memLevel=8,
-                strategy=zlib.Z_FIXED   # Static Huffman
-            )
-        
-        return comp.compress(data_bytes) + comp.flush()
-    
-    def create_dictionary(self, content, dict_size=32768):
-        """Create a 32KB dictionary from content"""
-        content_bytes = content.encode('utf-8', errors='replace')
-        
-        # If content is less than 32KB, repeat it
-        if len(content_bytes) < dict_size:
-            repeat_times = (dict_size // len(content_bytes)) + 1
-            content_bytes = content_bytes * repeat_times
-        
-        # Truncate to exactly 32KB
-        return content_bytes[:dict_size]
-    
     def run_deflate_analysis(self):
         """Run DEFLATE compression analysis on all content"""
         print("\nRunning DEFLATE compression analysis...")
         
         item_ids = list(self.items.keys())
         
-        # Create dictionaries for each item
-        dictionaries = {}
-        for item_id, content in self.items.items():
-            dictionaries[item_id] = self.create_dictionary(content)
-            print(f"  Created dictionary for {item_id}: {len(dictionaries[item_id])} bytes")
+        # Create a 32KB dictionary for each item, compress every item without dictionary
+        # and with every other item's dictionary (static Huffman, raw DEFLATE)
+        metric = DictionaryMetric(DeflateCodec(level=9, raw=True, strategy=zlib.Z_FIXED),
+                                  build_dictionary=create_repeated_dictionary)
+        matrix = CompressionDistanceEngine(metric, self.max_workers).run(self.items, include_diagonal=False)
         
-        # Compute baseline compression (no dictionary)
         baseline_compression = {}
-        for item_id, content in self.items.items():
-            original_size = len(content.encode('utf-8'))
-            compressed = self.compress_with_deflate(content, dictionary=None)
-            compressed_size = len(compressed)
+        for item_id in item_ids:
+            artifacts = matrix['items'][item_id]
+            print(f"  Created dictionary for {item_id}: {len(artifacts['dictionary'])} bytes")
             
             baseline_compression[item_id] = {
-                'original': original_size,
-                'compressed': compressed_size,
-                'ratio': compressed_size / original_size
+                'original': artifacts['original'],
+                'compressed': artifacts['compressed'],
+                'ratio': artifacts['compressed'] / artifacts['original']
             }
         
-        # Compute dictionary compression for all pairs
+        # Dictionary compression benefits for all pairs
         compression_benefits = {}
         for dict_item in item_ids:
             compression_benefits[dict_item] = {}
@@ -210,19 +131,9 @@ class UnifiedContentAnalyzer:
                     # Self-compression: improvement should be very high
                     compression_benefits[dict_item][target_item] = 0.95  # Assume 95% improvement
                 else:
-                    # Cross-compression
-                    dictionary = dictionaries[dict_item]
-                    target_content = self.items[target_item]
-                    
-                    # Get baseline
-                    baseline_size = baseline_compression[target_item]['compressed']
-                    
-                    # Compress with dictionary
-                    dict_compressed = self.compress_with_deflate(target_content, dictionary=dictionary)
-                    dict_size = len(dict_compressed)
-                    
-                    # Calculate improvement
-                    improvement = (baseline_size - dict_size) / baseline_size
+                    entry = matrix['pairs'][dict_item][target_item]
+                    baseline_size = entry['baseline']
+                    improvement = (baseline_size - entry['with_dict']) / baseline_size
                     compression_benefits[dict_item][target_item] = improvement
         
         # Calculate distance matrix
@@ -254,6 +165,37 @@ class UnifiedContentAnalyzer:
             'categories': self.categories
         }
     
+    def run_context_model_analysis(self):
+        """Run order-k context model (PPM-style) cross-entropy analysis on all content"""
+        print("\nRunning context model analysis...")
+        
+        item_ids = list(self.items.keys())
+        
+        # An order-4 model of each item's first 50% predicts the last 50% of every item;
+        # the divergence is the bits/char lost against the item's own model
+        matrix = CompressionDistanceEngine(ContextModelMetric(order=4), self.max_workers).run(self.items)
+        
+        self_entropy = {}
+        distance_matrix = {}
+        cross_entropy = {}  # Bits/char of item1's last 50% under item2's model
+        for item1 in item_ids:
+            self_entropy[item1] = matrix['items'][item1]['self_entropy']
+            distance_matrix[item1] = {}
+            cross_entropy[item1] = {}
+            for item2 in item_ids:
+                entry = matrix['pairs'][item1][item2]
+                distance_matrix[item1][item2] = 0.0 if item1 == item2 else entry['divergence']
+                cross_entropy[item1][item2] = entry['cross_entropy']
+            print(f"  {item1}: {self_entropy[item1]:.3f} bits/char under its own model")
+        
+        return {
+            'languages': item_ids,
+            'distance_matrix': distance_matrix,
+            'cross_entropy': cross_entropy,
+            'self_entropy': self_entropy,
+            'categories': self.categories
+        }
+    
     def run_full_analysis(self):
         """Run complete analysis pipeline"""
         print("Starting unified content analysis...")
@@ -272,9 +214,10 @@ class UnifiedContentAnalyzer:
         print(f"  Programming languages: {programming_count}")
         print(f"  Texts: {text_count}")
         
-        # Run both analyses
+        # Run all analyses
         kl_results = self.run_kl_analysis()
         deflate_results = self.run_deflate_analysis()
+        context_model_results = self.run_context_model_analysis()
         
         # Combine results
         final_results = {
@@ -282,20 +225,21 @@ class UnifiedContentAnalyzer:
                 'total_items': len(self.items),
                 'programming_languages': programming_count,
                 'texts': text_count,
-                'analysis_types': ['kl_divergence', 'deflate_compression']
+                'analysis_types': ['kl_divergence', 'deflate_compression', 'context_model']
             },
             'kl_analysis': {
                 'baseline': kl_results
             },
-            'deflate_analysis': deflate_results
+            'deflate_analysis': deflate_results,
+            'context_model_analysis': context_model_results
         }
         
         # Save results
         output_path = self.output_dir / "unified_content_analysis.json"
-        with open(output_path, 'w') as f:
-            json.dump(final_results, f, indent=2)
+        artifact = save_results(final_results, output_path)
         
         print(f"\nResults saved to: {output_path}")
+        print(f"Matrix artifact saved to: {artifact}")
         return final_results
 
 def main():
@@ -4,21 +4,33 @@ Analyze three categories (countries, fruits, animals) using KL divergence and ge
 """
 
 import os
-import json
+import hashlib
 import zlib
-import numpy as np
 from pathlib import Path
-from collections import Counter
 import argparse
 
+from char_frequencies import count_vector, counts_entropy, stack_frequencies
+from compression_engine import CompressionDistanceEngine, GeneralizedDivergenceMetric
+from context_model import ContextModelMetric
+from corpus_store import CorpusFile, CorpusStore, test_half, utf8_content
+from dictionary_builder import create_frequency_dictionary
+from kl_matrix import kl_matrices
+from matrix_artifact import save_results
+
 class ThreeCategoriesAnalyzer:
-    def __init__(self, output_dir="public/data"):
+    def __init__(self, output_dir="public/data", max_workers=None):
         self.output_dir = Path(output_dir)
+        self.max_workers = max_workers
         self.three_categories_dir = self.output_dir / "three_categories"
         
-        self.items = {}  # Will store all content items
+        self.corpus = CorpusStore()
+        self.items = {}  # Will store all content items (mapped CorpusFiles)
         self.categories = {}  # Track which category each item belongs to
         
+        # 1KB frequency dictionary from the first 50%, static Huffman raw DEFLATE at level 9
+        self.generalized_divergence = GeneralizedDivergenceMetric()
+        self.prepared_items = {}  # Per-item generalized divergence artifacts by content hash
+        
     def load_content(self):
         """Load content from three categories"""
         print("Loading three categories content...")
@@ -26,8 +38,7 @@ class ThreeCategoriesAnalyzer:
         for file_path in self.three_categories_dir.glob("*.txt"):
             item_name = file_path.stem
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    content = f.read()
+                content = self.corpus.add(item_name, file_path)
                 
                 # Determine category from filename
                 if item_name.startswith('country_'):
@@ -45,83 +56,37 @@ class ThreeCategoriesAnalyzer:
                 
                 self.items[item_name] = content
                 self.categories[item_name] = category
-                print(f"  {display_name} ({category}): {len(content)} chars")
+                print(f"  {display_name} ({category}): {len(content.text)} chars")
                 
             except Exception as e:
                 print(f"  Error loading {item_name}: {e}")
     
-    def compute_character_frequencies(self, text):
-        """Compute character frequency distribution"""
-        total_chars = len(text)
-        if total_chars == 0:
-            return {}
-        
-        char_counts = Counter(text)
-        frequencies = {}
-        
-        for char, count in char_counts.items():
-            frequencies[char] = count / total_chars
-        
-        return frequencies
-    
-    def compute_kl_divergence(self, freq1, freq2, min_freq=2**-10):
-        """Compute symmetrized KL divergence between two frequency distributions"""
-        # Get all characters that appear in either distribution
-        all_chars = set(freq1.keys()) | set(freq2.keys())
-        
-        # Ensure minimum frequency to avoid log(0)
-        p = np.array([max(freq1.get(char, 0), min_freq) for char in all_chars])
-        q = np.array([max(freq2.get(char, 0), min_freq) for char in all_chars])
-        
-        # Normalize to ensure they sum to 1
-        p = p / np.sum(p)
-        q = q / np.sum(q)
-        
-        # Compute KL divergences in both directions
-        kl_pq = np.sum(p * np.log2(p / q))
-        kl_qp = np.sum(q * np.log2(q / p))
-        
-        # Return symmetrized KL divergence
-        return (kl_pq + kl_qp) / 2
-    
-    def compute_entropy(self, frequencies):
-        """Compute Shannon entropy"""
-        if not frequencies:
-            return 0
-        
-        entropy = 0
-        for freq in frequencies.values():
-            if freq > 0:
-                entropy -= freq * np.log2(freq)
-        
-        return entropy
-    
     def run_kl_analysis(self):
         """Run KL divergence analysis on all content"""
         print("\\nRunning KL divergence analysis...")
         
-        # Compute character frequencies for all items
-        frequencies = {}
+        # Count the characters of all items (count vectors share one column layout)
+        char_counts = {}
         entropies = {}
         
         for item_id, content in self.items.items():
-            freq = self.compute_character_frequencies(content)
-            frequencies[item_id] = freq
-            entropies[item_id] = self.compute_entropy(freq)
+            char_counts[item_id] = count_vector(content.encoded)
+            entropies[item_id] = counts_entropy(char_counts[item_id])
             print(f"  {item_id}: entropy = {entropies[item_id]:.3f}")
         
-        # Compute pairwise KL divergences
+        # Compute all pairwise KL divergences at once over a shared alphabet
         item_ids = list(self.items.keys())
+        distributions = stack_frequencies([char_counts[item_id] for item_id in item_ids])
+        kl_matrix = kl_matrices(distributions, min_freq=2**-10)['symmetric'].tolist()
         distance_matrix = {}
         
-        for item1 in item_ids:
+        for i, item1 in enumerate(item_ids):
             distance_matrix[item1] = {}
-            for item2 in item_ids:
+            for j, item2 in enumerate(item_ids):
                 if item1 == item2:
                     distance_matrix[item1][item2] = 0.0
                 else:
-                    kl_dist = self.compute_kl_divergence(frequencies[item1], frequencies[item2])
-                    distance_matrix[item1][item2] = kl_dist
+                    distance_matrix[item1][item2] = kl_matrix[i][j]
         
         return {
             'languages': item_ids,
@@ -156,87 +121,23 @@ class ThreeCategoriesAnalyzer:
     
     def create_dictionary(self, content, dict_size=1024):
         """Create frequency-based dictionary from most common patterns in first 50% of content"""
-        import re
-        from collections import Counter
-        
-        content_bytes = content.encode('utf-8', errors='replace')
-        
-        # Use first 50% of content as dictionary source
-        dict_source_end = len(content_bytes) // 2
-        dict_source_text = content_bytes[:dict_source_end].decode('utf-8', errors='replace')
-        
-        # Extract different types of patterns
-        
-        # 1. Words (most important)
-        words = re.findall(r'\b\w+\b', dict_source_text.lower())
-        word_counts = Counter(words)
-        
-        # 2. Common bigrams and trigrams
-        bigrams = []
-        trigrams = []
-        for i in range(len(dict_source_text) - 2):
-            if dict_source_text[i:i+2].isalnum() or ' ' in dict_source_text[i:i+2]:
-                bigrams.append(dict_source_text[i:i+2])
-            if dict_source_text[i:i+3].isalnum() or ' ' in dict_source_text[i:i+3]:
-                trigrams.append(dict_source_text[i:i+3])
-        
-        bigram_counts = Counter(bigrams)
-        trigram_counts = Counter(trigrams)
-        
-        # 3. Build dictionary content prioritizing by frequency and usefulness
-        dictionary_content = []
-        current_size = 0
-        
-        # Add most frequent words first (they compress best)
-        for word, count in word_counts.most_common():
-            if count >= 2:  # Only words that appear multiple times
-                word_with_space = f" {word} "
-                word_bytes = word_with_space.encode('utf-8')
-                if current_size + len(word_bytes) <= dict_size:
-                    dictionary_content.append(word_with_space)
-                    current_size += len(word_bytes)
-                else:
-                    break
-        
-        # Add frequent trigrams that aren't already covered
-        for trigram, count in trigram_counts.most_common():
-            if count >= 2 and trigram not in ''.join(dictionary_content):
-                trigram_bytes = trigram.encode('utf-8')
-                if current_size + len(trigram_bytes) <= dict_size:
-                    dictionary_content.append(trigram)
-                    current_size += len(trigram_bytes)
-                else:
-                    break
-        
-        # Add frequent bigrams to fill remaining space
-        for bigram, count in bigram_counts.most_common():
-            if count >= 3 and bigram not in ''.join(dictionary_content):
-                bigram_bytes = bigram.encode('utf-8')
-                if current_size + len(bigram_bytes) <= dict_size:
-                    dictionary_content.append(bigram)
-                    current_size += len(bigram_bytes)
-                else:
-                    break
-        
-        # Convert to bytes and pad to exact dict_size
-        dict_text = ''.join(dictionary_content)
-        dict_bytes = dict_text.encode('utf-8', errors='replace')
-        
-        if len(dict_bytes) < dict_size:
-            # Pad with null bytes
-            padding = b'\x00' * (dict_size - len(dict_bytes))
-            dict_bytes += padding
-        else:
-            # Truncate if too long
-            dict_bytes = dict_bytes[:dict_size]
-        
-        return dict_bytes
+        return create_frequency_dictionary(content, dict_size)
     
     def get_test_content(self, content):
-        """Get the last 50% of content for testing (when using first 50% as dictionary)"""
-        content_bytes = content.encode('utf-8')
-        test_start = len(content_bytes) // 2  # Skip first 50%
-        return content_bytes[test_start:].decode('utf-8', errors='replace')
+        """Get the last 50% of content as UTF-8 bytes for testing (when using first 50% as dictionary)"""
+        return test_half(utf8_content(content))
+    
+    def prepare_item(self, content):
+        """
+        Generalized divergence artifacts of a text, built once per content: its dictionary
+        (from the first 50%), test bytes (the last 50%) and self-compressed test size
+        """
+        content_hash = content.content_hash if isinstance(content, CorpusFile) else None
+        content = utf8_content(content)
+        content_hash = content_hash or hashlib.sha256(content).hexdigest()
+        if content_hash not in self.prepared_items:
+            self.prepared_items[content_hash] = (content, self.generalized_divergence.prepare(content_hash, content))
+        return self.prepared_items[content_hash]
     
     def compute_generalized_divergence(self, content_a, content_b):
         """
@@ -244,40 +145,9 @@ class ThreeCategoriesAnalyzer:
         Uses first 50% as dictionary, tests on remaining 50% for self-compression.
         Returns bits per character difference when using each other's dictionaries.
         """
-        # Create dictionaries from first 50% of each content
-        dict_a = self.create_dictionary(content_a)
-        dict_b = self.create_dictionary(content_b)
-        
-        # Get test content (last 50% for both self and cross-compression)
-        test_a = self.get_test_content(content_a)
-        test_b = self.get_test_content(content_b)
-        
-        # Compress A: test portion with A's dict vs test portion with B's dict
-        test_a_bytes = test_a.encode('utf-8')
-        test_b_bytes = test_b.encode('utf-8')
-        
-        a_self_compressed = self.compress_with_deflate(test_a, dictionary=dict_a)
-        a_cross_compressed = self.compress_with_deflate(test_a, dictionary=dict_b)
-        
-        # Compress B: test portion with B's dict vs test portion with A's dict  
-        b_self_compressed = self.compress_with_deflate(test_b, dictionary=dict_b)
-        b_cross_compressed = self.compress_with_deflate(test_b, dictionary=dict_a)
-        
-        # Calculate bits per character difference
-        # For A: how much worse is using B's dictionary vs A's own dictionary
-        a_self_bits_per_char = (len(a_self_compressed) * 8) / len(test_a_bytes)
-        a_cross_bits_per_char = (len(a_cross_compressed) * 8) / len(test_a_bytes)
-        divergence_a_to_b = a_cross_bits_per_char - a_self_bits_per_char
-        
-        # For B: how much worse is using A's dictionary vs B's own dictionary
-        b_self_bits_per_char = (len(b_self_compressed) * 8) / len(test_b_bytes)
-        b_cross_bits_per_char = (len(b_cross_compressed) * 8) / len(test_b_bytes)
-        divergence_b_to_a = b_cross_bits_per_char - b_self_bits_per_char
-        
-        # Symmetrize: average the two directions
-        symmetric_divergence = (divergence_a_to_b + divergence_b_to_a) / 2
-        
-        return symmetric_divergence
+        # Only the two cross compressions are computed per pair
+        result, _ = self.generalized_divergence.pair(self.prepare_item(content_a), self.prepare_item(content_b))
+        return result['divergence']
     
     def compute_zip_similarity(self, content_a, content_b):
         """
@@ -285,12 +155,14 @@ class ThreeCategoriesAnalyzer:
         Uses formula: NCD(x,y) ≈ (C(xy) – min{C(x),C(y)}) / max{C(x),C(y)}
         Where C(x) is the compressed size of x.
         """
+        content_a, content_b = utf8_content(content_a), utf8_content(content_b)
+        
         # Compress individual texts
         compressed_a = self.compress_with_deflate(content_a)
         compressed_b = self.compress_with_deflate(content_b)
         
         # Compress concatenated text
-        compressed_ab = self.compress_with_deflate(content_a + content_b)
+        compressed_ab = self.compress_with_deflate(b''.join((content_a, content_b)))
         
         # Get compressed sizes
         c_a = len(compressed_a)
@@ -317,6 +189,11 @@ class ThreeCategoriesAnalyzer:
         
         item_ids = list(self.items.keys())
         
+        # Each item's dictionary, test half and self-compressed size are built once and
+        # shared with the workers; the symmetric pairs only add the cross compressions
+        matrix = CompressionDistanceEngine(self.generalized_divergence, self.max_workers).run(
+            self.items, include_diagonal=False)
+        
         # Compute generalized divergence matrix
         distance_matrix = {}
         for item1 in item_ids:
@@ -327,11 +204,7 @@ class ThreeCategoriesAnalyzer:
                 if item1 == item2:
                     distance_matrix[item1][item2] = 0.0
                 else:
-                    # Compute generalized divergence
-                    gen_div = self.compute_generalized_divergence(
-                        self.items[item1], 
-                        self.items[item2]
-                    )
+                    gen_div = matrix['pairs'][item1][item2]['divergence']
                     distance_matrix[item1][item2] = gen_div
                     print(f"    {item1} ↔ {item2}: {gen_div:.3f} bits/char")
         
@@ -371,6 +244,37 @@ class ThreeCategoriesAnalyzer:
             'categories': self.categories
         }
     
+    def run_context_model_analysis(self):
+        """Run order-k context model (PPM-style) cross-entropy analysis on all content"""
+        print("\nRunning context model analysis...")
+        
+        item_ids = list(self.items.keys())
+        
+        # An order-4 model of each item's first 50% predicts the last 50% of every item;
+        # the divergence is the bits/char lost against the item's own model
+        matrix = CompressionDistanceEngine(ContextModelMetric(order=4), self.max_workers).run(self.items)
+        
+        self_entropy = {}
+        distance_matrix = {}
+        cross_entropy = {}  # Bits/char of item1's last 50% under item2's model
+        for item1 in item_ids:
+            self_entropy[item1] = matrix['items'][item1]['self_entropy']
+            distance_matrix[item1] = {}
+            cross_entropy[item1] = {}
+            for item2 in item_ids:
+                entry = matrix['pairs'][item1][item2]
+                distance_matrix[item1][item2] = 0.0 if item1 == item2 else entry['divergence']
+                cross_entropy[item1][item2] = entry['cross_entropy']
+            print(f"  {item1}: {self_entropy[item1]:.3f} bits/char under its own model")
+        
+        return {
+            'languages': item_ids,
+            'distance_matrix': distance_matrix,
+            'cross_entropy': cross_entropy,
+            'self_entropy': self_entropy,
+            'categories': self.categories
+        }
+    
     def run_full_analysis(self):
         """Run complete analysis pipeline"""
         print("Starting three categories content analysis...")
@@ -394,6 +298,7 @@ class ThreeCategoriesAnalyzer:
         kl_results = self.run_kl_analysis()
         gen_div_results = self.run_generalized_divergence_analysis()
         zip_sim_results = self.run_zip_similarity_analysis()
+        context_model_results = self.run_context_model_analysis()
         
         # Combine results
         final_results = {
@@ -402,21 +307,22 @@ class ThreeCategoriesAnalyzer:
                 'countries': country_count,
                 'fruits': sport_count,
                 'animals': animal_count,
-                'analysis_types': ['kl_divergence', 'generalized_divergence', 'zip_similarity']
+                'analysis_types': ['kl_divergence', 'generalized_divergence', 'zip_similarity', 'context_model']
             },
             'kl_analysis': {
                 'baseline': kl_results
             },
             'generalized_divergence_analysis': gen_div_results,
-            'zip_similarity_analysis': zip_sim_results
+            'zip_similarity_analysis': zip_sim_results,
+            'context_model_analysis': context_model_results
         }
         
         # Save results
         output_path = self.output_dir / "three_categories_analysis.json"
-        with open(output_path, 'w') as f:
-            json.dump(final_results, f, indent=2)
+        artifact = save_results(final_results, output_path)
         
         print(f"\\nResults saved to: {output_path}")
+        print(f"Matrix artifact saved to: {artifact}")
         return final_results
 
 def main():
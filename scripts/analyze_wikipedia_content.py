@@ -4,13 +4,16 @@ Analyze Wikipedia pages using both KL divergence and DEFLATE compression
 """
 
 import os
-import json
 import zlib
-import numpy as np
 from pathlib import Path
-from collections import Counter
 import argparse
 
+from char_frequencies import count_vector, counts_entropy, stack_frequencies
+from compression_engine import CompressionDistanceEngine
+from context_model import ContextModelMetric
+from kl_matrix import kl_matrices
+from matrix_artifact import save_results
+
 class WikipediaContentAnalyzer:
     def __init__(self, output_dir="public/data"):
         self.output_dir = Path(output_dir)
@@ -47,78 +50,32 @@ class WikipediaContentAnalyzer:
             except Exception as e:
                 print(f"  Error loading {item_name}: {e}")
     
-    def compute_character_frequencies(self, text):
-        """Compute character frequency distribution"""
-        total_chars = len(text)
-        if total_chars == 0:
-            return {}
-        
-        char_counts = Counter(text)
-        frequencies = {}
-        
-        for char, count in char_counts.items():
-            frequencies[char] = count / total_chars
-        
-        return frequencies
-    
-    def compute_kl_divergence(self, freq1, freq2, min_freq=2**-10):
-        """Compute symmetrized KL divergence between two frequency distributions"""
-        # Get all characters that appear in either distribution
-        all_chars = set(freq1.keys()) | set(freq2.keys())
-        
-        # Ensure minimum frequency to avoid log(0)
-        p = np.array([max(freq1.get(char, 0), min_freq) for char in all_chars])
-        q = np.array([max(freq2.get(char, 0), min_freq) for char in all_chars])
-        
-        # Normalize to ensure they sum to 1
-        p = p / np.sum(p)
-        q = q / np.sum(q)
-        
-        # Compute KL divergences in both directions
-        kl_pq = np.sum(p * np.log2(p / q))
-        kl_qp = np.sum(q * np.log2(q / p))
-        
-        # Return symmetrized KL divergence
-        return (kl_pq + kl_qp) / 2
-    
-    def compute_entropy(self, frequencies):
-        """Compute Shannon entropy"""
-        if not frequencies:
-            return 0
-        
-        entropy = 0
-        for freq in frequencies.values():
-            if freq > 0:
-                entropy -= freq * np.log2(freq)
-        
-        return entropy
-    
     def run_kl_analysis(self):
         """Run KL divergence analysis on all content"""
         print("\\nRunning KL divergence analysis...")
         
-        # Compute character frequencies for all items
-        frequencies = {}
+        # Count the characters of all items (count vectors share one column layout)
+        char_counts = {}
         entropies = {}
         
         for item_id, content in self.items.items():
-            freq = self.compute_character_frequencies(content)
-            frequencies[item_id] = freq
-            entropies[item_id] = self.compute_entropy(freq)
+            char_counts[item_id] = count_vector(content)
+            entropies[item_id] = counts_entropy(char_counts[item_id])
             print(f"  {item_id}: entropy = {entropies[item_id]:.3f}")
         
-        # Compute pairwise KL divergences
+        # Compute all pairwise KL divergences at once over a shared alphabet
         item_ids = list(self.items.keys())
+        distributions = stack_frequencies([char_counts[item_id] for item_id in item_ids])
+        kl_matrix = kl_matrices(distributions, min_freq=2**-10)['symmetric'].tolist()
         distance_matrix = {}
         
-        for item1 in item_ids:
+        for i, item1 in enumerate(item_ids):
             distance_matrix[item1] = {}
-            for item2 in item_ids:
+            for j, item2 in enumerate(item_ids):
                 if item1 == item2:
                     distance_matrix[item1][item2] = 0.0
                 else:
-                    kl_dist = self.compute_kl_divergence(frequencies[item1], frequencies[item2])
-                    distance_matrix[item1][item2] = kl_dist
+                    distance_matrix[item1][item2] = kl_matrix[i][j]
         
         return {
             'languages': item_ids,
@@ -242,6 +199,37 @@ class WikipediaContentAnalyzer:
             'categories': self.categories
         }
     
+    def run_context_model_analysis(self):
+        """Run order-k context model (PPM-style) cross-entropy analysis on all content"""
+        print("\nRunning context model analysis...")
+        
+        item_ids = list(self.items.keys())
+        
+        # An order-4 model of each item's first 50% predicts the last 50% of every item;
+        # the divergence is the bits/char lost against the item's own model
+        matrix = CompressionDistanceEngine(ContextModelMetric(order=4)).run(self.items)
+        
+        self_entropy = {}
+        distance_matrix = {}
+        cross_entropy = {}  # Bits/char of item1's last 50% under item2's model
+        for item1 in item_ids:
+            self_entropy[item1] = matrix['items'][item1]['self_entropy']
+            distance_matrix[item1] = {}
+            cross_entropy[item1] = {}
+            for item2 in item_ids:
+                entry = matrix['pairs'][item1][item2]
+                distance_matrix[item1][item2] = 0.0 if item1 == item2 else entry['divergence']
+                cross_entropy[item1][item2] = entry['cross_entropy']
+            print(f"  {item1}: {self_entropy[item1]:.3f} bits/char under its own model")
+        
+        return {
+            'languages': item_ids,
+            'distance_matrix': distance_matrix,
+            'cross_entropy': cross_entropy,
+            'self_entropy': self_entropy,
+            'categories': self.categories
+        }
+    
     def run_full_analysis(self):
         """Run complete analysis pipeline"""
         print("Starting Wikipedia content analysis...")
@@ -259,9 +247,10 @@ class WikipediaContentAnalyzer:
         print(f"  US Presidents: {president_count}")
         print(f"  Countries: {country_count}")
         
-        # Run both analyses
+        # Run all analyses
         kl_results = self.run_kl_analysis()
         deflate_results = self.run_deflate_analysis()
+        context_model_results = self.run_context_model_analysis()
         
         # Combine results
         final_results = {
@@ -269,20 +258,21 @@ class WikipediaContentAnalyzer:
                 'total_items': len(self.items),
                 'presidents': president_count,
                 'countries': country_count,
-                'analysis_types': ['kl_divergence', 'deflate_compression']
+                'analysis_types': ['kl_divergence', 'deflate_compression', 'context_model']
             },
             'kl_analysis': {
                 'baseline': kl_results
             },
-            'deflate_analysis': deflate_results
+            'deflate_analysis': deflate_results,
+            'context_model_analysis': context_model_results
         }
         
         # Save results
         output_path = self.output_dir / "wikipedia_analysis.json"
-        with open(output_path, 'w') as f:
-            json.dump(final_results, f, indent=2)
+        artifact = save_results(final_results, output_path)
         
         print(f"\\nResults saved to: {output_path}")
+        print(f"Matrix artifact saved to: {artifact}")
         return final_results
 
 def main():
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Codec benchmark over the project corpora.
+
+For every corpus and codec (zlib strategies including the static-Huffman raw
+DEFLATE of the divergence scripts, gzip, bz2, lzma, zstd levels, lz4), each
+file is compressed and decompressed on its own, as in the distance matrices,
+and the suite reports compression and decompression MB/s (best of --repeats),
+the compression ratio and peak RSS. Dictionary builders are timed too, with the
+ratio their dictionaries (built from the first half of each file) reach on the
+second half. A builder that fails on some files reports each error; its gain
+only covers the other files and is not compared against a baseline.
+
+Every benchmark runs in a fresh process, so peak RSS is its own. Results are
+written as JSON (--output); with --baseline, they are compared against a
+previous results file and the script exits with status 1 on regressions.
+"""
+
+import sys
+import json
+import time
+import zlib
+import gzip
+import bz2
+import lzma
+import resource
+import argparse
+import platform
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+try:
+    import lz4.block
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+from dictionary_builder import create_frequency_dictionary, create_gain_dictionary, create_repeated_dictionary
+from zstd_dictionaries import split_samples
+
+CORPORA = {
+    'programming_languages': ("public/data/programming_languages", "*_consolidated.txt"),
+    'three_categories': ("public/data/three_categories", "*.txt"),
+    'wikipedia': ("public/data/wikipedia", "*.txt"),
+    'compression_texts': ("public/compression_experiments/texts", "*.txt"),
+}
+
+MB = 1024 * 1024
+
+# ---------------------------------------------------------------------------
+# Codecs: name -> factory returning (compress(data, dictionary), decompress(blob, dictionary)).
+# Codecs without dictionary support raise ValueError when given one.
+
+def zlib_codec(level, strategy=zlib.Z_DEFAULT_STRATEGY, wbits=zlib.MAX_WBITS):
+    def compress(data, dictionary=None):
+        options = {'zdict': dictionary} if dictionary else {}
+        comp = zlib.compressobj(level, zlib.DEFLATED, wbits, 8, strategy, **options)
+        return comp.compress(data) + comp.flush()
+
+    def decompress(blob, dictionary=None):
+        options = {'zdict': dictionary} if dictionary else {}
+        decomp = zlib.decompressobj(wbits, **options)
+        return decomp.decompress(blob) + decomp.flush()
+
+    return compress, decompress
+
+def no_dictionary(compress, decompress):
+    def check(dictionary):
+        if dictionary:
+            raise ValueError("codec does not support dictionaries")
+
+    def compress_data(data, dictionary=None):
+        check(dictionary)
+        return compress(data)
+
+    def decompress_blob(blob, dictionary=None):
+        check(dictionary)
+        return decompress(blob)
+
+    return compress_data, decompress_blob
+
+def zstd_codec(level):
+    # Compressors and decompressors are built once per dictionary, like ZstdCodec does
+    compressors, decompressors = {}, {}
+
+    def dictionary_data(dictionary):
+        return zstd.ZstdCompressionDict(dictionary) if dictionary else None
+
+    def compress(data, dictionary=None):
+        if dictionary not in compressors:
+            compressors[dictionary] = zstd.ZstdCompressor(level=level, dict_data=dictionary_data(dictionary))
+        return compressors[dictionary].compress(data)
+
+    def decompress(blob, dictionary=None):
+        if dictionary not in decompressors:
+            decompressors[dictionary] = zstd.ZstdDecompressor(dict_data=dictionary_data(dictionary))
+        return decompressors[dictionary].decompress(blob)
+
+    return compress, decompress
+
+def lz4_codec(level):
+    # lz4.frame has no dictionary support; dictionaries use the block format
+    def compress(data, dictionary=None):
+        if dictionary:
+            return lz4.block.compress(data, mode='high_compression' if level > 2 else 'default',
+                                      compression=level, dict=dictionary)
+        return lz4.frame.compress(data, compression_level=level)
+
+    def decompress(blob, dictionary=None):
+        if dictionary:
+            return lz4.block.decompress(blob, dict=dictionary)
+        return lz4.frame.decompress(blob)
+
+    return compress, decompress
+
+CODECS = {
+    'zlib-1': lambda: zlib_codec(1),
+    'zlib-6': lambda: zlib_codec(6),
+    'zlib-9': lambda: zlib_codec(9),
+    'zlib-9-filtered': lambda: zlib_codec(9, zlib.Z_FILTERED),
+    'zlib-9-huffman-only': lambda: zlib_codec(9, zlib.Z_HUFFMAN_ONLY),
+    'zlib-9-rle': lambda: zlib_codec(9, zlib.Z_RLE),
+    'deflate-9-fixed': lambda: zlib_codec(9, zlib.Z_FIXED, -zlib.MAX_WBITS),
+    'gzip-9': lambda: no_dictionary(lambda data: gzip.compress(data, compresslevel=9), gzip.decompress),
+    'bz2-9': lambda: no_dictionary(lambda data: bz2.compress(data, compresslevel=9), bz2.decompress),
+    'lzma-6': lambda: no_dictionary(lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+if zstd is not None:
+    for zstd_level in (1, 3, 9, 19):
+        CODECS[f'zstd-{zstd_level}'] = lambda zstd_level=zstd_level: zstd_codec(zstd_level)
+if lz4 is not None:
+    CODECS['lz4'] = lambda: lz4_codec(0)
+    CODECS['lz4-hc-9'] = lambda: lz4_codec(9)
+
+# Dictionary builders: name -> (build(file content), codec the dictionary is used with).
+# Builders get the whole file and use its first half, like the divergence scripts.
+
+def build_zstd_dictionary(content, dict_size=32768):
+    samples = split_samples(content[:len(content) // 2])
+    return zstd.train_dictionary(dict_size, samples).as_bytes()
+
+DICTIONARY_BUILDERS = {
+    'frequency-1k': (lambda content: create_frequency_dictionary(content, 1024), 'deflate-9-fixed'),
+    'repeat-32k': (lambda content: create_repeated_dictionary(content[:len(content) // 2], 32768), 'deflate-9-fixed'),
+    'gain-32k': (lambda content: create_gain_dictionary(content[:len(content) // 2], 32768), 'deflate-9-fixed'),
+}
+if zstd is not None:
+    DICTIONARY_BUILDERS['zstd-trained-32k'] = (build_zstd_dictionary, 'zstd-3')
+
+# ---------------------------------------------------------------------------
+# Benchmarks (each run in its own process)
+
+def load_corpus(directory, pattern):
+    """Non-empty files of a corpus by name"""
+    files = {path.name: path.read_bytes() for path in sorted(Path(directory).glob(pattern))}
+    return {name: data for name, data in files.items() if data}
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / MB
+
+def best_time(fn, repeats):
+    best = float('inf')
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def benchmark_codec(codec_name, directory, pattern, repeats):
+    """Compress and decompress every file of a corpus"""
+    files = list(load_corpus(directory, pattern).values())
+    rss_before = peak_rss_mb()
+    compress, decompress = CODECS[codec_name]()
+
+    total = sum(len(data) for data in files)
+    compress_time, blobs = best_time(lambda: [compress(data) for data in files], repeats)
+    decompress_time, restored = best_time(lambda: [decompress(blob) for blob in blobs], repeats)
+    if restored != files:
+        raise RuntimeError(f"{codec_name} did not round-trip")
+
+    compressed = sum(len(blob) for blob in blobs)
+    peak = peak_rss_mb()
+    return {
+        'files': len(files),
+        'original_bytes': total,
+        'compressed_bytes': compressed,
+        'ratio': compressed / total if total else 1.0,
+        'compress_mb_s': total / MB / compress_time if compress_time else 0.0,
+        'decompress_mb_s': total / MB / decompress_time if decompress_time else 0.0,
+        'peak_rss_mb': peak,
+        'rss_increase_mb': max(0.0, peak - rss_before),
+    }
+
+def benchmark_dictionary(builder_name, directory, pattern, repeats):
+    """Build a dictionary from the first half of every file and use it on the second half"""
+    files = load_corpus(directory, pattern)
+    rss_before = peak_rss_mb()
+    build, codec_name = DICTIONARY_BUILDERS[builder_name]
+    compress, _ = CODECS[codec_name]()
+
+    build_time = 0.0
+    errors = {}  # file name -> error of the builder
+    baseline = with_dict = 0
+    for file_name, data in files.items():
+        test = data[len(data) // 2:]
+        try:
+            seconds, dictionary = best_time(lambda: build(data), repeats)
+        except Exception as e:
+            errors[file_name] = f"{type(e).__name__}: {e}"
+            continue
+        build_time += seconds
+        baseline += len(compress(test))
+        with_dict += len(compress(test, dictionary))
+
+    peak = peak_rss_mb()
+    return {
+        'codec': codec_name,
+        'files': len(files),
+        'failures': len(errors),
+        'errors': errors,
+        'build_seconds': build_time,
+        'baseline_bytes': baseline,
+        'with_dict_bytes': with_dict,
+        'dictionary_gain': 1 - with_dict / baseline if baseline else 0.0,
+        'peak_rss_mb': peak,
+        'rss_increase_mb': max(0.0, peak - rss_before),
+    }
+
+def run_isolated(fn, *args):
+    """Run fn in a fresh process, so its peak RSS is not inflated by earlier benchmarks"""
+    with ProcessPoolExecutor(1, max_tasks_per_child=1) as pool:
+        return pool.submit(fn, *args).result()
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions of results against baseline: slower, larger output, more memory, or a
+    different number of dictionary builder failures
+    """
+    regressions = []
+
+    def check(section, corpus, name, metric, lower_is_better, relative=True, floor=0.0):
+        old = baseline.get(section, {}).get(corpus, {}).get(name, {}).get(metric)
+        new = results[section][corpus][name].get(metric)
+        if old is None or new is None or max(old, new) < floor:
+            return
+        if relative:
+            worse = new > old * (1 + tolerance) if lower_is_better else new < old * (1 - tolerance)
+        else:
+            worse = new > old + 1e-9 if lower_is_better else new < old - 1e-9
+        if worse:
+            regressions.append((section, corpus, name, metric, old, new))
+
+    for corpus, codecs in results['codecs'].items():
+        for name in codecs:
+            # Sizes are deterministic: any growth is a regression
+            check('codecs', corpus, name, 'ratio', True, relative=False)
+            check('codecs', corpus, name, 'compress_mb_s', False)
+            check('codecs', corpus, name, 'decompress_mb_s', False)
+            check('codecs', corpus, name, 'peak_rss_mb', True)
+    for corpus, builders in results['dictionaries'].items():
+        for name, result in builders.items():
+            old_failures = baseline.get('dictionaries', {}).get(corpus, {}).get(name, {}).get('failures')
+            if old_failures is not None and old_failures != result['failures']:
+                regressions.append(('dictionaries', corpus, name, 'failures', old_failures, result['failures']))
+            # A gain over only the files that did not fail is not comparable
+            if result['failures'] == 0 and not old_failures:
+                check('dictionaries', corpus, name, 'dictionary_gain', False, relative=False)
+            # Builds that take milliseconds are all timer noise
+            check('dictionaries', corpus, name, 'build_seconds', True, floor=0.01)
+    return regressions
+
+# ---------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark codecs on the project corpora")
+    parser.add_argument("--corpus", action="append", choices=list(CORPORA),
+                        help="Corpus to benchmark (repeatable; default: all)")
+    parser.add_argument("--codec", action="append", choices=list(CODECS),
+                        help="Codec to benchmark (repeatable; default: all)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timings are the best of this many runs")
+    parser.add_argument("--no-dictionaries", action="store_true", help="Skip the dictionary builders")
+    parser.add_argument("--output", default="codec_benchmark.json", help="Results file (JSON)")
+    parser.add_argument("--baseline", help="Previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative slowdown / memory growth reported as a regression")
+    args = parser.parse_args()
+
+    corpora = {name: CORPORA[name] for name in (args.corpus or CORPORA)
+               if any(Path(CORPORA[name][0]).glob(CORPORA[name][1]))}
+    codecs = args.codec or list(CODECS)
+    builders = [] if args.no_dictionaries else list(DICTIONARY_BUILDERS)
+
+    results = {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'zlib': zlib.ZLIB_RUNTIME_VERSION,
+            'zstd': zstd.ZSTD_VERSION if zstd is not None else None,
+            'lz4': lz4.library_version_string() if lz4 is not None else None,
+            'repeats': args.repeats,
+        },
+        'codecs': {},
+        'dictionaries': {},
+    }
+
+    for corpus, (directory, pattern) in corpora.items():
+        print(f"\n{corpus} ({directory})")
+        print(f"  {'Codec':<22} {'ratio':>7} {'comp MB/s':>10} {'decomp MB/s':>12} {'peak RSS MB':>12}")
+        results['codecs'][corpus] = {}
+        for name in codecs:
+            result = run_isolated(benchmark_codec, name, directory, pattern, args.repeats)
+            results['codecs'][corpus][name] = result
+            print(f"  {name:<22} {result['ratio']:>7.3f} {result['compress_mb_s']:>10.1f} "
+                  f"{result['decompress_mb_s']:>12.1f} {result['peak_rss_mb']:>12.1f}")
+
+        if builders:
+            print(f"  {'Dictionary':<22} {'gain':>7} {'build (s)':>10} {'codec':>12} {'failures':>12}")
+            results['dictionaries'][corpus] = {}
+            for name in builders:
+                result = run_isolated(benchmark_dictionary, name, directory, pattern, args.repeats)
+                results['dictionaries'][corpus][name] = result
+                print(f"  {name:<22} {result['dictionary_gain']:>7.1%} {result['build_seconds']:>10.3f} "
+                      f"{result['codec']:>12} {result['failures']:>12}")
+                if result['failures']:
+                    print(f"    gain only covers the {result['files'] - result['failures']} files that did not fail:")
+                    files_by_error = {}
+                    for file_name, error in result['errors'].items():
+                        files_by_error.setdefault(error, []).append(file_name)
+                    for error, file_names in files_by_error.items():
+                        print(f"    {error} ({len(file_names)}: {', '.join(file_names)})")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\nComparison with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        if not regressions:
+            print("  No regressions")
+            return
+        for section, corpus, name, metric, old, new in regressions:
+            print(f"  {section}/{corpus}/{name} {metric}: {old:.4g} -> {new:.4g}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark the DEFLATE dictionary builders on every language: each builds a 32KB
+dictionary from the first half of the language's code, which is then used to
+compress the second half (raw DEFLATE, static Huffman, level 9, as in the
+dictionary analysis). Reports build time and bytes saved over no dictionary.
+
+The gain builder uses a first half that fits in the dictionary whole, without
+running the optimizer; such rows are marked with '*'. Every language fits at the
+default 32KB, so benchmark the optimizer with a smaller --dict-size or larger
+files, e.g. --data-dir public/data/three_categories --pattern '*.txt'.
+"""
+
+import time
+import zlib
+import argparse
+from pathlib import Path
+
+from compression_engine import DeflateCodec
+from dictionary_builder import create_gain_dictionary, create_repeated_dictionary
+from improved_dictionary import create_frequency_based_dictionary
+
+def build_repeat(source, dict_size):
+    """DeflateDictionaryBuilder's dictionary: the code itself, repeated up to dict_size"""
+    return create_repeated_dictionary(source, dict_size)
+
+def build_frequency(source, dict_size):
+    # create_frequency_based_dictionary only uses the first 50% of what it gets
+    return create_frequency_based_dictionary(source + source, dict_size)
+
+BUILDERS = {
+    'repeat': build_repeat,
+    'frequency': build_frequency,
+    'gain': create_gain_dictionary,
+}
+
+# Builders that return a source no longer than the dictionary as is (zero-padded)
+WHOLE_SOURCE_BUILDERS = {'gain'}
+
+def time_call(fn, source, dict_size, repeats):
+    best = float('inf')
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(source, dict_size)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DEFLATE dictionary builders on every language")
+    parser.add_argument("--data-dir", default="public/data/programming_languages")
+    parser.add_argument("--pattern", default="*_consolidated.txt", help="Files to benchmark in the data directory")
+    parser.add_argument("--dict-size", type=int, default=32768)
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    codec = DeflateCodec(level=9, raw=True, strategy=zlib.Z_FIXED)
+    paths = sorted(Path(args.data_dir).glob(args.pattern))
+    if not paths:
+        print(f"No files matching {args.pattern} in {args.data_dir}")
+        return
+
+    print(f"Bytes saved on the second half with a {args.dict_size}-byte dictionary from the first half")
+    print(f"{'Language':<14} {'test':>7} {'no dict':>8}" +
+          ''.join(f" {name + ' saved':>16} {'(s)':>6}" for name in BUILDERS))
+    print("-" * (31 + 24 * len(BUILDERS)))
+
+    totals = {name: [0, 0.0] for name in BUILDERS}
+    total_baseline = 0
+    whole_sources = 0
+    rows = 0
+    for path in paths:
+        content = path.read_bytes()
+        source, test = content[:len(content) // 2], content[len(content) // 2:]
+        if not test:
+            continue
+
+        baseline = codec.size(test)
+        total_baseline += baseline
+        rows += 1
+        whole = len(source) <= args.dict_size
+        whole_sources += whole
+        row = f"{path.stem.replace('_consolidated', '')[:14]:<14} {len(test):>7} {baseline:>8}"
+        for name, builder in BUILDERS.items():
+            build_time, dictionary = time_call(builder, source, args.dict_size, args.repeats)
+            saved = baseline - codec.size(test, dictionary=dictionary)
+            totals[name][0] += saved
+            totals[name][1] += build_time
+            mark = '*' if whole and name in WHOLE_SOURCE_BUILDERS else ' '
+            row += f" {saved:>9} ({saved / baseline:>4.0%}){mark}{build_time:>6.3f}"
+        print(row)
+
+    print("-" * (31 + 24 * len(BUILDERS)))
+    row = f"{'total':<14} {'':>7} {total_baseline:>8}"
+    for name, (saved, build_time) in totals.items():
+        row += f" {saved:>9} ({saved / total_baseline:>4.0%}) {build_time:>6.3f}"
+    print(row)
+
+    if whole_sources:
+        print(f"\n* {whole_sources} of {rows} first halves fit in the {args.dict_size}-byte dictionary and were "
+              f"used whole: {', '.join(sorted(WHOLE_SOURCE_BUILDERS))} did not optimize them")
+        if whole_sources == rows:
+            print("  The optimizer never ran; use a smaller --dict-size or larger files")
+
+if __name__ == "__main__":
+    main()
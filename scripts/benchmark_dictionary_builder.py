@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark the shared dictionary builder against the original create_dictionary
+implementation on ~1 MB inputs, and check that both produce identical dictionaries.
+"""
+
+import re
+import time
+import argparse
+from collections import Counter
+from pathlib import Path
+
+from dictionary_builder import create_frequency_dictionary
+
+def create_dictionary_original(content, dict_size=1024):
+    """The create_dictionary implementation previously copy-pasted across scripts"""
+    content_bytes = content.encode('utf-8', errors='replace')
+
+    dict_source_end = len(content_bytes) // 2
+    dict_source_text = content_bytes[:dict_source_end].decode('utf-8', errors='replace')
+
+    words = re.findall(r'\b\w+\b', dict_source_text.lower())
+    word_counts = Counter(words)
+
+    bigrams = []
+    trigrams = []
+    for i in range(len(dict_source_text) - 2):
+        if dict_source_text[i:i+2].isalnum() or ' ' in dict_source_text[i:i+2]:
+            bigrams.append(dict_source_text[i:i+2])
+        if dict_source_text[i:i+3].isalnum() or ' ' in dict_source_text[i:i+3]:
+            trigrams.append(dict_source_text[i:i+3])
+
+    bigram_counts = Counter(bigrams)
+    trigram_counts = Counter(trigrams)
+
+    dictionary_content = []
+    current_size = 0
+
+    for word, count in word_counts.most_common():
+        if count >= 2:
+            word_with_space = f" {word} "
+            word_bytes = word_with_space.encode('utf-8')
+            if current_size + len(word_bytes) <= dict_size:
+                dictionary_content.append(word_with_space)
+                current_size += len(word_bytes)
+            else:
+                break
+
+    for trigram, count in trigram_counts.most_common():
+        if count >= 2 and trigram not in ''.join(dictionary_content):
+            trigram_bytes = trigram.encode('utf-8')
+            if current_size + len(trigram_bytes) <= dict_size:
+                dictionary_content.append(trigram)
+                current_size += len(trigram_bytes)
+            else:
+                break
+
+    for bigram, count in bigram_counts.most_common():
+        if count >= 3 and bigram not in ''.join(dictionary_content):
+            bigram_bytes = bigram.encode('utf-8')
+            if current_size + len(bigram_bytes) <= dict_size:
+                dictionary_content.append(bigram)
+                current_size += len(bigram_bytes)
+            else:
+                break
+
+    dict_text = ''.join(dictionary_content)
+    dict_bytes = dict_text.encode('utf-8', errors='replace')
+
+    if len(dict_bytes) < dict_size:
+        dict_bytes += b'\x00' * (dict_size - len(dict_bytes))
+    else:
+        dict_bytes = dict_bytes[:dict_size]
+
+    return dict_bytes
+
+def load_corpus_input(corpus_dir: Path, target_size: int) -> str:
+    """Concatenate a corpus directory's files (repeating if needed) up to target_size bytes"""
+    texts = [p.read_text(encoding='utf-8', errors='replace') for p in sorted(corpus_dir.rglob("*.txt"))]
+    texts = [t for t in texts if t]
+    if not texts:
+        return ""
+
+    parts = []
+    size = 0
+    while size < target_size:
+        for text in texts:
+            parts.append(text)
+            size += len(text.encode('utf-8'))
+            if size >= target_size:
+                break
+
+    content_bytes = ''.join(parts).encode('utf-8')[:target_size]
+    return content_bytes.decode('utf-8', errors='ignore')
+
+def time_call(fn, content, dict_size, repeats):
+    best = float('inf')
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(content, dict_size)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dictionary construction on ~1 MB inputs")
+    parser.add_argument("--data-dir", default="public/data", help="Directory containing the corpora")
+    parser.add_argument("--size", type=int, default=1_000_000, help="Input size in bytes")
+    parser.add_argument("--dict-size", type=int, default=1024)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    corpora = ["three_categories", "programming_languages", "texts", "wikipedia"]
+
+    print(f"Dictionary build time on {args.size / 1e6:.1f} MB inputs (best of {args.repeats})")
+    print(f"{'Corpus':<24} {'original (s)':>13} {'shared (s)':>11} {'speedup':>8}  identical")
+    print("-" * 72)
+
+    for corpus in corpora:
+        corpus_dir = data_dir / corpus
+        if not corpus_dir.exists():
+            print(f"{corpus:<24} missing")
+            continue
+
+        content = load_corpus_input(corpus_dir, args.size)
+        if not content:
+            print(f"{corpus:<24} empty")
+            continue
+
+        original_time, original_dict = time_call(create_dictionary_original, content, args.dict_size, args.repeats)
+        shared_time, shared_dict = time_call(create_frequency_dictionary, content, args.dict_size, args.repeats)
+
+        print(f"{corpus:<24} {original_time:>13.3f} {shared_time:>11.3f} "
+              f"{original_time / shared_time:>7.1f}x  {original_dict == shared_dict}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark the in-process lz4 backend against the command-line fallback on the
+LZ4 experiment's workload (baselines and dictionary compression of every pair of
+languages), and check that both report identical sizes.
+"""
+
+import time
+import argparse
+from pathlib import Path
+
+from compression_engine import CompressionDistanceEngine, DictionaryMetric, Lz4Codec, lz4_library_available
+
+def load_corpus(data_dir: Path, limit: int):
+    corpus = {}
+    for path in sorted(data_dir.glob("*_consolidated.txt"))[:limit or None]:
+        corpus[path.stem.replace("_consolidated", "")] = path.read_text(encoding='utf-8')
+    return corpus
+
+def time_backend(backend, corpus, max_workers, repeats):
+    best = float('inf')
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = CompressionDistanceEngine(DictionaryMetric(Lz4Codec(backend)), max_workers).run(corpus)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lz4 library and CLI backends")
+    parser.add_argument("--data-dir", default="data/programming_languages")
+    parser.add_argument("--languages", type=int, default=0, help="Use only the first N languages (0: all)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    if not lz4_library_available():
+        print("The python lz4 module is not installed")
+        return
+
+    corpus = load_corpus(Path(args.data_dir), args.languages)
+    if not corpus:
+        print(f"No languages found in {args.data_dir}")
+        return
+
+    # One baseline per language, a baseline and a dictionary compression per ordered pair
+    calls = len(corpus) + 2 * len(corpus) ** 2
+    print(f"{len(corpus)} languages, {calls} compressions (best of {args.repeats}, {args.workers} worker(s))")
+    print(f"{'Backend':<10} {'time (s)':>9} {'calls/s':>9}")
+    print("-" * 30)
+
+    times = {}
+    results = {}
+    for backend in ('cli', 'library'):
+        times[backend], results[backend] = time_backend(backend, corpus, args.workers, args.repeats)
+        print(f"{backend:<10} {times[backend]:>9.3f} {calls / times[backend]:>9.0f}")
+
+    print(f"\nSpeedup: {times['cli'] / times['library']:.1f}x, "
+          f"identical: {results['cli'] == results['library']}")
+
+if __name__ == "__main__":
+    main()
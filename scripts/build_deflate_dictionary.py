@@ -6,11 +6,22 @@ Build 32KB dictionaries for each programming language for DEFLATE compression.
 import os
 from pathlib import Path
 import json
+import argparse
+
+from dictionary_builder import create_gain_dictionary
 
 class DeflateDictionaryBuilder:
-    def __init__(self, data_dir="public/data/programming_languages", dict_size=32768):
+    def __init__(self, data_dir="public/data/programming_languages", dict_size=32768, method="repeat"):
+        """
+        Args:
+            data_dir: Directory with the consolidated language files
+            dict_size: Dictionary size in bytes
+            method: 'repeat' (the code itself, repeated up to dict_size) or 'gain'
+                (the substrings with the highest estimated compression gain)
+        """
         self.data_dir = Path(data_dir)
         self.dict_size = dict_size  # 32KB
+        self.method = method
         self.languages = []
         self.load_languages()
     
@@ -44,14 +55,18 @@ class DeflateDictionaryBuilder:
         # Convert to bytes
         content_bytes = content.encode('utf-8', errors='replace')
         
-        # If content is less than 32KB, repeat it
-        if len(content_bytes) < self.dict_size:
-            repeat_times = (self.dict_size // len(content_bytes)) + 1
-            print(f"  - Repeating {repeat_times}x to reach 32KB")
-            content_bytes = content_bytes * repeat_times
-        
-        # Truncate to exactly 32KB
-        dictionary = content_bytes[:self.dict_size]
+        if self.method == "gain":
+            print(f"  - Selecting substrings by estimated compression gain")
+            dictionary = create_gain_dictionary(content_bytes, self.dict_size)
+        else:
+            # If content is less than 32KB, repeat it
+            if len(content_bytes) < self.dict_size:
+                repeat_times = (self.dict_size // len(content_bytes)) + 1
+                print(f"  - Repeating {repeat_times}x to reach 32KB")
+                content_bytes = content_bytes * repeat_times
+            
+            # Truncate to exactly 32KB
+            dictionary = content_bytes[:self.dict_size]
         
         # Save dictionary
         dict_file = self.data_dir / f"{language}_dictionary.bin"
@@ -78,6 +93,7 @@ class DeflateDictionaryBuilder:
         # Save metadata
         metadata = {
             'dict_size': self.dict_size,
+            'method': self.method,
             'languages': list(results.keys()),
             'dictionary_files': results
         }
@@ -90,7 +106,14 @@ class DeflateDictionaryBuilder:
         return results
 
 def main():
-    builder = DeflateDictionaryBuilder()
+    parser = argparse.ArgumentParser(description='Build DEFLATE dictionaries for all languages')
+    parser.add_argument('--data-dir', default='public/data/programming_languages')
+    parser.add_argument('--dict-size', type=int, default=32768)
+    parser.add_argument('--method', choices=['repeat', 'gain'], default='repeat',
+                        help='Repeat the code up to the dictionary size, or pick substrings by estimated gain')
+    args = parser.parse_args()
+    
+    builder = DeflateDictionaryBuilder(args.data_dir, args.dict_size, args.method)
     builder.build_all_dictionaries()
 
 if __name__ == "__main__":
@@ -6,15 +6,17 @@ Uses bzip2's incremental compression to measure language similarity.
 
 import os
 import json
-import bz2
 import numpy as np
 from collections import defaultdict
 import argparse
 from pathlib import Path
 
+from compression_engine import Bz2Codec, CompressionDistanceEngine, IncrementalMetric
+
 class BZip2CompressionAnalyzer:
-    def __init__(self, data_dir="data/programming_languages"):
+    def __init__(self, data_dir="data/programming_languages", max_workers=None):
         self.data_dir = Path(data_dir)
+        self.max_workers = max_workers
         self.languages = []
         self.language_data = {}
         self.load_languages()
@@ -53,11 +55,6 @@ class BZip2CompressionAnalyzer:
                 if lang in self.languages:
                     self.languages.remove(lang)
     
-    def compress_bz2(self, data, level=9):
-        """Compress data using bzip2"""
-        data_bytes = data.encode('utf-8') if isinstance(data, str) else data
-        return bz2.compress(data_bytes, compresslevel=level)
-    
     def analyze_incremental_compression(self):
         """
         Analyze compression using incremental approach:
@@ -77,96 +74,62 @@ class BZip2CompressionAnalyzer:
             'distance_matrix': {}
         }
         
-        # Get baseline compression sizes
-        print("  Computing baseline compression...")
+        # Baseline compression of every language, then incremental compression of every
+        # pair: self-compression uses the first half as context for the second half,
+        # cross-compression truncates both to the same size
+        print("  Computing baseline and incremental compression...")
+        metric = IncrementalMetric(Bz2Codec(level=9), separator="\n\n", truncate=True, split_self=True)
+        matrix = CompressionDistanceEngine(metric, self.max_workers).run(
+            {lang: self.language_data[lang] for lang in self.languages}
+        )
+        
         for lang in self.languages:
-            try:
-                data = self.language_data[lang]
-                original_size = len(data.encode('utf-8'))
-                compressed = self.compress_bz2(data)
-                compressed_size = len(compressed)
-                
-                results['baseline_sizes'][lang] = {
-                    'original': original_size,
-                    'compressed': compressed_size,
-                    'ratio': compressed_size / original_size
-                }
-                
-                print(f"    {lang}: {original_size} → {compressed_size} bytes ({compressed_size/original_size:.3f})")
-                
-            except Exception as e:
-                print(f"    Error with {lang}: {e}")
+            artifacts = matrix['items'][lang]
+            if 'error' in artifacts:
+                print(f"    Error with {lang}: {artifacts['error']}")
+                continue
+            
+            original_size = artifacts['original']
+            compressed_size = artifacts['compressed']
+            
+            results['baseline_sizes'][lang] = {
+                'original': original_size,
+                'compressed': compressed_size,
+                'ratio': compressed_size / original_size
+            }
+            
+            print(f"    {lang}: {original_size} → {compressed_size} bytes ({compressed_size/original_size:.3f})")
         
-        # Test incremental compression
-        print("  Testing incremental compression...")
         for lang1 in self.languages:
             results['incremental_compression'][lang1] = {}
             results['compression_benefits'][lang1] = {}
             
             for lang2 in self.languages:
-                try:
-                    if lang1 == lang2:
-                        # Self-compression: use first half to compress second half
-                        data = self.language_data[lang1]
-                        mid = len(data) // 2
-                        first_half = data[:mid]
-                        second_half = data[mid:]
-                        
-                        # Baseline: compress second half alone
-                        baseline = self.compress_bz2(second_half)
-                        baseline_size = len(baseline)
-                        
-                        # Incremental: compress both halves together
-                        combined = self.compress_bz2(first_half + "\n\n" + second_half)
-                        combined_size = len(combined)
-                        first_compressed = self.compress_bz2(first_half)
-                        first_size = len(first_compressed)
-                        
-                        # Incremental cost of second half
-                        incremental_size = combined_size - first_size
-                        
-                    else:
-                        # Cross-compression
-                        data1 = self.language_data[lang1]
-                        data2 = self.language_data[lang2]
-                        
-                        # Truncate to same size
-                        min_len = min(len(data1), len(data2))
-                        data1 = data1[:min_len]
-                        data2 = data2[:min_len]
-                        
-                        # Baseline: compress lang2 alone
-                        baseline = self.compress_bz2(data2)
-                        baseline_size = len(baseline)
-                        
-                        # Incremental: compress lang1+lang2
-                        combined = self.compress_bz2(data1 + "\n\n" + data2)
-                        combined_size = len(combined)
-                        lang1_compressed = self.compress_bz2(data1)
-                        lang1_size = len(lang1_compressed)
-                        
-                        # Incremental cost of lang2 given lang1
-                        incremental_size = combined_size - lang1_size
-                    
-                    # Calculate benefit ratio
-                    if baseline_size > 0:
-                        benefit_ratio = incremental_size / baseline_size
-                    else:
-                        benefit_ratio = 1.0
-                    
-                    results['incremental_compression'][lang1][lang2] = {
-                        'baseline': baseline_size,
-                        'incremental': incremental_size,
-                        'benefit_ratio': benefit_ratio,
-                        'bytes_saved': baseline_size - incremental_size,
-                        'improvement': max(0, 1.0 - benefit_ratio)
-                    }
-                    
-                    results['compression_benefits'][lang1][lang2] = benefit_ratio
-                    
-                except Exception as e:
-                    print(f"    Error {lang1}→{lang2}: {e}")
+                entry = matrix['pairs'][lang1][lang2]
+                if 'error' in entry:
+                    print(f"    Error {lang1}→{lang2}: {entry['error']}")
                     results['compression_benefits'][lang1][lang2] = 1.0
+                    continue
+                
+                # Incremental cost of lang2 given lang1
+                baseline_size = entry['baseline']
+                incremental_size = entry['incremental']
+                
+                # Calculate benefit ratio
+                if baseline_size > 0:
+                    benefit_ratio = incremental_size / baseline_size
+                else:
+                    benefit_ratio = 1.0
+                
+                results['incremental_compression'][lang1][lang2] = {
+                    'baseline': baseline_size,
+                    'incremental': incremental_size,
+                    'benefit_ratio': benefit_ratio,
+                    'bytes_saved': baseline_size - incremental_size,
+                    'improvement': max(0, 1.0 - benefit_ratio)
+                }
+                
+                results['compression_benefits'][lang1][lang2] = benefit_ratio
         
         # Calculate distance matrix
         print("  Calculating distance matrix...")
@@ -266,10 +229,11 @@ class BZip2CompressionAnalyzer:
 def main():
     parser = argparse.ArgumentParser(description='Run BZip2 compression analysis')
     parser.add_argument('--data-dir', default='data/programming_languages')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for the pairwise compressions (default: CPU count)')
     
     args = parser.parse_args()
     
-    analyzer = BZip2CompressionAnalyzer(args.data_dir)
+    analyzer = BZip2CompressionAnalyzer(args.data_dir, args.workers)
     results = analyzer.run_analysis()
     
     if results:
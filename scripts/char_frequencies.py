@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Character (code point) histograms for the KL analyses.
+
+Counting characters with collections.Counter is slow on large texts, and the
+resulting dicts have to be re-aligned for every divergence computation. Here a
+text becomes an array of code points (ASCII UTF-8 bytes are used as they are,
+without decoding), np.bincount counts it, and the counts land in the columns of
+an Alphabet: a code point → column mapping that only ever appends, so count
+vectors made at different times share one layout. A vector made before new
+characters were added is just shorter; pad() extends it with zeros.
+
+CharHistogram accumulates the counts of a text arriving in chunks.
+"""
+
+import threading
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+Content = Union[str, bytes, bytearray, memoryview]
+
+class Alphabet:
+    """Stable code point → column mapping: columns are assigned in order of first appearance"""
+
+    def __init__(self):
+        self.code_points = np.zeros(0, dtype=np.int64)
+        self._columns = np.full(128, -1, dtype=np.int64)  # code point -> column, -1 when unseen
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.code_points)
+
+    def columns(self, code_points: np.ndarray) -> np.ndarray:
+        """Columns of distinct code points, appending the ones not seen before"""
+        with self._lock:
+            if len(code_points) and code_points.max() >= len(self._columns):
+                grown = np.full(int(code_points.max()) + 1, -1, dtype=np.int64)
+                grown[:len(self._columns)] = self._columns
+                self._columns = grown
+            columns = self._columns[code_points]
+            new = code_points[columns < 0]
+            if len(new):
+                self._columns[new] = np.arange(len(self.code_points), len(self.code_points) + len(new))
+                self.code_points = np.concatenate([self.code_points, new])
+                columns = self._columns[code_points]
+            return columns
+
+    def chars(self) -> List[str]:
+        """Character of each column"""
+        return [chr(code_point) for code_point in self.code_points.tolist()]
+
+# Alphabet shared by all count vectors of this process
+GLOBAL_ALPHABET = Alphabet()
+
+def code_points(content: Content) -> np.ndarray:
+    """Code points of a text or of UTF-8 bytes (e.g. a CorpusFile's encoded view)"""
+    if not isinstance(content, str):
+        data = np.frombuffer(content, dtype=np.uint8)
+        if not len(data) or data.max() < 0x80:
+            return data  # ASCII: bytes are code points
+        content = str(content, 'utf-8', 'replace')
+    return np.frombuffer(content.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+
+def count_vector(content: Content, alphabet: Alphabet = GLOBAL_ALPHABET) -> np.ndarray:
+    """Character counts of content, one per column of alphabet"""
+    histogram = np.bincount(code_points(content))
+    present = np.flatnonzero(histogram)
+    columns = alphabet.columns(present)
+    counts = np.zeros(len(alphabet), dtype=np.int64)
+    counts[columns] = histogram[present]
+    return counts
+
+def pad(vector: np.ndarray, size: int) -> np.ndarray:
+    """vector extended with zeros to size columns (for vectors made before the alphabet grew)"""
+    if len(vector) >= size:
+        return vector
+    return np.concatenate([vector, np.zeros(size - len(vector), dtype=vector.dtype)])
+
+def stack_counts(vectors: Sequence[np.ndarray], alphabet: Alphabet = GLOBAL_ALPHABET) -> np.ndarray:
+    """(N × |alphabet|) array of count vectors"""
+    if not vectors:
+        return np.zeros((0, len(alphabet)), dtype=np.int64)
+    return np.stack([pad(vector, len(alphabet)) for vector in vectors])
+
+def stack_frequencies(vectors: Sequence[np.ndarray], alphabet: Alphabet = GLOBAL_ALPHABET) -> np.ndarray:
+    """(N × |alphabet|) character frequencies of count vectors (rows of empty texts are zero)"""
+    counts = stack_counts(vectors, alphabet)
+    return counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+
+def frequency_vectors(contents: Sequence[Content], alphabet: Alphabet = GLOBAL_ALPHABET) -> np.ndarray:
+    """(N × |alphabet|) character frequencies of the contents"""
+    return stack_frequencies([count_vector(content, alphabet) for content in contents], alphabet)
+
+def counts_entropy(counts: np.ndarray) -> float:
+    """Shannon entropy (bits) of the character distribution of a count vector"""
+    counts = counts[counts > 0]
+    if not len(counts):
+        return 0.0
+    p = counts / counts.sum()
+    return float(-np.sum(p * np.log2(p)))
+
+def frequency_dict(counts: np.ndarray, total: Optional[int] = None,
+                   alphabet: Alphabet = GLOBAL_ALPHABET) -> Dict[str, float]:
+    """{character: frequency} of a count vector (total defaults to the sum of the counts)"""
+    total = int(counts.sum()) if total is None else total
+    if not total:
+        return {}
+    present = np.flatnonzero(counts)
+    return {chr(code_point): count / total
+            for code_point, count in zip(alphabet.code_points[present].tolist(), counts[present].tolist())}
+
+def character_frequencies(content: Content, alphabet: Alphabet = GLOBAL_ALPHABET) -> Dict[str, float]:
+    """{character: frequency} of content, like {c: n / len(text) for c, n in Counter(text).items()}"""
+    return frequency_dict(count_vector(content, alphabet), alphabet=alphabet)
+
+class CharHistogram:
+    """Character counts of a text fed in chunks, e.g. while it is being downloaded"""
+
+    def __init__(self, alphabet: Alphabet = GLOBAL_ALPHABET):
+        self.alphabet = alphabet
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def update(self, chunk: Content) -> 'CharHistogram':
+        """Add the characters of chunk (a str, or bytes ending on a character boundary)"""
+        counts = count_vector(chunk, self.alphabet)
+        self.counts = pad(self.counts, len(counts))
+        self.counts[:len(counts)] += counts
+        return self
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def vector(self) -> np.ndarray:
+        """Counts in the alphabet's current layout"""
+        return pad(self.counts, len(self.alphabet))
+
+    def frequencies(self, total: Optional[int] = None) -> Dict[str, float]:
+        return frequency_dict(self.counts, total, self.alphabet)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Check that stride costs from compressibility_profile add up: for every codec and
+stride, the strides of a document plus the end of the stream track a one-shot
+compression of the document within a block header per stride, and a single
+stride covering the document costs the one-shot size (the block that ends the
+stream aside).
+
+Usage: python check_compressibility_profile.py [text files or directories]
+(default: the programming language and three-category corpora)
+Exits with status 1 if a check fails.
+"""
+
+import sys
+from pathlib import Path
+
+from compression_engine import DeflateCodec, ZstdCodec
+from compressibility_profile import StreamSizer
+
+DEFAULT_PATHS = ["public/data/programming_languages", "public/data/three_categories"]
+STRIDES = [256, 1024, 4096]
+
+# Most a block header (deflate's Huffman tables, zstd's entropy tables) costs, per stride
+HEADER_BYTES = {'deflate': 64, 'zstd': 128}
+# Empty final block after the last flush (deflate: 3 bits plus alignment, zstd: 3 bytes)
+END_BLOCK_BYTES = 3
+
+def one_shot_size(codec: str, data: bytes) -> int:
+    """Compressed size of data in one call, with the stream's parameters"""
+    if codec == 'deflate':
+        return DeflateCodec(level=9, raw=True).size(data)
+    # A streaming frame, like StreamSizer's: ZstdCodec.size knows the content size and tunes for it
+    stream = ZstdCodec(level=9).compressor().compressobj()
+    return len(stream.compress(data) + stream.flush())
+
+def check_document(name: str, data: bytes, failures: list):
+    for codec in HEADER_BYTES:
+        one_shot = one_shot_size(codec, data)
+
+        sizer = StreamSizer(codec)
+        whole = sizer.feed(data) + sizer.finish()
+        if not 0 <= whole - one_shot <= END_BLOCK_BYTES:
+            failures.append(f"{name} {codec}: one stride costs {whole} bytes, one shot {one_shot}")
+
+        for stride in STRIDES:
+            sizer = StreamSizer(codec)
+            strides = [sizer.feed(data[start:start + stride]) for start in range(0, len(data), stride)]
+            total = sum(strides)
+            end = sizer.finish()
+
+            # The end of the stream is a few bytes: anything more was held back from the strides
+            if end > 8:
+                failures.append(f"{name} {codec}/{stride}: {end} bytes left for the end of the stream")
+            allowance = HEADER_BYTES[codec] * len(strides)
+            if not one_shot - 8 <= total + end <= one_shot + allowance:
+                failures.append(f"{name} {codec}/{stride}: strides sum to {total + end} bytes, "
+                                f"one shot {one_shot} (+{allowance} allowed)")
+
+def main():
+    paths = [Path(path) for path in (sys.argv[1:] or DEFAULT_PATHS)]
+    files = []
+    for path in paths:
+        files.extend(sorted(path.glob("*.txt")) if path.is_dir() else [path])
+
+    failures = []
+    for path in files:
+        data = path.read_bytes()
+        if data:
+            check_document(path.name, data, failures)
+    print(f"Checked {len(files)} files, codecs {', '.join(HEADER_BYTES)}, strides {STRIDES}")
+
+    if failures:
+        for failure in failures:
+            print(f"  FAIL {failure}")
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\nAll checks passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Check that a context model's probabilities form a distribution: for a sample of
+contexts in each document's second half, the probabilities a model of its first
+half gives to every symbol of the alphabet sum to 1.
+
+Usage: python check_context_model.py [text files or directories]
+(default: the programming language and three-category corpora)
+Exits with status 1 if a check fails.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from char_frequencies import code_points
+from context_model import ContextModel
+
+DEFAULT_PATHS = ["public/data/programming_languages", "public/data/three_categories"]
+ORDER = 4
+CONTEXTS_PER_FILE = 20
+TOLERANCE = 1e-9
+
+def context_masses(model: ContextModel, test: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Total probability over the alphabet after the ORDER symbols before each position"""
+    alphabet = np.union1d(model.alphabet, test)
+    masses = []
+    for position in positions:
+        # One candidate continuation per row: the context followed by each symbol. Contexts
+        # only reach ORDER symbols back, so the rows can be scored as one sequence.
+        candidates = np.empty((len(alphabet), ORDER + 1), dtype=test.dtype)
+        candidates[:, :ORDER] = test[position - ORDER:position]
+        candidates[:, ORDER] = alphabet
+        probabilities = model.probabilities(model.keys(candidates.ravel()), len(alphabet))
+        masses.append(probabilities[ORDER::ORDER + 1].sum())
+    return np.array(masses)
+
+def main():
+    paths = [Path(path) for path in (sys.argv[1:] or DEFAULT_PATHS)]
+    files = []
+    for path in paths:
+        files.extend(sorted(path.glob("*.txt")) if path.is_dir() else [path])
+
+    rng = np.random.default_rng(0)
+    failures = []
+    for path in files:
+        symbols = code_points(path.read_text(encoding='utf-8', errors='replace'))
+        train, test = symbols[:len(symbols) // 2], symbols[len(symbols) // 2:]
+        if len(test) <= ORDER:
+            continue
+        model = ContextModel(ORDER).fit(train)
+        positions = rng.choice(np.arange(ORDER, len(test)), min(CONTEXTS_PER_FILE, len(test) - ORDER),
+                               replace=False)
+        masses = context_masses(model, test, positions)
+        worst = float(np.abs(masses - 1).max())
+        if worst > TOLERANCE:
+            failures.append(f"{path.name}: probability mass of a context is {masses[np.abs(masses - 1).argmax()]:.6f}")
+    print(f"Checked {len(files)} files, {CONTEXTS_PER_FILE} contexts each, order {ORDER}")
+
+    if failures:
+        for failure in failures:
+            print(f"  FAIL {failure}")
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\nAll checks passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Check AsyncURLFetcher against a local stand-in HTTP server (http.server on
+127.0.0.1, no network access needed): downloads, cache hits, conditional GETs
+answered with 304, changed pages, HTML stripping and budget-truncated fetches.
+
+Usage: python check_url_fetcher.py
+Exits with status 1 if a check fails.
+"""
+
+import asyncio
+import hashlib
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from url_fetcher import AsyncURLFetcher
+
+PLAIN_TEXT = "first line\r\nsecond line\rthird line\n" * 200
+HTML_PAGE = "<!DOCTYPE html><html><head><style>p { color: red; }</style></head>" \
+            "<body><p>Hello <b>world</b></p><script>var x = 1;</script></body></html>"
+
+class StandInServer:
+    """Serves pages from a dict with strong ETags and answers If-None-Match with 304"""
+
+    def __init__(self):
+        self.pages = {}  # path -> (content type, body bytes)
+        self.requests = []  # (path, If-None-Match header, status)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                content_type, body = server.pages[self.path]
+                etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+                if_none_match = self.headers.get('If-None-Match')
+                status = 304 if if_none_match == etag else 200
+                server.requests.append((self.path, if_none_match, status))
+
+                self.send_response(status)
+                self.send_header('ETag', etag)
+                if status == 304:
+                    self.end_headers()
+                    return
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+async def run_checks(server: StandInServer, cache_dir: str):
+    failures = []
+
+    def check(name, condition):
+        print(f"  {'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    server.pages['/plain.txt'] = ('text/plain; charset=utf-8', PLAIN_TEXT.encode('utf-8'))
+    server.pages['/page.html'] = ('text/html; charset=utf-8', HTML_PAGE.encode('utf-8'))
+    plain_url = server.url('/plain.txt')
+
+    print("Download and cache hit:")
+    async with AsyncURLFetcher(cache_dir=cache_dir, max_age=3600) as fetcher:
+        first = await fetcher.fetch(plain_url)
+        check("first fetch returns the page unchanged", first == PLAIN_TEXT)
+        check("first fetch downloads", fetcher.stats['downloaded'] == 1)
+
+        requests_before = len(server.requests)
+        cached = await fetcher.fetch(plain_url)
+        check("fresh cache entry is used without a request", len(server.requests) == requests_before)
+        check("cache hit returns the same text (\\r\\n and \\r kept)", cached == first)
+
+    print("Conditional GET:")
+    async with AsyncURLFetcher(cache_dir=cache_dir, max_age=0) as fetcher:
+        revalidated = await fetcher.fetch(plain_url)
+        path, if_none_match, status = server.requests[-1]
+        check("stale entry sends If-None-Match", if_none_match is not None)
+        check("unchanged page is answered with 304", status == 304)
+        check("304 counts as revalidated", fetcher.stats['revalidated'] == 1 and fetcher.stats['downloaded'] == 0)
+        check("304 reuses the cached text", revalidated == PLAIN_TEXT)
+
+        changed_text = PLAIN_TEXT.replace("second", "2nd")
+        server.pages['/plain.txt'] = ('text/plain; charset=utf-8', changed_text.encode('utf-8'))
+        changed = await fetcher.fetch(plain_url)
+        check("changed page is downloaded again", server.requests[-1][2] == 200 and changed == changed_text)
+
+    print("HTML and character budget:")
+    async with AsyncURLFetcher(cache_dir=cache_dir, max_age=3600) as fetcher:
+        text = await fetcher.fetch(server.url('/page.html'))
+        check("HTML is stripped of tags, scripts and styles", text.strip() == "Hello world")
+
+        server.pages['/long.txt'] = ('text/plain', PLAIN_TEXT.encode('utf-8'))
+        truncated = await fetcher.fetch(server.url('/long.txt'), max_chars=100)
+        check("budget truncates the text", len(truncated) == 100)
+        requests_before = len(server.requests)
+        full = await fetcher.fetch(server.url('/long.txt'))
+        check("truncated text is not cached", len(server.requests) == requests_before + 1 and full == PLAIN_TEXT)
+
+    return failures
+
+def main():
+    with StandInServer() as server, tempfile.TemporaryDirectory() as cache_dir:
+        print(f"Stand-in server at {server.url('/')}")
+        failures = asyncio.run(run_checks(server, cache_dir))
+
+    if failures:
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\nAll checks passed")
+
+if __name__ == "__main__":
+    main()
@@ -6,16 +6,21 @@ Compression-based similarity analysis for programming languages.
 import os
 import json
 import numpy as np
-import zstandard as zstd
-import gzip
-from collections import Counter, defaultdict
+from collections import defaultdict
 import math
 import argparse
 from pathlib import Path
 
+from char_frequencies import character_frequencies, count_vector, counts_entropy, stack_frequencies
+from compression_engine import (
+    CompressionDistanceEngine, ConcatenationMetric, GzipCodec, IncrementalMetric, ZstdCodec
+)
+from kl_matrix import kl_matrices
+
 class CompressionAnalyzer:
-    def __init__(self, data_dir="data/programming_languages"):
+    def __init__(self, data_dir="data/programming_languages", max_workers=None):
         self.data_dir = Path(data_dir)
+        self.max_workers = max_workers
         self.languages = []
         self.load_languages()
     
@@ -39,9 +44,7 @@ class CompressionAnalyzer:
     
     def calculate_character_frequencies(self, text):
         """Calculate character frequency distribution"""
-        counter = Counter(text)
-        total = sum(counter.values())
-        return {char: count / total for char, count in counter.items()}
+        return character_frequencies(text)
     
     def kl_divergence(self, p_freq, q_freq):
         """Calculate KL divergence between two character frequency distributions"""
@@ -86,48 +89,48 @@ class CompressionAnalyzer:
         """Baseline analysis using character frequencies and KL divergence"""
         print("Running baseline compression analysis...")
         
-        # Load all language data and calculate frequencies
+        # Load all language data and count characters (count vectors share one column layout)
         language_data = {}
-        language_freqs = {}
+        language_counts = {}
         
         for lang in self.languages:
             try:
                 data = self.load_language_data(lang)
                 language_data[lang] = data
-                language_freqs[lang] = self.calculate_character_frequencies(data)
-                print(f"  Loaded {lang}: {len(data)} characters, entropy = {self.entropy(language_freqs[lang]):.3f}")
+                language_counts[lang] = count_vector(data)
+                print(f"  Loaded {lang}: {len(data)} characters, entropy = {counts_entropy(language_counts[lang]):.3f}")
             except Exception as e:
                 print(f"  Error loading {lang}: {e}")
         
         # Calculate distance matrix
         results = {
-            'languages': list(language_freqs.keys()),
+            'languages': list(language_counts.keys()),
             'distance_matrix': {},
             'kl_matrix': {},
             'cross_entropy_matrix': {},
             'entropy_values': {}
         }
         
-        for lang in language_freqs:
-            results['entropy_values'][lang] = self.entropy(language_freqs[lang])
+        for lang in language_counts:
+            results['entropy_values'][lang] = counts_entropy(language_counts[lang])
+        
+        # KL (missing characters at 2^{-10}, as in kl_divergence) and cross-entropy for all pairs at once
+        languages = results['languages']
+        distributions = stack_frequencies([language_counts[lang] for lang in languages])
+        matrices = kl_matrices(distributions, min_freq=2**(-10), renormalize=False)
+        kl = matrices['kl'].tolist()
+        cross_entropy = matrices['cross_entropy'].tolist()
+        symmetric = matrices['symmetric'].tolist()
         
-        for lang1 in language_freqs:
+        for i, lang1 in enumerate(languages):
             results['distance_matrix'][lang1] = {}
             results['kl_matrix'][lang1] = {}
             results['cross_entropy_matrix'][lang1] = {}
             
-            for lang2 in language_freqs:
-                kl_12 = self.kl_divergence(language_freqs[lang1], language_freqs[lang2])
-                kl_21 = self.kl_divergence(language_freqs[lang2], language_freqs[lang1])
-                
-                cross_ent_12 = self.cross_entropy(language_freqs[lang1], language_freqs[lang2])
-                
-                # Symmetrized distance
-                symmetric_distance = (kl_12 + kl_21) / 2
-                
-                results['kl_matrix'][lang1][lang2] = kl_12
-                results['cross_entropy_matrix'][lang1][lang2] = cross_ent_12
-                results['distance_matrix'][lang1][lang2] = symmetric_distance
+            for j, lang2 in enumerate(languages):
+                results['kl_matrix'][lang1][lang2] = kl[i][j]
+                results['cross_entropy_matrix'][lang1][lang2] = cross_entropy[i][j]
+                results['distance_matrix'][lang1][lang2] = symmetric[i][j]
         
         return results
     
@@ -149,44 +152,21 @@ class CompressionAnalyzer:
             'distance_matrix': {}
         }
         
-        # Calculate compression ratios for each pair using concatenation approach
+        # Calculate compression ratios for each pair using concatenation approach:
+        # how much better does concatenation compress vs separate compression
+        metric = ConcatenationMetric(ZstdCodec(level=3), separator="\n", truncate=False)
+        matrix = CompressionDistanceEngine(metric, self.max_workers).run(language_data)
+        
         for lang1 in language_data:
             results['compression_ratios'][lang1] = {}
             
-            try:
-                # Use concatenation approach instead of dictionary training
-                compressor = zstd.ZstdCompressor(level=3)
-                
-                for lang2 in language_data:
-                    # Method 1: Compress lang2 alone
-                    lang2_data = language_data[lang2].encode('utf-8')
-                    lang2_compressed = compressor.compress(lang2_data)
-                    
-                    # Method 2: Compress lang1+lang2 concatenated
-                    concat_data = (language_data[lang1] + "\n" + language_data[lang2]).encode('utf-8')
-                    concat_compressed = compressor.compress(concat_data)
-                    
-                    # Compression ratio based on how much extra space lang2 needs when added to lang1
-                    lang1_size = len(language_data[lang1].encode('utf-8'))
-                    lang2_size = len(lang2_data)
-                    concat_size = len(concat_compressed)
-                    
-                    # Estimate: if languages are similar, concatenation should compress better
-                    expected_separate_size = len(compressor.compress(language_data[lang1].encode('utf-8'))) + len(lang2_compressed)
-                    
-                    # Ratio: how much better does concatenation compress vs separate compression
-                    if expected_separate_size > 0:
-                        ratio = concat_size / expected_separate_size
-                    else:
-                        ratio = 1.0
-                    
-                    results['compression_ratios'][lang1][lang2] = ratio
-                    
-                print(f"  Processed {lang1}")
-                
-            except Exception as e:
-                print(f"  Error with {lang1}: {e}")
-                results['compression_ratios'][lang1] = {lang2: 1.0 for lang2 in language_data}
+            for lang2 in language_data:
+                entry = matrix['pairs'][lang1][lang2]
+                if 'error' in entry:
+                    print(f"  Error with {lang1}+{lang2}: {entry['error']}")
+                    results['compression_ratios'][lang1][lang2] = 1.0
+                else:
+                    results['compression_ratios'][lang1][lang2] = entry['benefit_ratio']
         
         # Calculate symmetric distance matrix
         for lang1 in language_data:
@@ -218,29 +198,23 @@ class CompressionAnalyzer:
             'distance_matrix': {}
         }
         
-        # Calculate compression ratios
+        # Compress lang2 with lang1 as prefix (pseudo-dictionary)
+        metric = IncrementalMetric(GzipCodec(level=9), separator="\n")
+        matrix = CompressionDistanceEngine(metric, self.max_workers).run(language_data)
+        
         for lang1 in language_data:
             results['compression_ratios'][lang1] = {}
             
-            # Create a "dictionary" by concatenating lang1 data
-            dict_text = language_data[lang1]
-            
             for lang2 in language_data:
-                # Compress lang2 with lang1 as prefix (pseudo-dictionary)
-                combined_text = dict_text + "\n" + language_data[lang2]
-                
-                original_size = len(language_data[lang2].encode('utf-8'))
+                entry = matrix['pairs'][lang1][lang2]
+                original_size = entry.get('original', 0)
                 
                 # Skip if either language is empty
-                if original_size == 0 or len(dict_text) == 0:
+                if original_size == 0 or len(language_data[lang1]) == 0:
                     ratio = 1.0
                 else:
-                    compressed = gzip.compress(combined_text.encode('utf-8'))
-                    dict_compressed = gzip.compress(dict_text.encode('utf-8'))
-                    
                     # Effective compression of lang2
-                    effective_compressed_size = len(compressed) - len(dict_compressed)
-                    ratio = max(0.1, effective_compressed_size / original_size)  # Avoid negative ratios
+                    ratio = max(0.1, entry['incremental'] / original_size)  # Avoid negative ratios
                 
                 results['compression_ratios'][lang1][lang2] = ratio
         
@@ -310,10 +284,11 @@ def main():
     parser.add_argument('--output', default='compression_analysis_results.json', help='Output file for results')
     parser.add_argument('--method', choices=['baseline', 'zstd', 'gzip', 'all'], default='all', 
                        help='Compression method to run')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for the pairwise compressions (default: CPU count)')
     
     args = parser.parse_args()
     
-    analyzer = CompressionAnalyzer(args.data_dir)
+    analyzer = CompressionAnalyzer(args.data_dir, args.workers)
     
     if args.method == 'all':
         analyzer.run_all_analyses(args.output)
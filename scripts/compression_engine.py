@@ -0,0 +1,575 @@
+#!/usr/bin/env python3
+"""
+Pluggable compression-distance engine for the language-similarity experiments.
+
+An experiment is a Codec (how bytes get compressed: deflate, gzip, bzip2, lzma,
+zstd, lz4) combined with a PairMetric (which compressions a pair of corpus items
+needs: concatenation, incremental/context compression, dictionary
+cross-compression, NCD, generalized divergence). CompressionDistanceEngine
+- prepares every item once (original and compressed size, dictionaries, test
+  slices), so per-item work is never repeated inside the pair loop
+- schedules every unordered pair once; a pair job returns both directions, so
+  work shared by (a, b) and (b, a) such as truncated baselines is done once, and
+  a symmetric metric computes its result once for both directions
+- spreads item and pair jobs over a process pool (or runs in-process with a
+  single worker)
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+import subprocess
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+from corpus_store import CorpusFile
+from dictionary_builder import create_frequency_dictionary
+
+# Item contents: texts, UTF-8 bytes, or memoryviews of them (CorpusFiles are resolved to theirs)
+Data = Union[str, bytes, memoryview]
+
+def as_bytes(data: Data) -> Union[bytes, memoryview]:
+    return data.encode('utf-8') if isinstance(data, str) else data
+
+def join_data(first: Data, separator: str, second: Data) -> bytes:
+    """first + separator + second as UTF-8 bytes (texts are joined before encoding, like the scripts did)"""
+    if isinstance(first, str):
+        return (first + separator + second).encode('utf-8')
+    return b''.join((first, separator.encode('utf-8'), second))
+
+# ---------------------------------------------------------------------------
+# Codecs
+
+class Codec:
+    """Compressed sizes of byte strings, optionally with a preset dictionary or a prefix context"""
+    name = 'codec'
+    supports_dictionary = False
+
+    def size(self, data: bytes, dictionary: Optional[bytes] = None) -> int:
+        raise NotImplementedError
+
+    def size_after(self, prefix: bytes, data: bytes) -> int:
+        """Output size for data when the compressor has already consumed prefix (whose output is discarded)"""
+        raise NotImplementedError(f"{self.name} cannot continue from a prefix")
+
+class DeflateCodec(Codec):
+    name = 'deflate'
+    supports_dictionary = True
+
+    def __init__(self, level: int = 6, raw: bool = False, strategy: int = zlib.Z_DEFAULT_STRATEGY):
+        """raw=False gives zlib.compress() output, raw=True headerless DEFLATE as in the dictionary analyses"""
+        self.level = level
+        self.wbits = -zlib.MAX_WBITS if raw else zlib.MAX_WBITS
+        self.strategy = strategy
+
+    def compressor(self, dictionary: Optional[bytes] = None):
+        if dictionary:
+            return zlib.compressobj(self.level, zlib.DEFLATED, self.wbits, 8, self.strategy, zdict=dictionary)
+        return zlib.compressobj(self.level, zlib.DEFLATED, self.wbits, 8, self.strategy)
+
+    def size(self, data: bytes, dictionary: Optional[bytes] = None) -> int:
+        comp = self.compressor(dictionary)
+        return len(comp.compress(data) + comp.flush())
+
+    def size_after(self, prefix: bytes, data: bytes) -> int:
+        comp = self.compressor()
+        comp.compress(prefix)
+        return len(comp.compress(data) + comp.flush())
+
+class GzipCodec(Codec):
+    name = 'gzip'
+
+    def __init__(self, level: int = 9):
+        self.level = level
+
+    def size(self, data: bytes, dictionary: Optional[bytes] = None) -> int:
+        if dictionary:
+            raise ValueError("gzip does not support dictionaries")
+        return len(gzip.compress(data, compresslevel=self.level))
+
+class Bz2Codec(Codec):
+    name = 'bz2'
+
+    def __init__(self, level: int = 9):
+        self.level = level
+
+    def size(self, data: bytes, dictionary: Optional[bytes] = None) -> int:
+        if dictionary:
+            raise ValueError("bzip2 does not support dictionaries")
+        return len(bz2.compress(data, compresslevel=self.level))
+
+    def size_after(self, prefix: bytes, data: bytes) -> int:
+        comp = bz2.BZ2Compressor(self.level)
+        comp.compress(prefix)
+        return len(comp.compress(data) + comp.flush())
+
+class LzmaCodec(Codec):
+    name = 'lzma'
+
+    def __init__(self, preset: int = 6):
+        self.preset = preset
+
+    def size(self, data: bytes, dictionary: Optional[bytes] = None) -> int:
+        if dictionary:
+            raise ValueError("lzma does not support dictionaries")
+        return len(lzma.compress(data, preset=self.preset))
+
+    def size_after(self, prefix: bytes, data: bytes) -> int:
+        comp = lzma.LZMACompressor(preset=self.preset)
+        comp.compress(prefix)
+        return len(comp.compress(data) + comp.flush())
+
+class ZstdCodec(Codec):
+    name = 'zstd'
+    supports_dictionary = True
+
+    def __init__(self, level: int = 3):
+        if zstd is None:
+            raise ImportError("zstandard is required for the zstd codec")
+        self.level = level
+        self.compressors = {}  # dictionary bytes (None without) -> compressor, built once per process
+
+    def __getstate__(self):
+        # Compressors cannot be pickled; every worker process builds its own
+        return {**self.__dict__, 'compressors': {}}
+
+    def compressor(self, dictionary: Optional[bytes] = None):
+        """Compressor for dictionary, with the dictionary's tables precomputed on first use"""
+        key = dictionary or None
+        compressor = self.compressors.get(key)
+        if compressor is None:
+            if key is None:
+                compressor = zstd.ZstdCompressor(level=self.level)
+            else:
+                zstd_dict = zstd.ZstdCompressionDict(key)
+                zstd_dict.precompute_compress(level=self.level)
+                compressor = zstd.ZstdCompressor(dict_data=zstd_dict, level=self.level)
+            self.compressors[key] = compressor
+        return compressor
+
+    def size(self, data: bytes, dictionary: Optional[bytes] = None) -> int:
+        return len(self.compressor(dictionary).compress(data))
+
+    @staticmethod
+    def train_dictionary(samples: Sequence[bytes], dict_size: int) -> bytes:
+        return zstd.train_dictionary(dict_size, list(samples)).as_bytes()
+
+# lz4 CLI frames: 4 MB independent blocks, each preceded by a 4-byte size; the overhead is the
+# magic number and frame descriptor (7 bytes), the end mark (4) and the content checksum (4)
+LZ4_BLOCK_SIZE = 4 * 1024 * 1024
+LZ4_BLOCK_HEADER = 4
+LZ4_FRAME_OVERHEAD = 7 + 4 + 4
+
+class Lz4Codec(Codec):
+    """
+    Sizes of the frames the lz4 command-line tool writes (level 1, dictionaries as with
+    lz4 -D). The 'library' backend compresses in-process with the python lz4 module;
+    the 'cli' backend, used when the module is missing, pipes data through the lz4
+    tool and writes each dictionary to a file only once per process.
+    """
+    name = 'lz4'
+    supports_dictionary = True
+
+    def __init__(self, backend: Optional[str] = None):
+        if backend is None:
+            backend = 'library' if lz4_library_available() else 'cli'
+        if backend not in ('library', 'cli'):
+            raise ValueError(f"Unknown lz4 backend: {backend}")
+        self.backend = backend
+        self.dictionary_dir = None  # cli backend: directory of the dictionary files
+        self.dictionary_files = {}  # cli backend: dictionary -> file path
+
+    def __getstate__(self):
+        # Dictionary files belong to the process that wrote them
+        return {**self.__dict__, 'dictionary_dir': None, 'dictionary_files': {}}
+
+    def size(self, data: bytes, dictionary: Optional[bytes] = None) -> int:
+        if self.backend == 'cli':
+            return self._size_cli(data, dictionary)
+        return self._size_library(data, dictionary)
+
+    @staticmethod
+    def _size_library(data: bytes, dictionary: Optional[bytes]) -> int:
+        import lz4.block
+        import lz4.frame
+
+        if not dictionary:
+            return len(lz4.frame.compress(data, block_size=lz4.frame.BLOCKSIZE_MAX4MB, block_linked=False,
+                                          content_checksum=True, store_size=False))
+
+        # lz4.frame has no dictionary support: compress the frame's blocks with lz4.block
+        view = memoryview(data)
+        size = LZ4_FRAME_OVERHEAD
+        for start in range(0, len(view), LZ4_BLOCK_SIZE):
+            block = view[start:start + LZ4_BLOCK_SIZE]
+            compressed_size = len(lz4.block.compress(block, store_size=False, dict=dictionary))
+            # Blocks that do not shrink are stored uncompressed
+            size += LZ4_BLOCK_HEADER + min(compressed_size, len(block))
+        return size
+
+    def _size_cli(self, data: bytes, dictionary: Optional[bytes]) -> int:
+        cmd = ['lz4', '-q', '-c']
+        if dictionary:
+            cmd += ['-D', self._dictionary_file(dictionary)]
+        return len(subprocess.run(cmd, input=bytes(data), capture_output=True, check=True).stdout)
+
+    def _dictionary_file(self, dictionary: bytes) -> str:
+        path = self.dictionary_files.get(dictionary)
+        if path is None:
+            if self.dictionary_dir is None:
+                self.dictionary_dir = tempfile.TemporaryDirectory(prefix='lz4_dictionaries_')
+            path = os.path.join(self.dictionary_dir.name, f"{len(self.dictionary_files)}.dict")
+            with open(path, 'wb') as f:
+                f.write(dictionary)
+            self.dictionary_files[dictionary] = path
+        return path
+
+def lz4_library_available() -> bool:
+    try:
+        import lz4.block
+        import lz4.frame
+        return True
+    except ImportError:
+        return False
+
+CODECS = {
+    'deflate': DeflateCodec,
+    'gzip': GzipCodec,
+    'bz2': Bz2Codec,
+    'lzma': LzmaCodec,
+    'zstd': ZstdCodec,
+    'lz4': Lz4Codec,
+}
+
+def get_codec(name: str, **params) -> Codec:
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec: {name} (available: {', '.join(CODECS)})")
+    return CODECS[name](**params)
+
+# ---------------------------------------------------------------------------
+# Metrics
+
+Item = Tuple[Data, Dict]  # (content, artifacts from PairMetric.prepare)
+
+class PairMetric:
+    """
+    Compressions needed for a pair of items. pair() returns the results for both
+    directions, (a, b) and (b, a); self_pair() the result for an item with itself.
+    Symmetric metrics compute their result once and return it for both directions.
+    """
+
+    def __init__(self, codec: Codec):
+        self.codec = codec
+
+    def prepare(self, item_id: str, data: Data) -> Dict:
+        """Per-item artifacts, computed once and passed to every pair job"""
+        data_bytes = as_bytes(data)
+        return {'original': len(data_bytes), 'compressed': self.codec.size(data_bytes)}
+
+    def pair(self, a: Item, b: Item) -> Tuple[Optional[Dict], Optional[Dict]]:
+        raise NotImplementedError
+
+    def self_pair(self, a: Item) -> Optional[Dict]:
+        return self.pair(a, a)[0]
+
+    def truncated_parts(self, a: Item, b: Item) -> Tuple[Data, Data, int, int]:
+        """Both contents truncated to the shorter one, with their compressed sizes"""
+        (data_a, artifacts_a), (data_b, artifacts_b) = a, b
+        length = min(len(data_a), len(data_b))
+        return (data_a[:length], data_b[:length],
+                self.part_size(data_a, artifacts_a, length), self.part_size(data_b, artifacts_b, length))
+
+    def part_size(self, data: Data, artifacts: Dict, length: int) -> int:
+        if length == len(data):
+            return artifacts['compressed']
+        return self.codec.size(as_bytes(data[:length]))
+
+class ConcatenationMetric(PairMetric):
+    """C(a + separator + b) against C(a) + C(b)"""
+
+    def __init__(self, codec: Codec, separator: str = "\n\n", truncate: bool = True):
+        super().__init__(codec)
+        self.separator = separator
+        self.truncate = truncate
+
+    def pair(self, a, b):
+        if self.truncate:
+            part_a, part_b, size_a, size_b = self.truncated_parts(a, b)
+        else:
+            part_a, part_b, size_a, size_b = a[0], b[0], a[1]['compressed'], b[1]['compressed']
+        return self.concatenate(part_a, part_b, size_a, size_b), self.concatenate(part_b, part_a, size_b, size_a)
+
+    def self_pair(self, a):
+        return self.concatenate(a[0], a[0], a[1]['compressed'], a[1]['compressed'])
+
+    def concatenate(self, first: Data, second: Data, first_size: int, second_size: int) -> Dict:
+        concatenated = join_data(first, self.separator, second)
+        concat_size = self.codec.size(concatenated)
+        separate_size = first_size + second_size
+        return {
+            'concat_original': len(concatenated),
+            'concat_compressed': concat_size,
+            'separate_compressed': separate_size,
+            'benefit_ratio': concat_size / separate_size if separate_size > 0 else 1.0,
+            'bytes_saved': separate_size - concat_size
+        }
+
+class IncrementalMetric(PairMetric):
+    """
+    Extra compressed bytes the target needs after the prefix: C(prefix + separator + target) - C(prefix).
+    With truncate both texts are cut to the shorter length; with split_self an item is
+    compared with itself by using its first half as prefix for its second half.
+    """
+
+    def __init__(self, codec: Codec, separator: str = "\n\n", truncate: bool = False, split_self: bool = False):
+        super().__init__(codec)
+        self.separator = separator
+        self.truncate = truncate
+        self.split_self = split_self
+
+    def pair(self, a, b):
+        if self.truncate:
+            part_a, part_b, size_a, size_b = self.truncated_parts(a, b)
+        else:
+            part_a, part_b, size_a, size_b = a[0], b[0], a[1]['compressed'], b[1]['compressed']
+        return self.incremental(part_a, part_b, size_a, size_b), self.incremental(part_b, part_a, size_b, size_a)
+
+    def self_pair(self, a):
+        data, artifacts = a
+        if not self.split_self:
+            return self.incremental(data, data, artifacts['compressed'], artifacts['compressed'])
+        mid = len(data) // 2
+        first, second = data[:mid], data[mid:]
+        return self.incremental(first, second, self.codec.size(as_bytes(first)), self.codec.size(as_bytes(second)))
+
+    def incremental(self, prefix: Data, target: Data, prefix_size: int, target_size: int) -> Dict:
+        combined_size = self.codec.size(join_data(prefix, self.separator, target))
+        return {
+            'original': len(as_bytes(target)),
+            'baseline': target_size,
+            'prefix': prefix_size,
+            'combined': combined_size,
+            'incremental': combined_size - prefix_size
+        }
+
+class DictionaryMetric(PairMetric):
+    """
+    Compressed size of the target with the source as dictionary, against its size without.
+
+    Dictionaries are either per item (given as bytes, or built by build_dictionary during
+    prepare) and used on the full target, or derived from the pair itself: the source text
+    truncated to the target's length, or for an item with itself its first half as
+    dictionary for its second half. mode 'zdict' passes the dictionary to the codec,
+    'prefix' primes a streaming compressor with it.
+    """
+
+    def __init__(self, codec: Codec, dictionaries: Optional[Dict[str, bytes]] = None,
+                 build_dictionary: Optional[Callable[[Data], bytes]] = None, mode: str = 'zdict'):
+        super().__init__(codec)
+        if mode not in ('zdict', 'prefix'):
+            raise ValueError(f"Unknown dictionary mode: {mode}")
+        self.dictionaries = dictionaries
+        self.build_dictionary = build_dictionary
+        self.mode = mode
+
+    @property
+    def item_dictionaries(self) -> bool:
+        return self.dictionaries is not None or self.build_dictionary is not None
+
+    def prepare(self, item_id: str, data: Data) -> Dict:
+        artifacts = super().prepare(item_id, data)
+        if self.dictionaries is not None:
+            artifacts['dictionary'] = self.dictionaries.get(item_id)
+        elif self.build_dictionary is not None:
+            try:
+                artifacts['dictionary'] = self.build_dictionary(data)
+            except Exception as e:
+                # Items without a dictionary can still be compressed with the others'
+                artifacts['dictionary'] = None
+                artifacts['dictionary_error'] = str(e)
+        return artifacts
+
+    def pair(self, a, b):
+        if self.item_dictionaries:
+            return self.with_item_dictionary(a, b), self.with_item_dictionary(b, a)
+        part_a, part_b, size_a, size_b = self.truncated_parts(a, b)
+        return (self.with_dictionary(as_bytes(part_a), as_bytes(part_b), size_b),
+                self.with_dictionary(as_bytes(part_b), as_bytes(part_a), size_a))
+
+    def self_pair(self, a):
+        if self.item_dictionaries:
+            return self.with_item_dictionary(a, a)
+        data = a[0]
+        mid = len(data) // 2
+        second = as_bytes(data[mid:])
+        return self.with_dictionary(as_bytes(data[:mid]), second, self.codec.size(second))
+
+    def with_item_dictionary(self, source: Item, target: Item) -> Optional[Dict]:
+        dictionary = source[1]['dictionary']
+        if dictionary is None:
+            return None
+        return self.with_dictionary(dictionary, as_bytes(target[0]), target[1]['compressed'])
+
+    def with_dictionary(self, dictionary: bytes, target: bytes, baseline_size: int) -> Dict:
+        if self.mode == 'prefix':
+            dict_size = self.codec.size_after(dictionary, target)
+        else:
+            dict_size = self.codec.size(target, dictionary=dictionary)
+        return {'original': len(target), 'baseline': baseline_size, 'with_dict': dict_size}
+
+class NCDMetric(PairMetric):
+    """Normalized compression distance (C(ab) - min(C(a), C(b))) / max(C(a), C(b)), clamped to [0, 1]"""
+
+    def __init__(self, codec: Codec, separator: str = ""):
+        super().__init__(codec)
+        self.separator = separator
+
+    def pair(self, a, b):
+        return self.ncd(a, b), self.ncd(b, a)
+
+    def ncd(self, a: Item, b: Item) -> Dict:
+        size_a, size_b = a[1]['compressed'], b[1]['compressed']
+        size_ab = self.codec.size(join_data(a[0], self.separator, b[0]))
+        max_size = max(size_a, size_b)
+        distance = max(0.0, min(1.0, (size_ab - min(size_a, size_b)) / max_size)) if max_size else 0.0
+        return {'compressed_ab': size_ab, 'distance': distance}
+
+class GeneralizedDivergenceMetric(PairMetric):
+    """
+    Bits per character lost on the last 50% of each item when compressing it with the other
+    item's dictionary (built from the first 50%) instead of its own, averaged over both directions.
+    """
+
+    def __init__(self, codec: Optional[Codec] = None, dict_size: int = 1024,
+                 build_dictionary: Callable[[str, int], bytes] = create_frequency_dictionary):
+        super().__init__(codec or DeflateCodec(level=9, raw=True, strategy=zlib.Z_FIXED))
+        self.dict_size = dict_size
+        self.build_dictionary = build_dictionary
+
+    def prepare(self, item_id: str, data: Data) -> Dict:
+        content_bytes = as_bytes(data)
+        test_bytes = str(content_bytes[len(content_bytes) // 2:], 'utf-8', 'replace').encode('utf-8')
+        dictionary = self.build_dictionary(data, self.dict_size)
+        return {
+            'dictionary': dictionary,
+            'test_bytes': test_bytes,
+            'self_compressed': self.codec.size(test_bytes, dictionary=dictionary)
+        }
+
+    def pair(self, a, b):
+        divergence = (self.bits_lost(a[1], b[1]) + self.bits_lost(b[1], a[1])) / 2
+        result = {'divergence': divergence}
+        return result, result
+
+    def self_pair(self, a):
+        return {'divergence': 0.0}
+
+    def bits_lost(self, target: Dict, source: Dict) -> float:
+        test_bytes = target['test_bytes']
+        cross_size = self.codec.size(test_bytes, dictionary=source['dictionary'])
+        return cross_size * 8 / len(test_bytes) - target['self_compressed'] * 8 / len(test_bytes)
+
+# ---------------------------------------------------------------------------
+# Engine
+
+# Metric, corpus and prepared artifacts of a pool worker, installed once by the initializer
+_worker_state = {}
+
+def _init_worker(metric: PairMetric, corpus: Dict[str, Union[Data, CorpusFile]], artifacts: Optional[Dict[str, Dict]]):
+    _worker_state['metric'] = metric
+    # CorpusFiles arrive as paths and are mapped again here
+    _worker_state['corpus'] = {item_id: data.encoded if isinstance(data, CorpusFile) else data
+                               for item_id, data in corpus.items()}
+    _worker_state['artifacts'] = artifacts
+
+def _prepare_items(item_ids: List[str]) -> List[Tuple[str, Dict]]:
+    metric, corpus = _worker_state['metric'], _worker_state['corpus']
+    prepared = []
+    for item_id in item_ids:
+        try:
+            artifacts = metric.prepare(item_id, corpus[item_id])
+        except Exception as e:
+            artifacts = {'error': str(e)}
+        prepared.append((item_id, artifacts))
+    return prepared
+
+def _run_pairs(pairs: List[Tuple[str, str]]) -> List[Tuple[str, str, Optional[Dict], Optional[Dict]]]:
+    metric, corpus, artifacts = _worker_state['metric'], _worker_state['corpus'], _worker_state['artifacts']
+    results = []
+    for id_a, id_b in pairs:
+        item_a, item_b = (corpus[id_a], artifacts[id_a]), (corpus[id_b], artifacts[id_b])
+        try:
+            for artifacts_item in (item_a[1], item_b[1]):
+                if 'error' in artifacts_item:
+                    raise RuntimeError(artifacts_item['error'])
+            if id_a == id_b:
+                result_ab = result_ba = metric.self_pair(item_a)
+            else:
+                result_ab, result_ba = metric.pair(item_a, item_b)
+        except Exception as e:
+            result_ab = result_ba = {'error': str(e)}
+        results.append((id_a, id_b, result_ab, result_ba))
+    return results
+
+def _chunks(jobs: List, count: int) -> List[List]:
+    size = max(1, -(-len(jobs) // count))
+    return [jobs[i:i + size] for i in range(0, len(jobs), size)]
+
+class CompressionDistanceEngine:
+    def __init__(self, metric: PairMetric, max_workers: Optional[int] = None, chunks_per_worker: int = 4):
+        """
+        Args:
+            metric: Pair metric (with its codec) to compute
+            max_workers: Worker processes (default: CPU count); 1 runs in this process
+            chunks_per_worker: Pair jobs are sent to the pool in this many batches per worker
+        """
+        self.metric = metric
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunks_per_worker = chunks_per_worker
+
+    def run(self, corpus: Dict[str, Union[Data, CorpusFile]], include_diagonal: bool = True) -> Dict:
+        """
+        Compute the metric for every ordered pair of corpus items.
+
+        Returns {'items': {id: artifacts}, 'pairs': {id_a: {id_b: result}}} in corpus
+        order. A pair result is None when the metric has nothing for that direction
+        (e.g. a dictionary could not be built), or {'error': message} when it failed.
+        """
+        item_ids = list(corpus)
+        artifacts = dict(self._map(_prepare_items, item_ids, (self.metric, corpus, None)))
+
+        start = 0 if include_diagonal else 1
+        pairs = [(id_a, id_b) for i, id_a in enumerate(item_ids) for id_b in item_ids[i + start:]]
+        results = {}
+        for id_a, id_b, result_ab, result_ba in self._map(_run_pairs, pairs, (self.metric, corpus, artifacts)):
+            results[id_a, id_b] = result_ab
+            results[id_b, id_a] = result_ba
+
+        return {
+            'items': artifacts,
+            'pairs': {
+                id_a: {id_b: results[id_a, id_b] for id_b in item_ids if (id_a, id_b) in results}
+                for id_a in item_ids
+            }
+        }
+
+    def _map(self, func, jobs: List, initargs: Tuple) -> List:
+        """Run func over batches of jobs, in-process or on a pool whose workers receive initargs once"""
+        if self.max_workers == 1 or len(jobs) <= 1:
+            _init_worker(*initargs)
+            try:
+                return func(jobs)
+            finally:
+                _worker_state.clear()
+
+        batches = _chunks(jobs, self.max_workers * self.chunks_per_worker)
+        with ProcessPoolExecutor(self.max_workers, initializer=_init_worker, initargs=initargs) as pool:
+            return [result for batch in pool.map(func, batches) for result in batch]
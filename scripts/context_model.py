@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Order-k context models (interpolated Witten-Bell, as in PPM) over code points,
+and a compressor-free divergence built on them.
+
+Character KL only compares order-0 statistics, and the compression metrics
+inherit codec quirks (static Huffman, 32KB windows). A context model trained on
+text A gives the cross-entropy of text B under A in bits per character: how
+well A's order-0..k statistics predict B.
+
+Contexts (the k preceding code points) and (context, symbol) pairs are hashed
+to 64 bits and counted exactly, one sorted key array per order: training is a
+few np.unique calls, and predicting every position of B is a few np.searchsorted
+lookups per order over B's distinct (sorted) contexts. Two keys only collide
+with probability about 2**-64, so the probabilities of a context sum to 1 over
+the alphabet. Probabilities blend from order 0 (itself blended with a uniform
+distribution) up to order k:
+
+    P_k(s | c) = (n(c, s) + t(c) · P_{k-1}(s | c')) / (n(c) + t(c))
+
+with n(c) the occurrences of context c, n(c, s) those followed by s, and t(c)
+the distinct symbols seen after c. Unseen contexts fall back to the lower order.
+"""
+
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from char_frequencies import Content, code_points
+from compression_engine import PairMetric
+
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+SYMBOL_MULTIPLIER = np.uint64(0xC2B2AE3D27D4EB4F)
+
+# Hashes of a text's contexts and (context, symbol) pairs, each (order + 1) × n
+Hashes = Tuple[np.ndarray, np.ndarray]
+
+def context_hashes(symbols: np.ndarray, order: int) -> Hashes:
+    """
+    Hash of the k code points before each position (row k, for k = 0..order) and of
+    that context together with the code point at the position. Row k is only
+    meaningful from position k on.
+    """
+    symbols = symbols.astype(np.uint64)
+    contexts = np.zeros((order + 1, len(symbols)), dtype=np.uint64)
+    for k in range(1, order + 1):
+        contexts[k] = contexts[k - 1]
+        contexts[k, k:] = (contexts[k, k:] ^ (symbols[:-k] + np.uint64(1))) * HASH_MULTIPLIER
+        contexts[k] ^= contexts[k] >> np.uint64(29)
+    pairs = (contexts ^ ((symbols + np.uint64(1)) * SYMBOL_MULTIPLIER)) * HASH_MULTIPLIER
+    return contexts, pairs
+
+# Per order k = 0..order: the distinct context hashes of a text's positions k and on,
+# each position's index among them, and the same for (context, symbol) pairs
+TextKeys = List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]
+
+def text_keys(symbols: np.ndarray, order: int) -> TextKeys:
+    """Sorted distinct contexts and pairs of a text, so lookups search each one once, in order"""
+    contexts, pairs = context_hashes(symbols, order)
+    keys = []
+    for k in range(order + 1):
+        context_keys, context_index = np.unique(contexts[k, k:], return_inverse=True)
+        pair_keys, pair_index = np.unique(pairs[k, k:], return_inverse=True)
+        keys.append((context_keys, context_index, pair_keys, pair_index))
+    return keys
+
+def lookup(keys: np.ndarray, values: np.ndarray, queries: np.ndarray, default: float) -> np.ndarray:
+    """Value of every query in sorted keys, default for queries not among them"""
+    if not len(keys):
+        return np.full(len(queries), default, dtype=values.dtype)
+    index = np.minimum(np.searchsorted(keys, queries), len(keys) - 1)
+    return np.where(keys[index] == queries, values[index], default)
+
+class ContextModel:
+    def __init__(self, order: int = 4):
+        """
+        Args:
+            order: Longest context, in characters
+        """
+        self.order = order
+        self.alphabet = np.zeros(0, dtype=np.uint32)
+        # Per order: sorted context keys with their scale and escape, sorted pair keys with their counts
+        self.context_keys, self.scale, self.escape = [], [], []
+        self.pair_keys, self.pair_counts = [], []
+
+    def fit(self, content: Union[Content, np.ndarray]) -> 'ContextModel':
+        """Count the contexts of a training text (or of its code points)"""
+        symbols = content if isinstance(content, np.ndarray) else code_points(content)
+        self.alphabet = np.unique(symbols)
+
+        self.context_keys, self.scale, self.escape = [], [], []
+        self.pair_keys, self.pair_counts = [], []
+        for context_keys, context_index, pair_keys, pair_index in text_keys(symbols, self.order):
+            context_counts = np.bincount(context_index, minlength=len(context_keys))
+            # Distinct symbols seen after each context: one per distinct pair
+            pair_context = np.zeros(len(pair_keys), dtype=np.intp)
+            pair_context[pair_index] = context_index
+            context_types = np.bincount(pair_context, minlength=len(context_keys))
+
+            # Per context: P_k(s | c) = n(c, s) · scale(c) + escape(c) · P_{k-1}(s | c');
+            # unseen contexts (scale 0, escape 1) pass the lower order through
+            totals = context_counts + context_types
+            self.context_keys.append(context_keys)
+            self.scale.append(1 / totals)
+            self.escape.append(context_types / totals)
+            self.pair_keys.append(pair_keys)
+            self.pair_counts.append(np.bincount(pair_index, minlength=len(pair_keys)))
+        return self
+
+    def keys(self, content: Union[Content, np.ndarray]) -> TextKeys:
+        """Contexts and pairs of a text; the same for every model of this order"""
+        symbols = content if isinstance(content, np.ndarray) else code_points(content)
+        return text_keys(symbols, self.order)
+
+    def probabilities(self, keys: TextKeys, alphabet_size: int) -> np.ndarray:
+        """Probability of the symbol at every position, given the contexts and pairs of the text"""
+        p = np.full(len(keys[0][1]), 1.0 / max(alphabet_size, 1))
+        for k, (context_keys, context_index, pair_keys, pair_index) in enumerate(keys):
+            # Positions before k have no order-k context
+            scale = lookup(self.context_keys[k], self.scale[k], context_keys, 0.0)[context_index]
+            escape = lookup(self.context_keys[k], self.escape[k], context_keys, 1.0)[context_index]
+            seen = lookup(self.pair_keys[k], self.pair_counts[k], pair_keys, 0)[pair_index] * scale
+            p[k:] = seen + escape * p[k:]
+        return p
+
+    def bits(self, content: Union[Content, np.ndarray]) -> np.ndarray:
+        """Code length in bits of every character of a text"""
+        symbols = content if isinstance(content, np.ndarray) else code_points(content)
+        alphabet_size = len(np.union1d(self.alphabet, symbols))
+        return -np.log2(self.probabilities(self.keys(symbols), alphabet_size))
+
+    def cross_entropy(self, content: Union[Content, np.ndarray]) -> float:
+        """Bits per character of a text under this model"""
+        bits = self.bits(content)
+        return float(bits.mean()) if len(bits) else 0.0
+
+def cross_entropy(content_b: Content, content_a: Content, order: int = 4) -> float:
+    """Bits per character of B under an order-k model trained on A"""
+    return ContextModel(order).fit(content_a).cross_entropy(content_b)
+
+class ContextModelMetric(PairMetric):
+    """
+    Bits per character lost on the last 50% of each item when predicting it with the other
+    item's context model (trained on the first 50%) instead of its own, averaged over both
+    directions. The compressor-free counterpart of GeneralizedDivergenceMetric.
+    """
+
+    def __init__(self, order: int = 4):
+        super().__init__(codec=None)
+        self.order = order
+
+    def prepare(self, item_id: str, data) -> Dict:
+        symbols = code_points(data)
+        model = ContextModel(self.order).fit(symbols[:len(symbols) // 2])
+        test = symbols[len(symbols) // 2:]
+        # Keys do not depend on the model, so each test half is hashed and sorted once
+        artifacts = {'model': model, 'test_keys': model.keys(test), 'test_alphabet': np.unique(test)}
+        artifacts['self_entropy'] = self.entropy(artifacts, artifacts)
+        return artifacts
+
+    def entropy(self, target: Dict, source: Dict) -> float:
+        """Bits per character of the target's test half under the source's model"""
+        test_keys = target['test_keys']
+        if not len(test_keys[0][1]):
+            return 0.0
+        model = source['model']
+        alphabet_size = len(np.union1d(model.alphabet, target['test_alphabet']))
+        return float(-np.log2(model.probabilities(test_keys, alphabet_size)).mean())
+
+    def pair(self, a, b):
+        entropy_ab, entropy_ba = self.entropy(a[1], b[1]), self.entropy(b[1], a[1])
+        divergence = ((entropy_ab - a[1]['self_entropy']) + (entropy_ba - b[1]['self_entropy'])) / 2
+        return ({'cross_entropy': entropy_ab, 'divergence': divergence},
+                {'cross_entropy': entropy_ba, 'divergence': divergence})
+
+    def self_pair(self, a):
+        return {'cross_entropy': a[1]['self_entropy'], 'divergence': 0.0}
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped corpus files for the analyzers.
+
+The analyzers used to read every file into a str and call .encode('utf-8') on it
+again in every pair computation. A CorpusFile maps the file read-only and
+exposes its UTF-8 content as a memoryview: when the file is valid UTF-8 without
+carriage returns (so it reads back unchanged in text mode) that is the mapping
+itself, otherwise the text is encoded once. The decoded text and the content
+hash are computed on first use and kept. Halves are zero-copy slices.
+
+CorpusFiles pickle as their path, so process pool workers map the same pages
+instead of receiving a copy of the content.
+"""
+
+import hashlib
+import mmap
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple, Union
+
+class CorpusFile:
+    def __init__(self, path: Union[str, Path], errors: str = 'replace'):
+        """
+        Args:
+            path: File to map
+            errors: UTF-8 decoding error handler for the text (like open(..., errors=errors))
+        """
+        self.path = Path(path)
+        self.errors = errors
+        self._open()
+
+    def _open(self):
+        with open(self.path, 'rb') as f:
+            # Empty files cannot be mapped
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.path.stat().st_size else None
+        self.data = memoryview(self._mmap) if self._mmap is not None else memoryview(b'')
+        self._text = None
+        self._encoded = None
+        self._content_hash = None
+
+    def __getstate__(self):
+        return {'path': self.path, 'errors': self.errors}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def __len__(self) -> int:
+        return len(self.encoded)
+
+    @property
+    def text(self) -> str:
+        """Content as open(path, 'r', encoding='utf-8', errors=errors).read() returns it"""
+        if self._text is None:
+            text = str(self.data, 'utf-8', self.errors)
+            if '\r' in text:
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+            self._text = text
+        return self._text
+
+    @property
+    def encoded(self) -> memoryview:
+        """UTF-8 encoding of text, without copying the file when it already is that"""
+        if self._encoded is None:
+            if self.data.obj.find(b'\r') >= 0 or not self._is_utf8():
+                self._encoded = memoryview(self.text.encode('utf-8', errors='replace'))
+            else:
+                self._encoded = self.data
+        return self._encoded
+
+    def _is_utf8(self) -> bool:
+        try:
+            str(self.data, 'utf-8')
+            return True
+        except UnicodeDecodeError:
+            return False
+
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 of the UTF-8 content"""
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha256(self.encoded).hexdigest()
+        return self._content_hash
+
+    def halves(self) -> Tuple[memoryview, memoryview]:
+        """First and last 50% of the UTF-8 content (split by bytes, as the dictionary experiments do)"""
+        mid = len(self.encoded) // 2
+        return self.encoded[:mid], self.encoded[mid:]
+
+    def test_half(self) -> Union[memoryview, bytes]:
+        """Last 50% of the UTF-8 content as it reads back after a lossy decode (see test_half())"""
+        return test_half(self.encoded)
+
+def utf8_content(content: Union[str, bytes, memoryview, CorpusFile]) -> Union[bytes, memoryview]:
+    """UTF-8 bytes of a text, a CorpusFile or already encoded content"""
+    if isinstance(content, CorpusFile):
+        return content.encoded
+    return content.encode('utf-8') if isinstance(content, str) else content
+
+def test_half(content_bytes: Union[bytes, memoryview]) -> Union[bytes, memoryview]:
+    """
+    Last 50% of UTF-8 content as it reads back after a lossy decode, i.e.
+    content_bytes[mid:].decode('utf-8', errors='replace').encode('utf-8'):
+    continuation bytes of a character cut by the split each become U+FFFD.
+    Zero-copy when the split falls on a character boundary.
+    """
+    second = content_bytes[len(content_bytes) // 2:]
+    cut = 0
+    while cut < min(3, len(second)) and 0x80 <= second[cut] < 0xC0:
+        cut += 1
+    if not cut:
+        return second
+    return '\ufffd'.encode('utf-8') * cut + second[cut:]
+
+class CorpusStore:
+    """Ordered collection of CorpusFiles by item id"""
+
+    def __init__(self):
+        self.files: Dict[str, CorpusFile] = {}
+
+    def add(self, item_id: str, path: Union[str, Path], errors: str = 'replace') -> CorpusFile:
+        self.files[item_id] = CorpusFile(path, errors)
+        return self.files[item_id]
+
+    def add_directory(self, directory: Union[str, Path], pattern: str = "*.txt",
+                      item_id: Optional[Callable[[Path], str]] = None, errors: str = 'replace') -> Dict[str, CorpusFile]:
+        """Add the files matching pattern in directory, with ids item_id(path) (default: the file stem)"""
+        added = {}
+        for path in Path(directory).glob(pattern):
+            key = item_id(path) if item_id else path.stem
+            added[key] = self.add(key, path, errors)
+        return added
+
+    def __getitem__(self, item_id: str) -> CorpusFile:
+        return self.files[item_id]
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.files
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.files)
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def items(self):
+        return self.files.items()
+
+    def texts(self) -> Dict[str, str]:
+        return {item_id: f.text for item_id, f in self.files.items()}
+
+    def total_bytes(self) -> int:
+        return sum(len(f) for f in self.files.values())
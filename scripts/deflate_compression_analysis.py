@@ -9,11 +9,16 @@ import json
 from pathlib import Path
 import numpy as np
 
+from compression_engine import CompressionDistanceEngine, DeflateCodec, DictionaryMetric
+from corpus_store import CorpusStore
+
 class DeflateCompressionAnalyzer:
-    def __init__(self, data_dir="public/data/programming_languages"):
+    def __init__(self, data_dir="public/data/programming_languages", max_workers=None):
         self.data_dir = Path(data_dir)
+        self.max_workers = max_workers
         self.languages = []
         self.dictionaries = {}
+        self.corpus = CorpusStore()
         self.language_data = {}
         self.load_metadata()
     
@@ -37,33 +42,9 @@ class DeflateCompressionAnalyzer:
         print("Loading language data...")
         for lang in self.languages:
             data_file = self.data_dir / f"{lang}_consolidated.txt"
-            with open(data_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            self.language_data[lang] = content.encode('utf-8')
+            self.language_data[lang] = self.corpus.add(lang, data_file, errors='strict')
             print(f"  {lang}: {len(self.language_data[lang])} bytes")
     
-    def compress_with_dict(self, data, dictionary=None):
-        """Compress data with optional dictionary using static Huffman"""
-        if dictionary:
-            comp = zlib.compressobj(
-                level=9,
-                method=zlib.DEFLATED,
-                wbits=-zlib.MAX_WBITS,  # Raw DEFLATE
-                memLevel=8,
-                strategy=zlib.Z_FIXED,  # Static Huffman
-                zdict=dictionary
-            )
-        else:
-            comp = zlib.compressobj(
-                level=9,
-                method=zlib.DEFLATED,
-                wbits=-zlib.MAX_WBITS,  # Raw DEFLATE
-                memLevel=8,
-                strategy=zlib.Z_FIXED   # Static Huffman
-            )
-        
-        return comp.compress(data) + comp.flush()
-    
     def analyze_compression(self):
         """Run full compression analysis"""
         print("\nRunning DEFLATE dictionary compression analysis...")
@@ -77,42 +58,44 @@ class DeflateCompressionAnalyzer:
             'distance_matrix': {}
         }
         
+        # Baseline compression (no dictionary) and dictionary compression for all pairs,
+        # using static Huffman codes so there is no adaptation
+        metric = DictionaryMetric(DeflateCodec(level=9, raw=True, strategy=zlib.Z_FIXED), dictionaries=self.dictionaries)
+        matrix = CompressionDistanceEngine(metric, self.max_workers).run(self.language_data)
+        
         # Step 1: Baseline compression (no dictionary)
-        print("\n1. Computing baseline compression (no dictionary)...")
+        print("\n1. Baseline compression (no dictionary):")
         for lang in self.languages:
-            data = self.language_data[lang]
-            compressed = self.compress_with_dict(data, dictionary=None)
-            ratio = len(compressed) / len(data)
+            original_size = matrix['items'][lang]['original']
+            compressed_size = matrix['items'][lang]['compressed']
+            ratio = compressed_size / original_size
             
             results['baseline_compression'][lang] = {
-                'original': len(data),
-                'compressed': len(compressed),
+                'original': original_size,
+                'compressed': compressed_size,
                 'ratio': ratio
             }
-            print(f"  {lang}: {len(data)} → {len(compressed)} ({ratio:.1%})")
+            print(f"  {lang}: {original_size} → {compressed_size} ({ratio:.1%})")
         
         # Step 2: Dictionary compression for all pairs
-        print("\n2. Computing dictionary compression for all pairs...")
+        print("\n2. Dictionary compression for all pairs:")
         for dict_lang in self.languages:
             results['dictionary_compression'][dict_lang] = {}
             results['compression_benefits'][dict_lang] = {}
             
             print(f"\n  Using {dict_lang} dictionary:")
-            dictionary = self.dictionaries[dict_lang]
             
             for target_lang in self.languages:
-                data = self.language_data[target_lang]
-                
-                # Compress with dictionary
-                compressed = self.compress_with_dict(data, dictionary=dictionary)
-                dict_ratio = len(compressed) / len(data)
+                entry = matrix['pairs'][dict_lang][target_lang]
+                compressed_size = entry['with_dict']
+                dict_ratio = compressed_size / entry['original']
                 
                 # Compare to baseline
-                baseline_size = results['baseline_compression'][target_lang]['compressed']
-                improvement = (baseline_size - len(compressed)) / baseline_size
+                baseline_size = entry['baseline']
+                improvement = (baseline_size - compressed_size) / baseline_size
                 
                 results['dictionary_compression'][dict_lang][target_lang] = {
-                    'compressed_size': len(compressed),
+                    'compressed_size': compressed_size,
                     'ratio': dict_ratio,
                     'improvement': improvement
                 }
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Shared DEFLATE dictionary construction for the divergence scripts.
+
+create_frequency_dictionary produces byte-for-byte the same dictionaries as the
+create_dictionary copies that used to live in each script, but counts n-grams
+in one vectorized pass over a code-point array and checks "already in the
+dictionary" against an incrementally maintained set of n-grams instead of
+re-joining and rescanning the dictionary string for every candidate.
+
+create_gain_dictionary fills a dictionary with the repeated substrings that
+save the most bytes, found through a suffix array of the content, instead of
+picking content by frequency heuristics or position.
+"""
+
+import heapq
+import re
+from collections import Counter
+from typing import List, Tuple, Union
+
+import numpy as np
+
+Content = Union[str, bytes, memoryview]
+
+def encode_content(content: Content) -> Union[bytes, memoryview]:
+    """UTF-8 bytes of content; bytes and memoryviews (e.g. CorpusFile.encoded) are used as they are"""
+    return content.encode('utf-8', errors='replace') if isinstance(content, str) else content
+
+def get_dictionary_source(content: Content) -> str:
+    """First 50% of the content (by UTF-8 bytes), the part dictionaries are built from"""
+    content_bytes = encode_content(content)
+    dict_source_end = len(content_bytes) // 2
+    return str(content_bytes[:dict_source_end], 'utf-8', 'replace')
+
+def is_useful_ngram(ngram: str) -> bool:
+    """Only alphanumeric n-grams or ones containing a space are dictionary candidates"""
+    return ngram.isalnum() or ' ' in ngram
+
+def count_ngrams(text: str):
+    """
+    Count the candidate bigrams and trigrams of text, most common first.
+
+    Every position is packed into one integer code (three 21-bit code points) and
+    counted with a single sort; bigram counts are aggregated from the trigram
+    prefixes. This matches the original loop over range(len(text) - 2), so the
+    final bigram is not counted, and ties are broken by first occurrence exactly
+    like Counter.most_common().
+    """
+    end = len(text) - 2
+    if end <= 0:
+        return [], []
+
+    code_points = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    codes = (code_points[:end] << 42) | (code_points[1:end + 1] << 21) | code_points[2:end + 2]
+    trigram_codes, trigram_first, trigram_counts = np.unique(codes, return_index=True, return_counts=True)
+
+    # Sorted trigram codes are also sorted by their bigram prefix, so groups are contiguous
+    bigram_codes, group_starts = np.unique(trigram_codes >> 21, return_index=True)
+    bigram_counts = np.add.reduceat(trigram_counts, group_starts)
+    bigram_first = np.minimum.reduceat(trigram_first, group_starts)
+
+    trigrams = ranked_ngrams(trigram_codes, trigram_first, trigram_counts, 3)
+    bigrams = ranked_ngrams(bigram_codes, bigram_first, bigram_counts, 2)
+    return bigrams, trigrams
+
+def ranked_ngrams(codes, first_positions, counts, n):
+    """Decode packed n-gram codes into (ngram, count) pairs ordered like Counter.most_common()"""
+    order = np.lexsort((first_positions, -counts.astype(np.int64)))
+    shifts = [21 * (n - 1 - k) for k in range(n)]
+
+    ranked = []
+    for code, count in zip(codes[order].tolist(), counts[order].tolist()):
+        ngram = ''.join(chr((code >> shift) & 0x1FFFFF) for shift in shifts)
+        # The usefulness filter only depends on the n-gram itself, so apply it per distinct key
+        if is_useful_ngram(ngram):
+            ranked.append((ngram, count))
+    return ranked
+
+class NgramIndex:
+    """Set of all bigrams and trigrams of a growing string, updated as pieces are appended"""
+
+    def __init__(self):
+        self.ngrams = set()
+        self.tail = ''
+
+    def append(self, piece: str):
+        # Only n-grams ending inside the new piece are new; they can start in the previous tail
+        text = self.tail + piece
+        for n in (2, 3):
+            for i in range(len(text) - n + 1):
+                self.ngrams.add(text[i:i + n])
+        self.tail = text[-2:]
+
+    def __contains__(self, ngram: str) -> bool:
+        return ngram in self.ngrams
+
+def create_frequency_dictionary(content: Content, dict_size: int = 1024) -> bytes:
+    """Create frequency-based dictionary from most common patterns in first 50% of content"""
+    dict_source_text = get_dictionary_source(content)
+
+    # 1. Words (most important)
+    words = re.findall(r'\b\w+\b', dict_source_text.lower())
+    word_counts = Counter(words)
+
+    # 2. Common bigrams and trigrams
+    bigrams, trigrams = count_ngrams(dict_source_text)
+
+    # 3. Build dictionary content prioritizing by frequency and usefulness
+    dictionary_content = []
+    index = NgramIndex()
+    current_size = 0
+
+    def add_piece(piece):
+        nonlocal current_size
+        piece_bytes = piece.encode('utf-8')
+        if current_size + len(piece_bytes) > dict_size:
+            return False
+        dictionary_content.append(piece)
+        index.append(piece)
+        current_size += len(piece_bytes)
+        return True
+
+    # Add most frequent words first (they compress best)
+    for word, count in word_counts.most_common():
+        if count < 2:  # Only words that appear multiple times
+            break
+        if not add_piece(f" {word} "):
+            break
+
+    # Add frequent trigrams that aren't already covered
+    for trigram, count in trigrams:
+        if count < 2:
+            break
+        if trigram not in index and not add_piece(trigram):
+            break
+
+    # Add frequent bigrams to fill remaining space
+    for bigram, count in bigrams:
+        if count < 3:
+            break
+        if bigram not in index and not add_piece(bigram):
+            break
+
+    return pad_dictionary(''.join(dictionary_content).encode('utf-8', errors='replace'), dict_size)
+
+def create_prefix_dictionary(content: Content, dict_size: int = 1024) -> bytes:
+    """Simple dictionary: the first dict_size bytes of the first 50% of content"""
+    content_bytes = encode_content(content)
+    dict_source = bytes(content_bytes[:len(content_bytes) // 2])
+    return pad_dictionary(dict_source, dict_size)
+
+def create_repeated_dictionary(content: Content, dict_size: int = 32768) -> bytes:
+    """Dictionary of exactly dict_size bytes: the content itself, repeated if it is shorter"""
+    content_bytes = encode_content(content)
+    if len(content_bytes) < dict_size:
+        content_bytes = bytes(content_bytes) * (dict_size // len(content_bytes) + 1)
+    return bytes(content_bytes[:dict_size])
+
+def pad_dictionary(dict_bytes: bytes, dict_size: int) -> bytes:
+    """Pad with null bytes (or truncate) to exactly dict_size bytes"""
+    if len(dict_bytes) < dict_size:
+        return dict_bytes + b'\x00' * (dict_size - len(dict_bytes))
+    return dict_bytes[:dict_size]
+
+# Gain-optimized dictionaries. DEFLATE matches are 3..258 bytes long; a match costs
+# roughly 3 bytes of codes and extra bits, so an occurrence of a dictionary string
+# saves about its length minus that.
+MIN_MATCH = 3
+MAX_MATCH = 258
+MATCH_COST = 3
+
+def suffix_array(data: bytes, depth: int = MAX_MATCH) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Suffixes of data sorted by (at least) their first depth bytes, by prefix doubling.
+    Also returns the rank arrays of every doubling step: ranks[j][i] identifies the
+    first 2**j bytes of suffix i, which lcp_array uses to compare suffixes.
+    """
+    n = len(data)
+    rank = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    ranks = [rank]
+    order = np.argsort(rank, kind='stable')
+    k = 1
+    while k < depth and n > 1:
+        second = np.full(n, -1, dtype=np.int64)
+        second[:n - k] = rank[k:]
+        order = np.lexsort((second, rank))
+        changed = (np.diff(rank[order]) != 0) | (np.diff(second[order]) != 0)
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.concatenate([[0], np.cumsum(changed)])
+        ranks.append(rank)
+        k *= 2
+        if rank[order[-1]] == n - 1:
+            break
+    return order, ranks
+
+def lcp_array(order: np.ndarray, ranks: List[np.ndarray], limit: int = MAX_MATCH) -> np.ndarray:
+    """Longest common prefix (capped at limit) of each pair of adjacent suffixes in order"""
+    n = len(order)
+    a, b = order[:-1], order[1:]
+    lcp = np.zeros(n - 1, dtype=np.int64)
+    for j in range(len(ranks) - 1, -1, -1):
+        step = 1 << j
+        pos_a, pos_b = a + lcp, b + lcp
+        valid = (pos_a + step <= n) & (pos_b + step <= n)
+        same = valid & (ranks[j][np.minimum(pos_a, n - 1)] == ranks[j][np.minimum(pos_b, n - 1)])
+        lcp += np.where(same, step, 0)
+    return np.minimum(lcp, limit)
+
+def repeated_substrings(order: np.ndarray, lcp: np.ndarray, min_length: int = MIN_MATCH + 1):
+    """
+    Maximal repeated substrings from the LCP intervals of a suffix array: yields
+    (length, first, last) where order[first:last + 1] are the start positions of
+    the substring's occurrences.
+    """
+    stack = [(0, 0)]  # (lcp, left bound)
+    for i, value in enumerate(np.append(lcp, 0).tolist(), 1):
+        left = i - 1
+        while value < stack[-1][0]:
+            length, left = stack.pop()
+            if length >= min_length:
+                yield length, left, i - 1
+        if value > stack[-1][0]:
+            stack.append((value, left))
+
+def optimize_dictionary(data: bytes, dict_size: int = 32768, max_length: int = MAX_MATCH) -> bytes:
+    """
+    Dictionary of exactly dict_size bytes made of the substrings of data with the
+    highest estimated gain: occurrences x (length - MATCH_COST), where occurrences
+    already covered by chosen substrings do not count again. Substrings are chosen
+    greedily from a suffix-array index and placed by increasing gain, so the most
+    valuable ones end up closest to the data, where DEFLATE distances are cheapest.
+    Space left over goes to the uncovered rest of data, then zero-filling at the front;
+    data that fits in dict_size is used whole.
+    """
+    data = bytes(data)
+    n = len(data)
+    if n <= dict_size:
+        # Every substring fits: data itself, as close to the compressed data as possible
+        return b'\x00' * (dict_size - n) + data
+
+    order, ranks = suffix_array(data, max_length)
+    lcp = lcp_array(order, ranks, max_length)
+
+    # Bytes of data covered by occurrences of chosen substrings
+    covered = np.zeros(n, dtype=np.uint8)
+    offsets = np.arange(max_length)
+
+    def occurrences(length, first, last):
+        """Positions covered by the occurrences of a substring, one row per occurrence"""
+        return order[first:last + 1, None] + offsets[:length]
+
+    def gain(length, first, last):
+        uncovered = length - covered[occurrences(length, first, last)].sum(axis=1, dtype=np.int64)
+        return int(np.maximum(uncovered - MATCH_COST, 0).sum())
+
+    # Upper bounds first; a popped candidate is re-scored and kept only if it still beats the next bound
+    min_length = MIN_MATCH + 1
+    heap = [(-(last - first + 1) * (length - MATCH_COST), length, first, last)
+            for length, first, last in repeated_substrings(order, lcp, min_length)]
+    heapq.heapify(heap)
+
+    chosen = []
+    selected = bytearray()  # chosen substrings, NUL-separated, for containment checks
+    size = 0
+    while heap and dict_size - size >= min_length:
+        bound, length, first, last = heapq.heappop(heap)
+        if size + length > dict_size:
+            continue
+        score = gain(length, first, last)
+        if score <= 0:
+            continue
+        if heap and score < -heap[0][0]:
+            heapq.heappush(heap, (-score, length, first, last))
+            continue
+
+        start = int(order[first])
+        piece = data[start:start + length]
+        if piece in selected:
+            continue
+        chosen.append((score, piece))
+        selected += piece + b'\x00'
+        size += length
+        covered[occurrences(length, first, last).ravel()] = 1
+
+    chosen.sort(key=lambda item: item[0])
+    body = b''.join(piece for _, piece in chosen)
+
+    # Remaining space goes to the parts of data no chosen substring covers (strings that
+    # occur once may still recur in other data), in front of the chosen substrings
+    filler = []
+    space = dict_size - len(body)
+    edges = np.flatnonzero(np.diff(np.concatenate([[1], covered, [1]])))
+    for start, end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+        if space < MIN_MATCH:
+            break
+        if end - start >= MIN_MATCH:
+            filler.append(data[start:min(end, start + space)])
+            space -= len(filler[-1])
+    body = b''.join(filler) + body
+    return b'\x00' * (dict_size - len(body)) + body
+
+def create_gain_dictionary(content: Content, dict_size: int = 32768) -> bytes:
+    """Gain-optimized dictionary of exactly dict_size bytes from all of content"""
+    return optimize_dictionary(encode_content(content), dict_size)
@@ -7,15 +7,17 @@ Train a dictionary on language A, then compress language B with that dictionary.
 import os
 import json
 import numpy as np
-import zlib
 from collections import defaultdict
 import math
 import argparse
 from pathlib import Path
 
+from compression_engine import CompressionDistanceEngine, DeflateCodec, DictionaryMetric
+
 class DictionaryCompressionAnalyzer:
-    def __init__(self, data_dir="data/programming_languages"):
+    def __init__(self, data_dir="data/programming_languages", max_workers=None):
         self.data_dir = Path(data_dir)
+        self.max_workers = max_workers
         self.languages = []
         self.language_data = {}
         self.load_languages()
@@ -59,31 +61,6 @@ class DictionaryCompressionAnalyzer:
                 if lang in self.languages:
                     self.languages.remove(lang)
     
-    def compress_with_dictionary(self, data, dictionary_data=None):
-        """
-        Compress data using zlib with optional dictionary.
-        If dictionary_data is provided, use it as compression context.
-        """
-        data_bytes = data.encode('utf-8') if isinstance(data, str) else data
-        
-        if dictionary_data is None:
-            # Regular compression without dictionary
-            return zlib.compress(data_bytes)
-        else:
-            # Compress with dictionary
-            dict_bytes = dictionary_data.encode('utf-8') if isinstance(dictionary_data, str) else dictionary_data
-            
-            # Create compressor with dictionary
-            compressor = zlib.compressobj(level=6, wbits=15)
-            
-            # "Prime" the compressor with dictionary data
-            # We do this by compressing the dictionary first, then the actual data
-            compressor.compress(dict_bytes)
-            compressed_data = compressor.compress(data_bytes)
-            compressed_data += compressor.flush()
-            
-            return compressed_data
-    
     def analyze_dictionary_compression(self):
         """
         Analyze compression using each language as a dictionary for others.
@@ -101,87 +78,61 @@ class DictionaryCompressionAnalyzer:
             'distance_matrix': {}
         }
         
-        # First, get baseline compression sizes (no dictionary)
-        print("  Computing baseline compression sizes...")
+        # Baseline compression sizes (no dictionary), then dictionary-based compression
+        # for all pairs: the dictionary language primes the compressor before the target.
+        # Self-compression uses half the data as dictionary for the other half,
+        # cross-compression truncates both to the same size for fair comparison
+        print("  Computing baseline and dictionary-based compression sizes...")
+        metric = DictionaryMetric(DeflateCodec(level=6), mode='prefix')
+        matrix = CompressionDistanceEngine(metric, self.max_workers).run(
+            {lang: self.language_data[lang] for lang in self.languages}
+        )
+        
         for lang in self.languages:
-            try:
-                data = self.language_data[lang]
-                original_size = len(data.encode('utf-8'))
-                compressed = self.compress_with_dictionary(data, dictionary_data=None)
-                compressed_size = len(compressed)
-                
-                results['baseline_sizes'][lang] = {
-                    'original': original_size,
-                    'compressed': compressed_size,
-                    'ratio': compressed_size / original_size
-                }
-                
-                print(f"    {lang}: {original_size} → {compressed_size} bytes ({compressed_size/original_size:.3f})")
-                
-            except Exception as e:
-                print(f"    Error with {lang}: {e}")
+            artifacts = matrix['items'][lang]
+            if 'error' in artifacts:
+                print(f"    Error with {lang}: {artifacts['error']}")
+                continue
+            
+            original_size = artifacts['original']
+            compressed_size = artifacts['compressed']
+            
+            results['baseline_sizes'][lang] = {
+                'original': original_size,
+                'compressed': compressed_size,
+                'ratio': compressed_size / original_size
+            }
+            
+            print(f"    {lang}: {original_size} → {compressed_size} bytes ({compressed_size/original_size:.3f})")
         
-        # Now test dictionary-based compression for all pairs
-        print("  Testing dictionary-based compression...")
         for dict_lang in self.languages:
             results['dictionary_sizes'][dict_lang] = {}
             results['compression_ratios'][dict_lang] = {}
             
-            print(f"    Using {dict_lang} as dictionary...")
-            
             for target_lang in self.languages:
-                try:
-                    if dict_lang == target_lang:
-                        # Self-compression: use half the data as dictionary, compress the other half
-                        data = self.language_data[target_lang]
-                        mid_point = len(data) // 2
-                        dict_data = data[:mid_point]
-                        target_data = data[mid_point:]
-                        
-                        # Baseline: compress second half without dictionary
-                        baseline_compressed = self.compress_with_dictionary(target_data, dictionary_data=None)
-                        baseline_size = len(baseline_compressed)
-                        
-                        # With dictionary: compress second half using first half as dictionary
-                        dict_compressed = self.compress_with_dictionary(target_data, dictionary_data=dict_data)
-                        dict_size = len(dict_compressed)
-                        
-                    else:
-                        # Cross-compression: use dict_lang as dictionary for target_lang
-                        dict_data = self.language_data[dict_lang]
-                        target_data = self.language_data[target_lang]
-                        
-                        # Truncate to same size for fair comparison
-                        min_length = min(len(dict_data), len(target_data))
-                        dict_data_truncated = dict_data[:min_length]
-                        target_data_truncated = target_data[:min_length]
-                        
-                        # Baseline: compress target without dictionary
-                        baseline_compressed = self.compress_with_dictionary(target_data_truncated, dictionary_data=None)
-                        baseline_size = len(baseline_compressed)
-                        
-                        # With dictionary: compress target using dict as context
-                        dict_compressed = self.compress_with_dictionary(target_data_truncated, dictionary_data=dict_data_truncated)
-                        dict_size = len(dict_compressed)
-                    
-                    # Calculate compression ratio (with dict / without dict)
-                    if baseline_size > 0:
-                        compression_ratio = dict_size / baseline_size
-                    else:
-                        compression_ratio = 1.0
-                    
-                    results['dictionary_sizes'][dict_lang][target_lang] = {
-                        'baseline_size': baseline_size,
-                        'dictionary_size': dict_size,
-                        'compression_ratio': compression_ratio,
-                        'bytes_saved': baseline_size - dict_size
-                    }
-                    
-                    results['compression_ratios'][dict_lang][target_lang] = compression_ratio
-                    
-                except Exception as e:
-                    print(f"      Error with {dict_lang}→{target_lang}: {e}")
+                entry = matrix['pairs'][dict_lang][target_lang]
+                if 'error' in entry:
+                    print(f"      Error with {dict_lang}→{target_lang}: {entry['error']}")
                     results['compression_ratios'][dict_lang][target_lang] = 1.0
+                    continue
+                
+                baseline_size = entry['baseline']
+                dict_size = entry['with_dict']
+                
+                # Calculate compression ratio (with dict / without dict)
+                if baseline_size > 0:
+                    compression_ratio = dict_size / baseline_size
+                else:
+                    compression_ratio = 1.0
+                
+                results['dictionary_sizes'][dict_lang][target_lang] = {
+                    'baseline_size': baseline_size,
+                    'dictionary_size': dict_size,
+                    'compression_ratio': compression_ratio,
+                    'bytes_saved': baseline_size - dict_size
+                }
+                
+                results['compression_ratios'][dict_lang][target_lang] = compression_ratio
         
         # Calculate distance matrix
         print("  Calculating distance matrix...")
@@ -284,10 +235,11 @@ class DictionaryCompressionAnalyzer:
 def main():
     parser = argparse.ArgumentParser(description='Run dictionary-based compression language similarity analysis')
     parser.add_argument('--data-dir', default='data/programming_languages', help='Directory containing language data')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for the pairwise compressions (default: CPU count)')
     
     args = parser.parse_args()
     
-    analyzer = DictionaryCompressionAnalyzer(args.data_dir)
+    analyzer = DictionaryCompressionAnalyzer(args.data_dir, args.workers)
     results = analyzer.run_analysis()
     
     if results:
@@ -8,78 +8,115 @@ import gradio as gr
 import json
 import zlib
 import numpy as np
-from collections import Counter
-import requests
-import re
-from typing import Dict, List, Tuple
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import os
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from reference_index import ReferenceIndex
+from char_frequencies import CharHistogram
+from dictionary_builder import create_frequency_dictionary
+from url_fetcher import BackgroundFetcher
+from result_cache import ResultCache, hash_reference_set, hash_text
+from stage_profiler import LatencyHistogram, current_profiler, profile_request, stage
+from reference_search import rank_references
+
+# Bump when any divergence computation changes, so cached results are not reused
+ALGORITHM_VERSION = "1"
+
+# Top-k queries run the deflate metrics on this many pre-filtered candidates per requested result
+TOP_K_CANDIDATE_FACTOR = 2
+
+# Batch progress shows this many of the most recent NDJSON rows; all rows go to a file
+BATCH_TAIL_ROWS = 20
+
+# Stage timings of recent requests, summarized by get_latency_summary
+latency_histogram = LatencyHistogram(int(os.environ.get("LATENCY_HISTORY_SIZE", "1000")))
+
+# URL fetcher shared by all requests, started on first use
+_url_fetcher = None
+
+def get_url_fetcher() -> BackgroundFetcher:
+    """Start the pooled URL fetcher (cache directory taken from URL_CACHE_DIR)"""
+    global _url_fetcher
+    if _url_fetcher is None:
+        _url_fetcher = BackgroundFetcher(cache_dir=os.environ.get("URL_CACHE_DIR", "url_cache"))
+    return _url_fetcher
 
 class DivergenceCalculator:
-    def __init__(self):
+    def __init__(self, max_prepared_texts: int = 64):
         self.min_freq = 2**-10
-        
-    def fetch_url_content(self, url: str) -> str:
-        """Fetch text content from URL"""
+        # prepare_text results by text hash, so pairwise calls prepare each text once
+        self.max_prepared_texts = max_prepared_texts
+        self.prepared_texts = OrderedDict()
+        
+    def fetch_url_content(self, url: str, max_chars: Optional[int] = None) -> str:
+        """Fetch text content from URL (pooled connections and on-disk text cache)"""
+        content, _ = self.stream_url_content(url, max_chars)
+        return content
+    
+    def stream_url_content(self, url: str, max_chars: Optional[int] = None) -> Tuple[str, CharHistogram]:
+        """
+        Fetch text content from URL, counting characters while the page is still downloading.
+        Returns the text (at most max_chars characters) and its character counts.
+        """
+        pieces = []
+        char_counts = CharHistogram()
+        timings = {}
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            # Try to extract text content from HTML if needed
-            content = response.text
-            
-            # Simple HTML stripping if it looks like HTML
-            if '<html' in content.lower() or '<!doctype' in content.lower():
-                # Remove script and style elements
-                content = re.sub(r'<script[^>]*>.*?</script>', '', content, flags=re.DOTALL | re.IGNORECASE)
-                content = re.sub(r'<style[^>]*>.*?</style>', '', content, flags=re.DOTALL | re.IGNORECASE)
-                # Remove HTML tags
-                content = re.sub(r'<[^>]+>', ' ', content)
-                # Clean up whitespace
-                content = ' '.join(content.split())
-            
-            return content
+            with stage('fetch'):
+                for piece in get_url_fetcher().iter_text(url, max_chars, timings=timings):
+                    pieces.append(piece)
+                    char_counts.update(piece)
+                
+                # HTML extraction runs on the fetcher thread while this one waits for pieces
+                profiler = current_profiler()
+                if profiler is not None:
+                    profiler.add('fetch', nbytes=timings.get('downloaded_bytes', 0), calls=0)
+                    profiler.add('html_extract', timings.get('extract_wall', 0.0), timings.get('extract_cpu', 0.0),
+                                 other_thread=True)
         except Exception as e:
             raise Exception(f"Failed to fetch URL: {str(e)}")
+        
+        return ''.join(pieces), char_counts
     
-    def compute_character_frequencies(self, text: str) -> Dict[str, float]:
-        """Compute character frequency distribution"""
+    def compute_character_frequencies(self, text: str, char_counts: Optional[CharHistogram] = None) -> Dict[str, float]:
+        """Compute character frequency distribution (optionally from already counted characters)"""
         total_chars = len(text)
         if total_chars == 0:
             return {}
         
-        char_counts = Counter(text)
-        frequencies = {}
-        
-        for char, count in char_counts.items():
-            frequencies[char] = count / total_chars
-        
-        return frequencies
+        with stage('frequencies', total_chars):
+            if char_counts is None:
+                char_counts = CharHistogram().update(text)
+            return char_counts.frequencies(total_chars)
     
     def compute_kl_divergence(self, freq1: Dict[str, float], freq2: Dict[str, float]) -> float:
         """Compute symmetrized KL divergence between two frequency distributions"""
-        # Get all characters that appear in either distribution
-        all_chars = set(freq1.keys()) | set(freq2.keys())
-        
-        # Ensure minimum frequency to avoid log(0)
-        p = np.array([max(freq1.get(char, 0), self.min_freq) for char in all_chars])
-        q = np.array([max(freq2.get(char, 0), self.min_freq) for char in all_chars])
-        
-        # Normalize to ensure they sum to 1
-        p = p / np.sum(p)
-        q = q / np.sum(q)
-        
-        # Compute KL divergences in both directions
-        kl_pq = np.sum(p * np.log2(p / q))
-        kl_qp = np.sum(q * np.log2(q / p))
+        with stage('kl'):
+            # Get all characters that appear in either distribution
+            all_chars = set(freq1.keys()) | set(freq2.keys())
+            
+            # Ensure minimum frequency to avoid log(0)
+            p = np.array([max(freq1.get(char, 0), self.min_freq) for char in all_chars])
+            q = np.array([max(freq2.get(char, 0), self.min_freq) for char in all_chars])
+            
+            # Normalize to ensure they sum to 1
+            p = p / np.sum(p)
+            q = q / np.sum(q)
+            
+            # Compute KL divergences in both directions
+            kl_pq = np.sum(p * np.log2(p / q))
+            kl_qp = np.sum(q * np.log2(q / p))
         
         # Return symmetrized KL divergence
         return (kl_pq + kl_qp) / 2
     
-    def compress_with_deflate(self, text: str, dictionary: bytes = b'') -> bytes:
-        """Compress text using DEFLATE with optional dictionary"""
-        data_bytes = text.encode('utf-8', errors='replace')
-        
+    def create_compressor(self, dictionary: bytes = b''):
+        """Create a raw DEFLATE compressor with the settings used by all divergence metrics"""
         if dictionary:
-            comp = zlib.compressobj(
+            return zlib.compressobj(
                 level=6,
                 method=zlib.DEFLATED,
                 wbits=-zlib.MAX_WBITS,  # Raw DEFLATE
@@ -87,118 +124,113 @@ class DivergenceCalculator:
                 strategy=zlib.Z_FIXED,  # Static Huffman
                 zdict=dictionary
             )
-        else:
-            comp = zlib.compressobj(
-                level=6,
-                method=zlib.DEFLATED,
-                wbits=-zlib.MAX_WBITS,  # Raw DEFLATE
-                memLevel=8,
-                strategy=zlib.Z_FIXED   # Static Huffman
-            )
+        return zlib.compressobj(
+            level=6,
+            method=zlib.DEFLATED,
+            wbits=-zlib.MAX_WBITS,  # Raw DEFLATE
+            memLevel=8,
+            strategy=zlib.Z_FIXED   # Static Huffman
+        )
+    
+    def compress_with_deflate(self, text, dictionary: bytes = b'') -> bytes:
+        """Compress text (or already encoded bytes) using DEFLATE with optional dictionary"""
+        data_bytes = text.encode('utf-8', errors='replace') if isinstance(text, str) else text
         
-        return comp.compress(data_bytes) + comp.flush()
+        with stage('deflate', len(data_bytes)):
+            comp = self.create_compressor(dictionary)
+            return comp.compress(data_bytes) + comp.flush()
     
     def create_dictionary(self, content: str, dict_size: int = 1024) -> bytes:
         """Create frequency-based dictionary from most common patterns"""
-        content_bytes = content.encode('utf-8', errors='replace')
-        
-        # Use first 50% of content as dictionary source
-        dict_source_end = len(content_bytes) // 2
-        dict_source_text = content_bytes[:dict_source_end].decode('utf-8', errors='replace')
-        
-        # Extract words
-        words = re.findall(r'\b\w+\b', dict_source_text.lower())
-        word_counts = Counter(words)
-        
-        # Extract bigrams and trigrams
-        bigrams = []
-        trigrams = []
-        for i in range(len(dict_source_text) - 2):
-            if dict_source_text[i:i+2].isalnum() or ' ' in dict_source_text[i:i+2]:
-                bigrams.append(dict_source_text[i:i+2])
-            if dict_source_text[i:i+3].isalnum() or ' ' in dict_source_text[i:i+3]:
-                trigrams.append(dict_source_text[i:i+3])
-        
-        bigram_counts = Counter(bigrams)
-        trigram_counts = Counter(trigrams)
-        
-        # Build dictionary content
-        dictionary_content = []
-        current_size = 0
-        
-        # Add most frequent words
-        for word, count in word_counts.most_common():
-            if count >= 2:
-                word_with_space = f" {word} "
-                word_bytes = word_with_space.encode('utf-8')
-                if current_size + len(word_bytes) <= dict_size:
-                    dictionary_content.append(word_with_space)
-                    current_size += len(word_bytes)
-                else:
-                    break
-        
-        # Add frequent trigrams
-        for trigram, count in trigram_counts.most_common():
-            if count >= 2 and trigram not in ''.join(dictionary_content):
-                trigram_bytes = trigram.encode('utf-8')
-                if current_size + len(trigram_bytes) <= dict_size:
-                    dictionary_content.append(trigram)
-                    current_size += len(trigram_bytes)
-                else:
-                    break
-        
-        # Add frequent bigrams
-        for bigram, count in bigram_counts.most_common():
-            if count >= 3 and bigram not in ''.join(dictionary_content):
-                bigram_bytes = bigram.encode('utf-8')
-                if current_size + len(bigram_bytes) <= dict_size:
-                    dictionary_content.append(bigram)
-                    current_size += len(bigram_bytes)
-                else:
-                    break
-        
-        # Convert to bytes and pad
-        dict_text = ''.join(dictionary_content)
-        dict_bytes = dict_text.encode('utf-8', errors='replace')
+        with stage('dictionary', len(content)):
+            return create_frequency_dictionary(content, dict_size)
+    
+    def prepare_text(self, content: str, prime_ncd: bool = False,
+                     char_counts: Optional[CharHistogram] = None) -> Dict:
+        """
+        Precompute every per-text artifact used by the divergence metrics.
+        The result can be stored in a ReferenceIndex and reused across requests.
         
-        if len(dict_bytes) < dict_size:
-            padding = b'\x00' * (dict_size - len(dict_bytes))
-            dict_bytes += padding
-        else:
-            dict_bytes = dict_bytes[:dict_size]
+        With prime_ncd, the compressor state after consuming the whole content is kept,
+        so NCD against many other texts only has to compress each of them as a suffix.
+        char_counts can pass character counts gathered while streaming the content.
+        """
+        # Dictionary from first 50% of content, test content is the last 50%
+        dictionary = self.create_dictionary(content)
+        test_bytes = content[len(content)//2:].encode('utf-8', errors='replace')
+        
+        prepared = {
+            'length': len(content),
+            'content': content,
+            'frequencies': self.compute_character_frequencies(content, char_counts),
+            'dictionary': dictionary,
+            'test_bytes': test_bytes,
+            'self_compressed_size': len(self.compress_with_deflate(test_bytes, dictionary=dictionary)),
+        }
         
-        return dict_bytes
+        # C(x) for NCD
+        content_bytes = content.encode('utf-8', errors='replace')
+        with stage('deflate', len(content_bytes)):
+            comp = self.create_compressor()
+            prefix_size = len(comp.compress(content_bytes))
+            if prime_ncd:
+                prepared['ncd_compressor'] = comp
+                prepared['ncd_prefix_size'] = prefix_size
+                comp = comp.copy()
+            prepared['compressed_size'] = prefix_size + len(comp.flush())
+        
+        return prepared
     
     def compute_zip_divergence(self, content_a: str, content_b: str) -> float:
         """
         Compute ZIP divergence between two texts using compression.
         Returns bits per character difference when using each other's dictionaries.
         """
-        # Create dictionaries from first 50% of each content
-        dict_a = self.create_dictionary(content_a)
-        dict_b = self.create_dictionary(content_b)
-        
-        # Get test content (last 50%)
-        test_a = content_a[len(content_a)//2:]
-        test_b = content_b[len(content_b)//2:]
-        
-        test_a_bytes = test_a.encode('utf-8')
-        test_b_bytes = test_b.encode('utf-8')
-        
-        # Compress A with both dictionaries
-        a_self_compressed = self.compress_with_deflate(test_a, dictionary=dict_a)
-        a_cross_compressed = self.compress_with_deflate(test_a, dictionary=dict_b)
+        return self.compute_zip_divergence_prepared(self.get_prepared_text(content_a),
+                                                    self.get_prepared_text(content_b))
+    
+    def get_prepared_text(self, content: str) -> Dict:
+        """prepare_text(content), memoized for the most recently used texts"""
+        key = hash_text(content)
+        if key in self.prepared_texts:
+            self.prepared_texts.move_to_end(key)
+            return self.prepared_texts[key]
+        prepared = self.prepare_text(content)
+        self.prepared_texts[key] = prepared
+        if len(self.prepared_texts) > self.max_prepared_texts:
+            self.prepared_texts.popitem(last=False)
+        return prepared
+    
+    def compute_zip_divergence_matrix(self, texts: Dict[str, str]) -> Dict[str, Dict[str, float]]:
+        """
+        ZIP divergence between every pair of texts. Each text's dictionary, test half and
+        self-compressed size are built once; only the cross compressions are per pair.
+        """
+        prepared = {text_id: self.prepare_text(content) for text_id, content in texts.items()}
+        text_ids = list(texts)
+        matrix = {text_id: {} for text_id in text_ids}
+        for i, id_a in enumerate(text_ids):
+            matrix[id_a][id_a] = 0.0
+            for id_b in text_ids[i + 1:]:
+                divergence = self.compute_zip_divergence_prepared(prepared[id_a], prepared[id_b])
+                matrix[id_a][id_b] = matrix[id_b][id_a] = divergence
+        return matrix
+    
+    def compute_zip_divergence_prepared(self, prepared_a: Dict, prepared_b: Dict) -> float:
+        """ZIP divergence from artifacts produced by prepare_text"""
+        test_a_bytes = prepared_a['test_bytes']
+        test_b_bytes = prepared_b['test_bytes']
         
-        # Compress B with both dictionaries
-        b_self_compressed = self.compress_with_deflate(test_b, dictionary=dict_b)
-        b_cross_compressed = self.compress_with_deflate(test_b, dictionary=dict_a)
+        # Self-compressed sizes are precomputed, only the cross compressions are new
+        a_cross_compressed = self.compress_with_deflate(test_a_bytes, dictionary=prepared_b['dictionary'])
+        b_cross_compressed = self.compress_with_deflate(test_b_bytes, dictionary=prepared_a['dictionary'])
         
         # Calculate bits per character difference
-        a_self_bits_per_char = (len(a_self_compressed) * 8) / len(test_a_bytes)
+        a_self_bits_per_char = (prepared_a['self_compressed_size'] * 8) / len(test_a_bytes)
         a_cross_bits_per_char = (len(a_cross_compressed) * 8) / len(test_a_bytes)
         divergence_a_to_b = a_cross_bits_per_char - a_self_bits_per_char
         
-        b_self_bits_per_char = (len(b_self_compressed) * 8) / len(test_b_bytes)
+        b_self_bits_per_char = (prepared_b['self_compressed_size'] * 8) / len(test_b_bytes)
         b_cross_bits_per_char = (len(b_cross_compressed) * 8) / len(test_b_bytes)
         divergence_b_to_a = b_cross_bits_per_char - b_self_bits_per_char
         
@@ -211,17 +243,34 @@ class DivergenceCalculator:
         Uses formula: NCD(x,y) ≈ (C(xy) – min{C(x),C(y)}) / max{C(x),C(y)}
         Where C(x) is the compressed size of x.
         """
-        # Compress individual texts
-        compressed_a = self.compress_with_deflate(content_a)
-        compressed_b = self.compress_with_deflate(content_b)
-        
-        # Compress concatenated text
-        compressed_ab = self.compress_with_deflate(content_a + content_b)
+        prepared_a = {'content': content_a, 'compressed_size': len(self.compress_with_deflate(content_a))}
+        prepared_b = {'content': content_b, 'compressed_size': len(self.compress_with_deflate(content_b))}
+        return self.compute_zip_similarity_prepared(prepared_a, prepared_b)
+    
+    def compressed_size(self, prepared: Dict) -> int:
+        """
+        C(x) of prepared artifacts. Index entries registered by the Space store no
+        compressed size; it is computed on first use and kept with the artifacts.
+        """
+        if 'compressed_size' not in prepared:
+            prepared['compressed_size'] = len(self.compress_with_deflate(prepared['content']))
+        return prepared['compressed_size']
+    
+    def compute_zip_similarity_prepared(self, prepared_a: Dict, prepared_b: Dict) -> float:
+        """NCD from artifacts produced by prepare_text (reuses the cached C(x) sizes)"""
+        # Compress concatenated text, continuing from A's primed compressor when available
+        if 'ncd_compressor' in prepared_a:
+            suffix_bytes = prepared_b['content'].encode('utf-8', errors='replace')
+            with stage('deflate', len(suffix_bytes)):
+                comp = prepared_a['ncd_compressor'].copy()
+                suffix = comp.compress(suffix_bytes) + comp.flush()
+            c_ab = prepared_a['ncd_prefix_size'] + len(suffix)
+        else:
+            c_ab = len(self.compress_with_deflate(prepared_a['content'] + prepared_b['content']))
         
         # Get compressed sizes
-        c_a = len(compressed_a)
-        c_b = len(compressed_b)
-        c_ab = len(compressed_ab)
+        c_a = self.compressed_size(prepared_a)
+        c_b = self.compressed_size(prepared_b)
         
         # Compute NCD: (C(xy) – min{C(x),C(y)}) / max{C(x),C(y)}
         min_c = min(c_a, c_b)
@@ -235,74 +284,399 @@ class DivergenceCalculator:
         # Ensure NCD is in [0, 1] range
         return max(0.0, min(1.0, ncd))
 
-def calculate_divergences(url: str, reference_texts_json: str) -> str:
+# Reference index shared by all requests, opened on first use
+_reference_index = None
+
+def get_reference_index() -> ReferenceIndex:
+    """Open the on-disk reference index (directory taken from REFERENCE_INDEX_DIR)"""
+    global _reference_index
+    if _reference_index is None:
+        index_dir = os.environ.get("REFERENCE_INDEX_DIR", "reference_index")
+        _reference_index = ReferenceIndex(index_dir, calculator=DivergenceCalculator())
+    return _reference_index
+
+# Result cache shared by all requests, created on first use
+_result_cache = None
+
+def get_result_cache() -> ResultCache:
+    """Create the result cache; RESULT_CACHE_DB enables the persistent SQLite tier"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache(
+            max_entries=int(os.environ.get("RESULT_CACHE_ENTRIES", "256")),
+            db_path=os.environ.get("RESULT_CACHE_DB"),
+            max_db_bytes=int(os.environ.get("RESULT_CACHE_DB_BYTES", str(64 * 1024 * 1024)))
+        )
+    return _result_cache
+
+def reference_set_hash(reference_data) -> str:
+    """Hash identifying the request's reference set by ids and reference contents"""
+    if isinstance(reference_data, list):
+        ids = get_reference_index().ids
+        return hash_reference_set((text_id, ids.get(text_id, '')) for text_id in reference_data)
+    return hash_reference_set(
+        (text_id, ReferenceIndex.content_hash(ref_content)) for text_id, ref_content in reference_data.items()
+    )
+
+def resolve_references(calc: DivergenceCalculator, reference_data) -> Dict[str, Dict]:
+    """
+    Turn the request's reference set into prepared artifacts.
+    A JSON list is treated as ids of texts registered in the reference index;
+    a JSON object maps ids to full texts, which are prepared on the fly.
+    """
+    with stage('references'):
+        if isinstance(reference_data, list):
+            return get_reference_index().get_many(reference_data)
+        return {text_id: calc.prepare_text(ref_content) for text_id, ref_content in reference_data.items()}
+
+def register_reference_texts(reference_texts_json: str) -> str:
+    """
+    Register reference texts in the persistent index so later requests can use their ids.
+    
+    Args:
+        reference_texts_json: JSON object mapping reference ids to texts
+        
+    Returns:
+        JSON string mapping each id to its content hash
+    """
+    try:
+        reference_data = json.loads(reference_texts_json)
+        registered = get_reference_index().register_many(reference_data)
+        return json.dumps({"registered": registered})
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
+def score_text(calc: DivergenceCalculator, content: str, references: Dict[str, Dict],
+               char_counts: Optional[CharHistogram] = None) -> Dict:
+    """KL divergence, ZIP divergence and ZIP similarity (NCD) of content against each prepared reference"""
+    results = {
+        "content_length": len(content),
+        "kl_divergences": {},
+        "zip_divergences": {},
+        "zip_similarities": {}
+    }
+    
+    # Precompute content-side artifacts once; reference-side ones are already prepared
+    prepared = calc.prepare_text(content, prime_ncd=True, char_counts=char_counts)
+    
+    for text_id, ref_prepared in references.items():
+        # KL divergence
+        kl_div = calc.compute_kl_divergence(prepared['frequencies'], ref_prepared['frequencies'])
+        results["kl_divergences"][text_id] = round(kl_div, 4)
+        
+        # ZIP divergence
+        zip_div = calc.compute_zip_divergence_prepared(prepared, ref_prepared)
+        results["zip_divergences"][text_id] = round(zip_div, 4)
+        
+        # ZIP similarity
+        zip_sim = calc.compute_zip_similarity_prepared(prepared, ref_prepared)
+        results["zip_similarities"][text_id] = round(zip_sim, 4)
+    
+    return results
+
+def summarize_references(calc: DivergenceCalculator, reference_data) -> Dict[str, Dict]:
+    """
+    Cheap per-reference artifacts (content and character frequencies) for pre-filtering.
+    Registered references come fully prepared from the index; inline texts are only
+    prepared in full once they are selected as candidates.
+    """
+    with stage('references'):
+        if isinstance(reference_data, list):
+            return get_reference_index().get_many(reference_data)
+        return {
+            text_id: {
+                'length': len(ref_content),
+                'content': ref_content,
+                'frequencies': calc.compute_character_frequencies(ref_content),
+            }
+            for text_id, ref_content in reference_data.items()
+        }
+
+def score_text_top_k(calc: DivergenceCalculator, content: str, reference_data, top_k: int,
+                     prefilter: str = 'kl', char_counts: Optional[CharHistogram] = None) -> Dict:
+    """
+    Nearest references of content by ZIP divergence, without compressing against every reference.
+    
+    All references are ranked by a cheap pre-filter ('kl': character KL divergence,
+    'sketch': shingle-sketch similarity); only the best top_k * TOP_K_CANDIDATE_FACTOR
+    candidates get the deflate-based metrics. The "search" entry reports how many
+    references were pruned.
+    """
+    summaries = summarize_references(calc, reference_data)
+    query = {'content': content, 'frequencies': calc.compute_character_frequencies(content, char_counts)}
+    
+    with stage('prefilter'):
+        ranked = rank_references(query, summaries, prefilter, calc.min_freq)
+    candidate_ids = [text_id for text_id, _ in ranked[:top_k * TOP_K_CANDIDATE_FACTOR]]
+    
+    candidates = {}
+    for text_id in candidate_ids:
+        ref = summaries[text_id]
+        candidates[text_id] = ref if 'dictionary' in ref else calc.prepare_text(ref['content'])
+    
+    results = score_text(calc, content, candidates, char_counts)
+    nearest = sorted(candidate_ids, key=lambda text_id: results["zip_divergences"][text_id])[:top_k]
+    results["nearest"] = nearest
+    results["search"] = {
+        "prefilter": prefilter,
+        "prefilter_scores": {text_id: round(score, 4) for text_id, score in ranked[:len(candidate_ids)]},
+        "references": len(summaries),
+        "candidates": len(candidate_ids),
+        "pruned": len(summaries) - len(candidate_ids),
+        "pruned_fraction": round(1 - len(candidate_ids) / len(summaries), 4) if summaries else 0.0,
+    }
+    return results
+
+def calculate_divergences(url: str, reference_texts_json: str, include_timings: bool = False,
+                          top_k: int = 0, prefilter: str = 'kl') -> str:
     """
     Calculate KL and ZIP divergences between URL content and reference texts.
     
     Args:
         url: URL to fetch content from
-        reference_texts_json: JSON string containing reference texts
+        reference_texts_json: JSON object of reference texts, or JSON list of
+            reference ids registered with register_reference_texts
+        include_timings: Add per-stage wall/CPU timings and byte counts to the result
+        top_k: Only return the top_k nearest references (0 scores every reference),
+            using prefilter ('kl' or 'sketch') to pick which ones to compress
         
     Returns:
         JSON string with divergence results
     """
     calc = DivergenceCalculator()
+    top_k = int(top_k or 0)
     
     try:
-        # Parse reference texts
-        reference_data = json.loads(reference_texts_json)
-        
-        # Fetch URL content
-        url_content = calc.fetch_url_content(url)
-        
-        if len(url_content) < 100:
-            return json.dumps({"error": "Content too short (< 100 characters)"})
-        
-        # Calculate divergences
-        results = {
-            "url": url,
-            "content_length": len(url_content),
-            "kl_divergences": {},
-            "zip_divergences": {},
-            "zip_similarities": {}
-        }
-        
-        # Get character frequencies for URL content
-        url_frequencies = calc.compute_character_frequencies(url_content)
-        
-        # Calculate divergences with each reference text
-        for text_id, ref_content in reference_data.items():
-            # KL divergence
-            ref_frequencies = calc.compute_character_frequencies(ref_content)
-            kl_div = calc.compute_kl_divergence(url_frequencies, ref_frequencies)
-            results["kl_divergences"][text_id] = round(kl_div, 4)
+        with profile_request() as profiler:
+            # Parse reference texts
+            reference_data = json.loads(reference_texts_json)
             
-            # ZIP divergence
-            zip_div = calc.compute_zip_divergence(url_content, ref_content)
-            results["zip_divergences"][text_id] = round(zip_div, 4)
+            # Fetch URL content
+            url_content, url_char_counts = calc.stream_url_content(url)
             
-            # ZIP similarity
-            zip_sim = calc.compute_zip_similarity(url_content, ref_content)
-            results["zip_similarities"][text_id] = round(zip_sim, 4)
-        
+            if len(url_content) < 100:
+                return json.dumps({"error": "Content too short (< 100 characters)"})
+            
+            # Identical text against the same reference set gives identical results
+            cache = get_result_cache()
+            with stage('cache'):
+                version = f"{ALGORITHM_VERSION}/top{top_k}/{prefilter}" if top_k else ALGORITHM_VERSION
+                cache_key = cache.make_key(url_content, reference_set_hash(reference_data), version)
+                cached, tier = cache.lookup(cache_key)
+            
+            if cached is not None:
+                results = {"url": url, **cached, "cache": cache.metadata(tier)}
+            else:
+                # Calculate divergences
+                if top_k > 0:
+                    scores = score_text_top_k(calc, url_content, reference_data, top_k, prefilter, url_char_counts)
+                else:
+                    references = resolve_references(calc, reference_data)
+                    scores = score_text(calc, url_content, references, url_char_counts)
+                
+                cache.put(cache_key, scores)
+                results = {"url": url, **scores, "cache": cache.metadata(None)}
+        
+        timings = profiler.as_dict()
+        latency_histogram.record(timings)
+        if include_timings:
+            results["timings"] = timings
         return json.dumps(results)
         
     except Exception as e:
         return json.dumps({"error": str(e)})
 
+def get_latency_summary() -> str:
+    """
+    Per-stage latency distribution over recent requests.
+    
+    Returns:
+        JSON string with the request count, bucket bounds and, per stage,
+        mean/p50/p90/p99/max wall time in milliseconds and bucket counts
+    """
+    return json.dumps(latency_histogram.summary())
+
+# Prepared references of a batch worker process, installed once by the pool initializer
+_batch_references = None
+
+def _init_batch_worker(references: Dict[str, Dict]):
+    global _batch_references
+    _batch_references = references
+
+def _score_batch_text(content: str) -> Tuple[Dict, Dict]:
+    with profile_request() as profiler:
+        results = score_text(DivergenceCalculator(), content, _batch_references)
+    return results, profiler.as_dict()
+
+def parse_batch_item(index: int, item) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Split a batch item into (id, url, text).
+    An item is either a URL string or an object with "url" or "text" and an optional "id".
+    """
+    if isinstance(item, str):
+        return item, item, None
+    item_id = str(item.get('id', item.get('url', f"item_{index}")))
+    return item_id, item.get('url'), item.get('text')
+
+def iter_batch_divergences(items: Iterable, reference_data, max_workers: Optional[int] = None,
+                           max_pending: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Score many URLs or texts against one reference set, yielding one row per item as it finishes.
+    
+    URLs are fetched concurrently through the shared fetcher and scored on a process pool whose
+    workers receive the prepared references once. At most max_pending items are in flight, so
+    memory stays bounded however many items there are. Rows arrive in completion order and
+    carry the item id.
+    """
+    calc = DivergenceCalculator()
+    references = resolve_references(calc, reference_data)
+    cache = get_result_cache()
+    references_hash = reference_set_hash(reference_data)
+    
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_pending or 4 * max_workers
+    pending = {}  # future -> (stage, item id, result cache key)
+    items = enumerate(items)
+    exhausted = False
+    
+    with ProcessPoolExecutor(max_workers, initializer=_init_batch_worker, initargs=(references,)) as pool:
+        def submit_text(item_id: str, content: str) -> Optional[Dict]:
+            """Queue content for scoring, or return its row directly if it is too short or cached"""
+            if len(content) < 100:
+                return {"id": item_id, "error": "Content too short (< 100 characters)"}
+            cache_key = cache.make_key(content, references_hash, ALGORITHM_VERSION)
+            cached, tier = cache.lookup(cache_key)
+            if cached is not None:
+                return {"id": item_id, **cached, "cache": cache.metadata(tier)}
+            pending[pool.submit(_score_batch_text, content)] = ('score', item_id, cache_key)
+            return None
+        
+        while True:
+            # Keep the pipeline full
+            ready = []
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    index, item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                item_id, url, text = parse_batch_item(index, item)
+                if url is not None:
+                    pending[get_url_fetcher().submit(url)] = ('fetch', item_id, None)
+                else:
+                    row = submit_text(item_id, text or '')
+                    if row is not None:
+                        ready.append(row)
+            yield from ready
+            
+            if not pending:
+                if exhausted:
+                    break
+                continue
+            
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, item_id, cache_key = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = f"Failed to fetch URL: {e}" if stage == 'fetch' else str(e)
+                    yield {"id": item_id, "error": error}
+                    continue
+                
+                if stage == 'fetch':
+                    row = submit_text(item_id, result)
+                    if row is not None:
+                        yield row
+                else:
+                    scores, timings = result
+                    latency_histogram.record(timings)
+                    cache.put(cache_key, scores)
+                    yield {"id": item_id, **scores, "cache": cache.metadata(None)}
+
+def calculate_batch_divergences(items_json: str, reference_texts_json: str) -> Iterator[Tuple[str, str]]:
+    """
+    Batch version of calculate_divergences, streamed as NDJSON.
+    
+    Rows are appended to an NDJSON file as items finish, so the full matrix is never
+    held in memory or sent more than once.
+    
+    Args:
+        items_json: JSON list of URLs, or of objects with "url" or "text" and an optional "id"
+        reference_texts_json: JSON object of reference texts, or JSON list of registered reference ids
+        
+    Yields:
+        (progress line and the last BATCH_TAIL_ROWS rows, path of the NDJSON file), after every row
+    """
+    tail = deque(maxlen=BATCH_TAIL_ROWS)
+    rows = 0
+    fd, path = tempfile.mkstemp(prefix="divergences_", suffix=".ndjson")
+    with os.fdopen(fd, 'w', encoding='utf-8') as output:
+        def write(row: Dict) -> Tuple[str, str]:
+            line = json.dumps(row)
+            output.write(line + "\n")
+            output.flush()
+            tail.append(line)
+            return f"{rows} rows written\n" + "\n".join(tail), path
+        
+        try:
+            items = json.loads(items_json)
+            reference_data = json.loads(reference_texts_json)
+            for row in iter_batch_divergences(items, reference_data):
+                rows += 1
+                yield write(row)
+        except Exception as e:
+            yield write({"error": str(e)})
+
 # Gradio interface for deployment as HF Space
 def create_gradio_interface():
-    iface = gr.Interface(
+    divergence_iface = gr.Interface(
         fn=calculate_divergences,
         inputs=[
             gr.Textbox(label="URL", placeholder="https://example.com/article"),
-            gr.Textbox(label="Reference Texts (JSON)", lines=10, placeholder='{"country_france": "France content...", "sport_football": "Football content..."}')
+            gr.Textbox(label="Reference Texts (JSON)", lines=10, placeholder='{"country_france": "France content...", "sport_football": "Football content..."} or ["country_france", "sport_football"]'),
+            gr.Checkbox(label="Include stage timings", value=False),
+            gr.Number(label="Top-k nearest references (0 = all)", value=0, precision=0),
+            gr.Dropdown(label="Top-k pre-filter", choices=["kl", "sketch"], value="kl")
         ],
         outputs=gr.JSON(label="Divergence Results"),
         title="Text Divergence Calculator",
         description="Calculate KL and ZIP divergences between URL content and reference texts"
     )
-    return iface
+    batch_iface = gr.Interface(
+        fn=calculate_batch_divergences,
+        inputs=[
+            gr.Textbox(label="URLs or Texts (JSON)", lines=10, placeholder='["https://example.com/a", {"id": "doc1", "text": "Some text..."}]'),
+            gr.Textbox(label="Reference Texts (JSON)", lines=10, placeholder='{"country_france": "France content...", "sport_football": "Football content..."} or ["country_france", "sport_football"]')
+        ],
+        outputs=[
+            gr.Textbox(label="Latest Rows (NDJSON)", lines=20),
+            gr.File(label="All Rows (NDJSON)")
+        ],
+        title="Batch Divergence Matrix",
+        description="Score many URLs or texts against a reference set; one NDJSON row is streamed per item as it finishes"
+    )
+    register_iface = gr.Interface(
+        fn=register_reference_texts,
+        inputs=[
+            gr.Textbox(label="Reference Texts (JSON)", lines=10, placeholder='{"country_france": "France content...", "sport_football": "Football content..."}')
+        ],
+        outputs=gr.JSON(label="Registered References"),
+        title="Reference Registration",
+        description="Precompute and store reference texts so divergence requests can pass a list of ids"
+    )
+    latency_iface = gr.Interface(
+        fn=get_latency_summary,
+        inputs=[],
+        outputs=gr.JSON(label="Stage Latencies"),
+        title="Latency Histogram",
+        description="Per-stage wall-time percentiles and histogram buckets over recent requests"
+    )
+    return gr.TabbedInterface(
+        [divergence_iface, batch_iface, register_iface, latency_iface],
+        ["Text Divergence", "Batch Matrix", "Register References", "Latency"],
+        title="Text Divergence Calculator"
+    )
 
 if __name__ == "__main__":
     # For local testing
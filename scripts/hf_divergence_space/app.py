@@ -8,218 +8,234 @@ import gradio as gr
 import json
 import zlib
 import numpy as np
-from collections import Counter
-import requests
-import re
-from typing import Dict, List, Tuple
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 import traceback
 import math
+import os
+import sys
+from pathlib import Path
 from transformers import GPT2Tokenizer, GPT2LMHeadModel
 import torch
 
+# reference_index.py, char_frequencies.py, dictionary_builder.py, url_fetcher.py,
+# result_cache.py and stage_profiler.py are deployed next to this file; in the repo
+# they live one level up
+sys.path.append(str(Path(__file__).parent.parent))
+from reference_index import ReferenceIndex
+from char_frequencies import CharHistogram
+from dictionary_builder import create_frequency_dictionary
+from url_fetcher import BackgroundFetcher
+from result_cache import ResultCache, hash_reference_set, hash_text
+from stage_profiler import LatencyHistogram, current_profiler, profile_request, stage
+
+# Bump when any divergence computation changes, so cached results are not reused
+ALGORITHM_VERSION = "1"
+
+# Stage timings of recent requests, summarized by get_latency_summary
+latency_histogram = LatencyHistogram(int(os.environ.get("LATENCY_HISTORY_SIZE", "1000")))
+
+# URL fetcher shared by all requests, started on first use
+_url_fetcher = None
+
+def get_url_fetcher() -> BackgroundFetcher:
+    """Start the pooled URL fetcher (cache directory taken from URL_CACHE_DIR)"""
+    global _url_fetcher
+    if _url_fetcher is None:
+        _url_fetcher = BackgroundFetcher(
+            cache_dir=os.environ.get("URL_CACHE_DIR", "url_cache"),
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            }
+        )
+    return _url_fetcher
+
 class DivergenceCalculator:
-    def __init__(self):
+    def __init__(self, max_prepared_texts: int = 64):
         self.min_freq = 2**-10
-        
-    def fetch_url_content(self, url: str) -> str:
-        """Fetch text content from URL"""
+        # prepare_text results by text hash, so pairwise calls prepare each text once
+        self.max_prepared_texts = max_prepared_texts
+        self.prepared_texts = OrderedDict()
+        
+    def fetch_url_content(self, url: str, max_chars: Optional[int] = None) -> str:
+        """Fetch text content from URL (pooled connections and on-disk text cache)"""
+        content, _ = self.stream_url_content(url, max_chars)
+        return content
+    
+    def stream_url_content(self, url: str, max_chars: Optional[int] = None) -> Tuple[str, CharHistogram]:
+        """
+        Fetch text content from URL, counting characters while the page is still downloading.
+        Returns the text (at most max_chars characters) and its character counts.
+        """
+        pieces = []
+        char_counts = CharHistogram()
+        timings = {}
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(url, timeout=30, headers=headers)
-            response.raise_for_status()
-            
-            # Try to extract text content from HTML if needed
-            content = response.text
-            
-            # Simple HTML stripping if it looks like HTML
-            if '<html' in content.lower() or '<!doctype' in content.lower():
-                # Remove script and style elements
-                content = re.sub(r'<script[^>]*>.*?</script>', '', content, flags=re.DOTALL | re.IGNORECASE)
-                content = re.sub(r'<style[^>]*>.*?</style>', '', content, flags=re.DOTALL | re.IGNORECASE)
-                # Remove HTML tags
-                content = re.sub(r'<[^>]+>', ' ', content)
-                # Clean up whitespace
-                content = ' '.join(content.split())
-            
-            return content
+            with stage('fetch'):
+                for piece in get_url_fetcher().iter_text(url, max_chars, timings=timings):
+                    pieces.append(piece)
+                    char_counts.update(piece)
+                
+                # HTML extraction runs on the fetcher thread while this one waits for pieces
+                profiler = current_profiler()
+                if profiler is not None:
+                    profiler.add('fetch', nbytes=timings.get('downloaded_bytes', 0), calls=0)
+                    profiler.add('html_extract', timings.get('extract_wall', 0.0), timings.get('extract_cpu', 0.0),
+                                 other_thread=True)
         except Exception as e:
             raise Exception(f"Failed to fetch URL: {str(e)}")
+        
+        return ''.join(pieces), char_counts
     
-    def compute_character_frequencies(self, text: str) -> Dict[str, float]:
-        """Compute character frequency distribution"""
+    def compute_character_frequencies(self, text: str, char_counts: Optional[CharHistogram] = None) -> Dict[str, float]:
+        """Compute character frequency distribution (optionally from already counted characters)"""
         total_chars = len(text)
         if total_chars == 0:
             return {}
         
-        char_counts = Counter(text)
-        frequencies = {}
-        
-        for char, count in char_counts.items():
-            frequencies[char] = count / total_chars
-        
-        return frequencies
+        with stage('frequencies', total_chars):
+            if char_counts is None:
+                char_counts = CharHistogram().update(text)
+            return char_counts.frequencies(total_chars)
     
     def compute_kl_divergence(self, freq1: Dict[str, float], freq2: Dict[str, float]) -> float:
         """Compute symmetrized KL divergence between two frequency distributions"""
-        # Get all characters that appear in either distribution
-        all_chars = set(freq1.keys()) | set(freq2.keys())
-        
-        # Ensure minimum frequency to avoid log(0)
-        p = np.array([max(freq1.get(char, 0), self.min_freq) for char in all_chars])
-        q = np.array([max(freq2.get(char, 0), self.min_freq) for char in all_chars])
-        
-        # Normalize to ensure they sum to 1
-        p = p / np.sum(p)
-        q = q / np.sum(q)
-        
-        # Compute KL divergences in both directions
-        kl_pq = np.sum(p * np.log2(p / q))
-        kl_qp = np.sum(q * np.log2(q / p))
+        with stage('kl'):
+            # Get all characters that appear in either distribution
+            all_chars = set(freq1.keys()) | set(freq2.keys())
+            
+            # Ensure minimum frequency to avoid log(0)
+            p = np.array([max(freq1.get(char, 0), self.min_freq) for char in all_chars])
+            q = np.array([max(freq2.get(char, 0), self.min_freq) for char in all_chars])
+            
+            # Normalize to ensure they sum to 1
+            p = p / np.sum(p)
+            q = q / np.sum(q)
+            
+            # Compute KL divergences in both directions
+            kl_pq = np.sum(p * np.log2(p / q))
+            kl_qp = np.sum(q * np.log2(q / p))
         
         # Return symmetrized KL divergence
         return (kl_pq + kl_qp) / 2
     
-    def compress_with_deflate(self, text: str, dictionary: bytes = b'') -> bytes:
-        """Compress text using DEFLATE with optional dictionary"""
-        data_bytes = text.encode('utf-8', errors='replace')
-        
-        if dictionary:
-            comp = zlib.compressobj(
-                level=6,
-                method=zlib.DEFLATED,
-                wbits=-zlib.MAX_WBITS,  # Raw DEFLATE
-                memLevel=8,
-                strategy=zlib.Z_FIXED,  # Static Huffman
-                zdict=dictionary
-            )
-        else:
-            comp = zlib.compressobj(
-                level=6,
-                method=zlib.DEFLATED,
-                wbits=-zlib.MAX_WBITS,  # Raw DEFLATE
-                memLevel=8,
-                strategy=zlib.Z_FIXED   # Static Huffman
-            )
-        
-        return comp.compress(data_bytes) + comp.flush()
+    def compress_with_deflate(self, text, dictionary: bytes = b'') -> bytes:
+        """Compress text (or already encoded bytes) using DEFLATE with optional dictionary"""
+        data_bytes = text.encode('utf-8', errors='replace') if isinstance(text, str) else text
+        
+        with stage('deflate', len(data_bytes)):
+            if dictionary:
+                comp = zlib.compressobj(
+                    level=6,
+                    method=zlib.DEFLATED,
+                    wbits=-zlib.MAX_WBITS,  # Raw DEFLATE
+                    memLevel=8,
+                    strategy=zlib.Z_FIXED,  # Static Huffman
+                    zdict=dictionary
+                )
+            else:
+                comp = zlib.compressobj(
+                    level=6,
+                    method=zlib.DEFLATED,
+                    wbits=-zlib.MAX_WBITS,  # Raw DEFLATE
+                    memLevel=8,
+                    strategy=zlib.Z_FIXED   # Static Huffman
+                )
+            
+            return comp.compress(data_bytes) + comp.flush()
     
     def create_dictionary(self, content: str, dict_size: int = 1024) -> bytes:
         """Create frequency-based dictionary from most common patterns"""
-        content_bytes = content.encode('utf-8', errors='replace')
-        
-        # Use first 50% of content as dictionary source
-        dict_source_end = len(content_bytes) // 2
-        dict_source_text = content_bytes[:dict_source_end].decode('utf-8', errors='replace')
-        
-        # Extract words
-        words = re.findall(r'\b\w+\b', dict_source_text.lower())
-        word_counts = Counter(words)
-        
-        # Extract bigrams and trigrams
-        bigrams = []
-        trigrams = []
-        for i in range(len(dict_source_text) - 2):
-            if dict_source_text[i:i+2].isalnum() or ' ' in dict_source_text[i:i+2]:
-                bigrams.append(dict_source_text[i:i+2])
-            if dict_source_text[i:i+3].isalnum() or ' ' in dict_source_text[i:i+3]:
-                trigrams.append(dict_source_text[i:i+3])
-        
-        bigram_counts = Counter(bigrams)
-        trigram_counts = Counter(trigrams)
-        
-        # Build dictionary content
-        dictionary_content = []
-        current_size = 0
-        
-        # Add most frequent words
-        for word, count in word_counts.most_common():
-            if count >= 2:
-                word_with_space = f" {word} "
-                word_bytes = word_with_space.encode('utf-8')
-                if current_size + len(word_bytes) <= dict_size:
-                    dictionary_content.append(word_with_space)
-                    current_size += len(word_bytes)
-                else:
-                    break
-        
-        # Add frequent trigrams
-        for trigram, count in trigram_counts.most_common():
-            if count >= 2 and trigram not in ''.join(dictionary_content):
-                trigram_bytes = trigram.encode('utf-8')
-                if current_size + len(trigram_bytes) <= dict_size:
-                    dictionary_content.append(trigram)
-                    current_size += len(trigram_bytes)
-                else:
-                    break
-        
-        # Add frequent bigrams
-        for bigram, count in bigram_counts.most_common():
-            if count >= 3 and bigram not in ''.join(dictionary_content):
-                bigram_bytes = bigram.encode('utf-8')
-                if current_size + len(bigram_bytes) <= dict_size:
-                    dictionary_content.append(bigram)
-                    current_size += len(bigram_bytes)
-                else:
-                    break
-        
-        # Convert to bytes and pad
-        dict_text = ''.join(dictionary_content)
-        dict_bytes = dict_text.encode('utf-8', errors='replace')
-        
-        if len(dict_bytes) < dict_size:
-            padding = b'\x00' * (dict_size - len(dict_bytes))
-            dict_bytes += padding
-        else:
-            dict_bytes = dict_bytes[:dict_size]
-        
-        return dict_bytes
+        with stage('dictionary', len(content)):
+            return create_frequency_dictionary(content, dict_size)
+    
+    def prepare_text(self, content: str, char_counts: Optional[CharHistogram] = None) -> Dict:
+        """
+        Precompute every per-text artifact used by the divergence metrics.
+        The result can be stored in a ReferenceIndex and reused across requests.
+        char_counts can pass character counts gathered while streaming the content.
+        """
+        # Dictionary from first 50% of content, test content is the last 50%
+        dictionary = self.create_dictionary(content)
+        test_bytes = content[len(content)//2:].encode('utf-8', errors='replace')
+        
+        return {
+            'length': len(content),
+            'content': content,
+            'frequencies': self.compute_character_frequencies(content, char_counts),
+            'dictionary': dictionary,
+            'test_bytes': test_bytes,
+            'self_compressed_size': len(self.compress_with_deflate(test_bytes, dictionary=dictionary)),
+        }
     
     def compute_zip_divergence(self, content_a: str, content_b: str) -> float:
         """
         Compute ZIP divergence between two texts using compression.
         Returns bits per character difference when using each other's dictionaries.
         """
-        # Create dictionaries from first 50% of each content
-        dict_a = self.create_dictionary(content_a)
-        dict_b = self.create_dictionary(content_b)
-        
-        # Get test content (last 50%)
-        test_a = content_a[len(content_a)//2:]
-        test_b = content_b[len(content_b)//2:]
-        
-        test_a_bytes = test_a.encode('utf-8')
-        test_b_bytes = test_b.encode('utf-8')
-        
-        # Compress A with both dictionaries
-        a_self_compressed = self.compress_with_deflate(test_a, dictionary=dict_a)
-        a_cross_compressed = self.compress_with_deflate(test_a, dictionary=dict_b)
-        
-        # Compress B with both dictionaries
-        b_self_compressed = self.compress_with_deflate(test_b, dictionary=dict_b)
-        b_cross_compressed = self.compress_with_deflate(test_b, dictionary=dict_a)
+        return self.compute_zip_divergence_prepared(self.get_prepared_text(content_a),
+                                                    self.get_prepared_text(content_b))
+    
+    def get_prepared_text(self, content: str) -> Dict:
+        """prepare_text(content), memoized for the most recently used texts"""
+        key = hash_text(content)
+        if key in self.prepared_texts:
+            self.prepared_texts.move_to_end(key)
+            return self.prepared_texts[key]
+        prepared = self.prepare_text(content)
+        self.prepared_texts[key] = prepared
+        if len(self.prepared_texts) > self.max_prepared_texts:
+            self.prepared_texts.popitem(last=False)
+        return prepared
+    
+    def compute_zip_divergence_matrix(self, texts: Dict[str, str]) -> Dict[str, Dict[str, float]]:
+        """
+        ZIP divergence between every pair of texts. Each text's dictionary, test half and
+        self-compressed size are built once; only the cross compressions are per pair.
+        """
+        prepared = {text_id: self.prepare_text(content) for text_id, content in texts.items()}
+        text_ids = list(texts)
+        matrix = {text_id: {} for text_id in text_ids}
+        for i, id_a in enumerate(text_ids):
+            matrix[id_a][id_a] = 0.0
+            for id_b in text_ids[i + 1:]:
+                divergence = self.compute_zip_divergence_prepared(prepared[id_a], prepared[id_b])
+                matrix[id_a][id_b] = matrix[id_b][id_a] = divergence
+        return matrix
+    
+    def compute_zip_divergence_prepared(self, prepared_a: Dict, prepared_b: Dict) -> float:
+        """ZIP divergence from artifacts produced by prepare_text"""
+        dict_a = prepared_a['dictionary']
+        dict_b = prepared_b['dictionary']
+        test_a_bytes = prepared_a['test_bytes']
+        test_b_bytes = prepared_b['test_bytes']
+        
+        # Self-compressed sizes are precomputed, only the cross compressions are new
+        a_self_size = prepared_a['self_compressed_size']
+        b_self_size = prepared_b['self_compressed_size']
+        a_cross_compressed = self.compress_with_deflate(test_a_bytes, dictionary=dict_b)
+        b_cross_compressed = self.compress_with_deflate(test_b_bytes, dictionary=dict_a)
         
         # Calculate bits per character difference
-        a_self_bits_per_char = (len(a_self_compressed) * 8) / len(test_a_bytes)
+        a_self_bits_per_char = (a_self_size * 8) / len(test_a_bytes)
         a_cross_bits_per_char = (len(a_cross_compressed) * 8) / len(test_a_bytes)
         divergence_a_to_b = a_cross_bits_per_char - a_self_bits_per_char
         
-        b_self_bits_per_char = (len(b_self_compressed) * 8) / len(test_b_bytes)
+        b_self_bits_per_char = (b_self_size * 8) / len(test_b_bytes)
         b_cross_bits_per_char = (len(b_cross_compressed) * 8) / len(test_b_bytes)
         divergence_b_to_a = b_cross_bits_per_char - b_self_bits_per_char
         
         # Store debugging info
         self.last_compression_debug = {
-            'content_a_length': len(content_a),
-            'content_b_length': len(content_b),
+            'content_a_length': prepared_a['length'],
+            'content_b_length': prepared_b['length'],
             'test_a_length': len(test_a_bytes),
             'test_b_length': len(test_b_bytes),
             'dict_a_preview': dict_a[:100].decode('utf-8', errors='replace').replace('\x00', '[NULL]'),
             'dict_b_preview': dict_b[:100].decode('utf-8', errors='replace').replace('\x00', '[NULL]'),
-            'a_self_compressed': len(a_self_compressed),
+            'a_self_compressed': a_self_size,
             'a_cross_compressed': len(a_cross_compressed),
-            'b_self_compressed': len(b_self_compressed),
+            'b_self_compressed': b_self_size,
             'b_cross_compressed': len(b_cross_compressed),
             'a_self_bits_per_char': a_self_bits_per_char,
             'a_cross_bits_per_char': a_cross_bits_per_char,
@@ -232,76 +248,184 @@ class DivergenceCalculator:
         # Symmetrize
         return (divergence_a_to_b + divergence_b_to_a) / 2
 
-def calculate_divergences(url: str, reference_texts_json: str) -> str:
+# Reference index shared by all requests, opened on first use
+_reference_index = None
+
+def get_reference_index() -> ReferenceIndex:
+    """Open the on-disk reference index (directory taken from REFERENCE_INDEX_DIR)"""
+    global _reference_index
+    if _reference_index is None:
+        index_dir = os.environ.get("REFERENCE_INDEX_DIR", "reference_index")
+        _reference_index = ReferenceIndex(index_dir, calculator=DivergenceCalculator())
+    return _reference_index
+
+# Result cache shared by all requests, created on first use
+_result_cache = None
+
+def get_result_cache() -> ResultCache:
+    """Create the result cache; RESULT_CACHE_DB enables the persistent SQLite tier"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache(
+            max_entries=int(os.environ.get("RESULT_CACHE_ENTRIES", "256")),
+            db_path=os.environ.get("RESULT_CACHE_DB"),
+            max_db_bytes=int(os.environ.get("RESULT_CACHE_DB_BYTES", str(64 * 1024 * 1024)))
+        )
+    return _result_cache
+
+def reference_set_hash(reference_data) -> str:
+    """Hash identifying the request's reference set by ids and reference contents"""
+    if isinstance(reference_data, list):
+        ids = get_reference_index().ids
+        return hash_reference_set((text_id, ids.get(text_id, '')) for text_id in reference_data)
+    # Invalid (non-string) references still need a key; their results are never cached
+    return hash_reference_set(
+        (text_id, ReferenceIndex.content_hash(ref_content) if isinstance(ref_content, str) else repr(ref_content))
+        for text_id, ref_content in reference_data.items()
+    )
+
+def resolve_references(calc: DivergenceCalculator, reference_data) -> Dict[str, Dict]:
     """
-    Calculate KL and ZIP divergences between URL content and reference texts.
+    Turn the request's reference set into prepared artifacts.
+    A JSON list is treated as ids of texts registered in the reference index;
+    a JSON object maps ids to full texts, which are prepared on the fly.
+    A text that cannot be prepared (e.g. not a string) maps to its exception.
+    """
+    with stage('references'):
+        if isinstance(reference_data, list):
+            return get_reference_index().get_many(reference_data)
+        references = {}
+        for text_id, ref_content in reference_data.items():
+            try:
+                references[text_id] = calc.prepare_text(ref_content)
+            except Exception as e:
+                references[text_id] = e
+        return references
+
+def register_reference_texts(reference_texts_json: str) -> str:
+    """
+    Register reference texts in the persistent index so later requests can use their ids.
     
     Args:
-        url: URL to fetch content from
-        reference_texts_json: JSON string containing reference texts
+        reference_texts_json: JSON object mapping reference ids to texts
         
     Returns:
-        JSON string with divergence results
+        JSON string mapping each id to its content hash
     """
-    calc = DivergenceCalculator()
-    
     try:
-        # Parse reference texts
         try:
             reference_data = json.loads(reference_texts_json)
         except json.JSONDecodeError as e:
             return json.dumps({"error": f"Invalid JSON: {str(e)}"})
         
-        # Fetch URL content
-        url_content = calc.fetch_url_content(url)
-        
-        if len(url_content) < 100:
-            return json.dumps({"error": "Content too short (< 100 characters)"})
-        
-        # Truncate content if too long
-        if len(url_content) > 50000:
-            url_content = url_content[:50000]
-        
-        # Calculate divergences
-        results = {
-            "url": url,
-            "content_length": len(url_content),
-            "content_preview": url_content[:200] + "...",
-            "full_content": url_content,  # Include full content for future comparisons
-            "kl_divergences": {},
-            "zip_divergences": {},
-            "compression_debug": []
-        }
+        registered = get_reference_index().register_many(reference_data)
+        return json.dumps({"registered": registered}, indent=2)
         
-        # Get character frequencies for URL content
-        url_frequencies = calc.compute_character_frequencies(url_content)
-        
-        # Calculate divergences with each reference text
-        for text_id, ref_content in reference_data.items():
-            try:
-                # KL divergence
-                ref_frequencies = calc.compute_character_frequencies(ref_content)
-                kl_div = calc.compute_kl_divergence(url_frequencies, ref_frequencies)
-                results["kl_divergences"][text_id] = round(kl_div, 4)
+    except Exception as e:
+        return json.dumps({
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        })
+
+def score_url(calc: DivergenceCalculator, url: str, reference_texts_json: str) -> Dict:
+    """Divergence results for one URL as a dict (an error dict if it cannot be scored)"""
+    # Parse reference texts
+    try:
+        reference_data = json.loads(reference_texts_json)
+    except json.JSONDecodeError as e:
+        return {"error": f"Invalid JSON: {str(e)}"}
+    
+    # Fetch URL content
+    # Content is truncated to 50000 characters while streaming, so the rest is never downloaded
+    url_content, url_char_counts = calc.stream_url_content(url, max_chars=50000)
+    
+    if len(url_content) < 100:
+        return {"error": "Content too short (< 100 characters)"}
+    
+    # Identical text against the same reference set gives identical results
+    cache = get_result_cache()
+    with stage('cache'):
+        cache_key = cache.make_key(url_content, reference_set_hash(reference_data), ALGORITHM_VERSION)
+        cached, tier = cache.lookup(cache_key)
+    if cached is not None:
+        return {"url": url, **cached, "cache": cache.metadata(tier)}
+    
+    # Calculate divergences
+    results = {
+        "content_length": len(url_content),
+        "content_preview": url_content[:200] + "...",
+        "full_content": url_content,  # Include full content for future comparisons
+        "kl_divergences": {},
+        "zip_divergences": {},
+        "compression_debug": []
+    }
+    
+    # Precompute URL-side artifacts once; reference-side ones come from the index
+    url_prepared = calc.prepare_text(url_content, char_counts=url_char_counts)
+    try:
+        references = resolve_references(calc, reference_data)
+    except KeyError as e:
+        return {"error": str(e)}
+    
+    # Calculate divergences with each reference text
+    failed = False
+    for text_id, ref_prepared in references.items():
+        try:
+            if isinstance(ref_prepared, Exception):
+                raise ref_prepared
+            
+            # KL divergence
+            kl_div = calc.compute_kl_divergence(url_prepared['frequencies'], ref_prepared['frequencies'])
+            results["kl_divergences"][text_id] = round(kl_div, 4)
+            
+            # ZIP divergence (only if both texts are long enough)
+            if ref_prepared['length'] > 200 and len(url_content) > 200:
+                zip_div = calc.compute_zip_divergence_prepared(url_prepared, ref_prepared)
+                results["zip_divergences"][text_id] = round(zip_div, 4)
                 
-                # ZIP divergence (only if both texts are long enough)
-                if len(ref_content) > 200 and len(url_content) > 200:
-                    zip_div = calc.compute_zip_divergence(url_content, ref_content)
-                    results["zip_divergences"][text_id] = round(zip_div, 4)
-                    
-                    # Store debug info for first two comparisons
-                    if len(results["compression_debug"]) < 2 and hasattr(calc, 'last_compression_debug'):
-                        debug_info = calc.last_compression_debug.copy()
-                        debug_info['comparison'] = f"URL vs {text_id}"
-                        results["compression_debug"].append(debug_info)
-                else:
-                    results["zip_divergences"][text_id] = None
-                    
-            except Exception as e:
-                results["kl_divergences"][text_id] = None
+                # Store debug info for first two comparisons
+                if len(results["compression_debug"]) < 2 and hasattr(calc, 'last_compression_debug'):
+                    debug_info = calc.last_compression_debug.copy()
+                    debug_info['comparison'] = f"URL vs {text_id}"
+                    results["compression_debug"].append(debug_info)
+            else:
                 results["zip_divergences"][text_id] = None
-                print(f"Error processing {text_id}: {str(e)}")
+                
+        except Exception as e:
+            results["kl_divergences"][text_id] = None
+            results["zip_divergences"][text_id] = None
+            failed = True
+            print(f"Error processing {text_id}: {str(e)}")
+    
+    # Results with failed comparisons are not cached, so the next request retries them
+    if not failed:
+        cache.put(cache_key, results)
+    return {"url": url, **results, "cache": cache.metadata(None)}
+
+def calculate_divergences(url: str, reference_texts_json: str, include_timings: bool = False) -> str:
+    """
+    Calculate KL and ZIP divergences between URL content and reference texts.
+    
+    Args:
+        url: URL to fetch content from
+        reference_texts_json: JSON object of reference texts, or JSON list of
+            reference ids registered with register_reference_texts
+        include_timings: Add per-stage wall/CPU timings and byte counts to the result
         
+    Returns:
+        JSON string with divergence results
+    """
+    calc = DivergenceCalculator()
+    
+    try:
+        with profile_request() as profiler:
+            results = score_url(calc, url, reference_texts_json)
+        
+        if "error" not in results:
+            timings = profiler.as_dict()
+            latency_histogram.record(timings)
+            if include_timings:
+                results["timings"] = timings
         return json.dumps(results, indent=2)
         
     except Exception as e:
@@ -310,8 +434,18 @@ def calculate_divergences(url: str, reference_texts_json: str) -> str:
             "traceback": traceback.format_exc()
         })
 
+def get_latency_summary() -> str:
+    """
+    Per-stage latency distribution over recent divergence requests.
+    
+    Returns:
+        JSON string with the request count, bucket bounds and, per stage,
+        mean/p50/p90/p99/max wall time in milliseconds and bucket counts
+    """
+    return json.dumps(latency_histogram.summary(), indent=2)
+
 class GPT2Compressor:
-    def __init__(self):
+    def __init__(self, top_k: int = 5, stride: int = 512, chunk_size: int = 256):
         self.tokenizer = GPT2Tokenizer.from_pretrained('gpt2')
         self.model = GPT2LMHeadModel.from_pretrained('gpt2')
         self.model.eval()
@@ -319,6 +453,11 @@ class GPT2Compressor:
         # Set pad token to eos token
         if self.tokenizer.pad_token is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
+        
+        self.top_k = top_k
+        self.max_length = self.model.config.n_positions
+        self.stride = min(stride, self.max_length)
+        self.chunk_size = chunk_size
     
     def shannon_code_length(self, prob: float) -> int:
         """Calculate Shannon code length in bits for given probability"""
@@ -326,55 +465,112 @@ class GPT2Compressor:
             return 32  # Max reasonable code length
         return max(1, math.ceil(-math.log2(prob)))
     
-    def compress_string_step_by_step(self, text: str) -> Dict:
+    def first_token_prediction(self, token: int) -> Tuple[float, List[float], List[int]]:
+        """Placeholder distribution for the first token, which has no context to condition on"""
+        logits = torch.zeros(self.tokenizer.vocab_size)
+        logits[token] = 1.0  # Give some default probability
+        probabilities = torch.softmax(logits, dim=-1)
+        top_probs, top_indices = torch.topk(probabilities, self.top_k)
+        return probabilities[token].item(), top_probs.tolist(), top_indices.tolist()
+    
+    def predict_tokens_single_pass(self, tokens: List[int]) -> List[Tuple[float, List[float], List[int]]]:
         """
-        Compress a string using GPT2 predictions, returning step-by-step information
+        Next-token predictions for tokens[1:], returned as (actual probability, top-k
+        probabilities, top-k token ids) per token, from one forward pass over the sequence.
+        
+        Logits at position p predict token p + 1, so a single causal pass yields every
+        step's distribution. Each window is fed in chunks through the KV cache to bound
+        the size of the logits tensor. Sequences longer than the context window are
+        covered by windows advancing by `stride` tokens; every window after the first
+        only scores tokens not scored yet, using the overlap as context. Those tokens see
+        between max_length - stride and max_length - 1 tokens of context instead of the
+        full max_length - 1, so their probabilities only approximate the per-prefix ones.
+        """
+        predictions = []
+        next_target = 1  # index of the next token that needs a prediction
+        
+        for begin in range(0, len(tokens), self.stride):
+            end = min(begin + self.max_length, len(tokens))
+            past_key_values = None
+            
+            for chunk_begin in range(begin, end, self.chunk_size):
+                chunk_end = min(chunk_begin + self.chunk_size, end)
+                
+                # Targets predicted by positions chunk_begin..chunk_end-1 that are still unscored
+                first_target = max(next_target, chunk_begin + 1)
+                end_target = min(chunk_end + 1, len(tokens))
+                
+                input_ids = torch.tensor([tokens[chunk_begin:chunk_end]])
+                with torch.no_grad():
+                    outputs = self.model(input_ids, past_key_values=past_key_values, use_cache=True)
+                past_key_values = outputs.past_key_values
+                
+                if first_target >= end_target:
+                    continue
+                
+                rows = outputs.logits[0, first_target - 1 - chunk_begin:end_target - 1 - chunk_begin]
+                targets = torch.tensor(tokens[first_target:end_target])
+                
+                probabilities = torch.softmax(rows, dim=-1)
+                actual_probs = probabilities.gather(1, targets.unsqueeze(1)).squeeze(1)
+                top_probs, top_indices = torch.topk(probabilities, self.top_k, dim=-1)
+                predictions.extend(zip(actual_probs.tolist(), top_probs.tolist(), top_indices.tolist()))
+                next_target = end_target
+            
+            if end == len(tokens):
+                break
+        
+        return predictions
+    
+    def predict_tokens_incrementally(self, tokens: List[int]) -> List[Tuple[float, List[float], List[int]]]:
+        """
+        Predictions with one forward pass per token prefix (truncated to the last max_length
+        tokens). Equal to predict_tokens_single_pass within the context window; past it,
+        the strided windows of the single pass see less context.
+        """
+        predictions = []
+        for i in range(1, len(tokens)):
+            input_ids = torch.tensor([tokens[max(0, i - self.max_length):i]])
+            with torch.no_grad():
+                logits = self.model(input_ids).logits[0, -1, :]  # Last token predictions
+            probabilities = torch.softmax(logits, dim=-1)
+            top_probs, top_indices = torch.topk(probabilities, self.top_k)
+            predictions.append((probabilities[tokens[i]].item(), top_probs.tolist(), top_indices.tolist()))
+        return predictions
+    
+    def compress_string_step_by_step(self, text: str, single_pass: bool = True) -> Dict:
+        """
+        Compress a string using GPT2 predictions, returning step-by-step information.
+        With single_pass, all next-token distributions come from one forward pass
+        instead of one pass per token over the growing prefix.
         """
         try:
             # Tokenize the input
             tokens = self.tokenizer.encode(text)
             token_strings = [self.tokenizer.decode([token]) for token in tokens]
             
+            if not tokens:
+                predictions = []
+            elif single_pass:
+                predictions = [self.first_token_prediction(tokens[0])] + self.predict_tokens_single_pass(tokens)
+            else:
+                predictions = [self.first_token_prediction(tokens[0])] + self.predict_tokens_incrementally(tokens)
+            
             steps = []
             total_bits = 0
             
-            for i in range(len(tokens)):
-                # Get context (all previous tokens)
-                context = tokens[:i] if i > 0 else []
+            for i, (actual_prob, top_probs, top_indices) in enumerate(predictions):
                 current_token = tokens[i]
                 
-                # Get model predictions for next token
-                if context:
-                    input_ids = torch.tensor([context])
-                    with torch.no_grad():
-                        outputs = self.model(input_ids)
-                        logits = outputs.logits[0, -1, :]  # Last token predictions
-                else:
-                    # For first token, use unconditional distribution
-                    input_ids = torch.tensor([[]])
-                    with torch.no_grad():
-                        # Get the model's initial state predictions
-                        logits = self.model.get_input_embeddings().weight.mean(dim=0)
-                        logits = torch.zeros(self.tokenizer.vocab_size)
-                        logits[current_token] = 1.0  # Give some default probability
-                
-                # Convert logits to probabilities
-                probabilities = torch.softmax(logits, dim=-1)
-                
-                # Get top 5 predictions
-                top_probs, top_indices = torch.topk(probabilities, 5)
                 top_predictions = [
                     {
-                        "token": self.tokenizer.decode([idx.item()]),
-                        "token_id": idx.item(),
-                        "probability": prob.item()
+                        "token": self.tokenizer.decode([idx]),
+                        "token_id": idx,
+                        "probability": prob
                     }
                     for idx, prob in zip(top_indices, top_probs)
                 ]
                 
-                # Get actual token probability
-                actual_prob = probabilities[current_token].item()
-                
                 # Calculate Shannon code length
                 code_length = self.shannon_code_length(actual_prob)
                 total_bits += code_length
@@ -384,7 +580,7 @@ class GPT2Compressor:
                     "step_number": i,
                     "token": token_strings[i],
                     "token_id": current_token,
-                    "context_tokens": [token_strings[j] for j in range(i)],
+                    "context_tokens": token_strings[:i],
                     "top_predictions": top_predictions,
                     "actual_probability": actual_prob,
                     "shannon_code_length": code_length,
@@ -413,6 +609,15 @@ class GPT2Compressor:
                 "success": False
             }
 
+# Model is loaded once per process and shared by all requests
+_gpt2_compressor = None
+
+def get_gpt2_compressor() -> GPT2Compressor:
+    global _gpt2_compressor
+    if _gpt2_compressor is None:
+        _gpt2_compressor = GPT2Compressor()
+    return _gpt2_compressor
+
 def compress_with_gpt2(text: str) -> str:
     """
     API endpoint for GPT2-based compression analysis
@@ -423,7 +628,7 @@ def compress_with_gpt2(text: str) -> str:
             "success": False
         })
     
-    compressor = GPT2Compressor()
+    compressor = get_gpt2_compressor()
     result = compressor.compress_string_step_by_step(text)
     return json.dumps(result, indent=2)
 
@@ -443,7 +648,8 @@ divergence_iface = gr.Interface(
             lines=10, 
             placeholder='{"country_france": "France content...", "sport_football": "Football content..."}',
             value='{\n  "example1": "This is example text about France...",\n  "example2": "This is example text about sports..."\n}'
-        )
+        ),
+        gr.Checkbox(label="Include stage timings", value=False)
     ],
     outputs=gr.JSON(label="Divergence Results"),
     title="Text Divergence Calculator",
@@ -471,10 +677,34 @@ gpt2_iface = gr.Interface(
     ]
 )
 
+# Reference registration interface
+register_iface = gr.Interface(
+    fn=register_reference_texts,
+    inputs=[
+        gr.Textbox(
+            label="Reference Texts (JSON)",
+            lines=10,
+            placeholder='{"country_france": "France content...", "sport_football": "Football content..."}'
+        )
+    ],
+    outputs=gr.JSON(label="Registered References"),
+    title="Reference Registration",
+    description="Precompute and store reference texts once; divergence requests can then pass a JSON list of their ids instead of the full texts."
+)
+
+# Latency histogram interface
+latency_iface = gr.Interface(
+    fn=get_latency_summary,
+    inputs=[],
+    outputs=gr.JSON(label="Stage Latencies"),
+    title="Latency Histogram",
+    description="Per-stage wall-time percentiles and histogram buckets over recent divergence requests."
+)
+
 # Combine interfaces in tabs
 app = gr.TabbedInterface(
-    [divergence_iface, gpt2_iface],
-    ["Text Divergence", "GPT2 Compression"],
+    [divergence_iface, gpt2_iface, register_iface, latency_iface],
+    ["Text Divergence", "GPT2 Compression", "Register References", "Latency"],
     title="Text Analysis Tools"
 )
 
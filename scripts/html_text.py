@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Streaming HTML-to-text extraction with bounded memory.
+
+StreamingTextExtractor consumes a document in chunks and emits whitespace-normalized
+text as soon as it is available, dropping <script> and <style> blocks incrementally.
+It only ever buffers the currently open tag (capped at MAX_TAG_CHARS) or the few
+characters needed to spot a closing </script>/</style> split across chunks, and it
+stops once an optional character budget has been emitted.
+
+The output follows the old regex pipeline (remove script/style, replace tags with
+a space, collapse whitespace), with two differences: whether a document is HTML
+is decided from its first SNIFF_CHARS characters instead of the whole document,
+and a <script> or <style> that is never closed drops the rest of the document
+(the regexes left its contents in the text, which would mean buffering them).
+"""
+
+import re
+from typing import Iterable, Iterator, List, Optional
+
+SNIFF_CHARS = 1024
+MAX_TAG_CHARS = 65536
+
+SKIPPED_BLOCK_START = re.compile(r'<(script|style)\b', re.IGNORECASE)
+SKIPPED_BLOCK_END = {
+    '</script>': re.compile(r'</script>', re.IGNORECASE),
+    '</style>': re.compile(r'</style>', re.IGNORECASE),
+}
+
+def looks_like_html(text: str) -> bool:
+    """Same heuristic the fetchers always used to decide whether to strip tags"""
+    lowered = text.lower()
+    return '<html' in lowered or '<!doctype' in lowered
+
+class StreamingTextExtractor:
+    def __init__(self, max_chars: Optional[int] = None, is_html: Optional[bool] = None):
+        """
+        Args:
+            max_chars: Stop after emitting this many characters (None for no limit)
+            is_html: Whether to strip tags; None sniffs the first SNIFF_CHARS characters
+        """
+        self.max_chars = max_chars
+        self.is_html = is_html
+
+        self.buffer = ''
+        self.state = 'text'  # 'text', 'tag', or the closing tag of a skipped block
+        self.pending_space = False
+        self.emitted = 0
+        self.done = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """Consume the next chunk of the document and return the text pieces it completes"""
+        if self.done:
+            return []
+
+        self.buffer += chunk
+        if self.is_html is None:
+            if len(self.buffer) < SNIFF_CHARS:
+                return []
+            self.is_html = looks_like_html(self.buffer[:SNIFF_CHARS])
+        return self._drain(final=False)
+
+    def close(self) -> List[str]:
+        """Signal the end of the document and return any remaining text pieces"""
+        if self.done:
+            return []
+
+        if self.is_html is None:
+            self.is_html = looks_like_html(self.buffer)
+        pieces = self._drain(final=True)
+        self.done = True
+        self.buffer = ''
+        return pieces
+
+    def _drain(self, final: bool) -> List[str]:
+        pieces = []
+        buf = self.buffer
+        pos = 0
+
+        if not self.is_html:
+            # Plain text is passed through unchanged, only the budget applies
+            self._emit(buf, pieces)
+            self.buffer = ''
+            return pieces
+
+        while pos < len(buf) and not self.done:
+            if self.state == 'text':
+                lt = buf.find('<', pos)
+                if lt == -1:
+                    self._emit_text(buf[pos:], pieces)
+                    pos = len(buf)
+                    break
+                self._emit_text(buf[pos:lt], pieces)
+                pos = lt
+                self.state = 'tag'
+
+            elif self.state == 'tag':
+                # buf[pos] is the '<' that opened the tag
+                gt = buf.find('>', pos + 1)
+                if gt == -1:
+                    if final:
+                        # An unterminated '<' at the end of the document is plain text
+                        self._emit_text(buf[pos:], pieces)
+                        pos = len(buf)
+                    elif len(buf) - pos > MAX_TAG_CHARS:
+                        # Runaway tag: drop what we have so far, keep only the opening '<'
+                        buf = buf[:pos + 1]
+                    break
+
+                tag = buf[pos:gt + 1]
+                pos = gt + 1
+                self.state = 'text'
+
+                if tag == '<>':
+                    self._emit_text(tag, pieces)
+                    continue
+                match = SKIPPED_BLOCK_START.match(tag)
+                if match:
+                    # Script and style blocks are removed without leaving a space
+                    self.state = f"</{match.group(1).lower()}>"
+                else:
+                    # Other tags are replaced with a space
+                    self.pending_space = True
+
+            else:
+                match = SKIPPED_BLOCK_END[self.state].search(buf, pos)
+                if match is None:
+                    # Keep just enough to find a closing tag split across chunks
+                    pos = max(pos, len(buf) - len(self.state) + 1)
+                    break
+                pos = match.end()
+                self.state = 'text'
+
+        self.buffer = buf[pos:]
+        return pieces
+
+    def _emit_text(self, segment: str, pieces: List[str]):
+        """Emit a text segment with whitespace collapsed across segment and chunk boundaries"""
+        if not segment:
+            return
+
+        words = segment.split()
+        if not words:
+            self.pending_space = True
+            return
+
+        piece = ' '.join(words)
+        if (self.pending_space or segment[0].isspace()) and self.emitted > 0:
+            piece = ' ' + piece
+        self.pending_space = segment[-1].isspace()
+        self._emit(piece, pieces)
+
+    def _emit(self, piece: str, pieces: List[str]):
+        if self.max_chars is not None:
+            remaining = self.max_chars - self.emitted
+            if len(piece) >= remaining:
+                piece = piece[:remaining]
+                self.done = True
+        if piece:
+            pieces.append(piece)
+            self.emitted += len(piece)
+
+def iter_text(chunks: Iterable[str], max_chars: Optional[int] = None,
+              is_html: Optional[bool] = None) -> Iterator[str]:
+    """Extract normalized text from an iterable of document chunks, piece by piece"""
+    extractor = StreamingTextExtractor(max_chars, is_html)
+    for chunk in chunks:
+        yield from extractor.feed(chunk)
+        if extractor.done:
+            return
+    yield from extractor.close()
+
+def extract_text(content: str, max_chars: Optional[int] = None) -> str:
+    """Strip HTML down to whitespace-normalized text if the content looks like an HTML page"""
+    return ''.join(iter_text([content], max_chars, is_html=looks_like_html(content)))
@@ -4,96 +4,17 @@ Improved dictionary creation using frequency analysis
 """
 
 import re
-from collections import Counter
 from pathlib import Path
 
+from dictionary_builder import create_frequency_dictionary, create_prefix_dictionary
+
 def create_frequency_based_dictionary(content, dict_size=1024):
     """Create dictionary from most frequent patterns in first 50% of content"""
-    content_bytes = content.encode('utf-8', errors='replace')
-    
-    # Use first 50% of content as dictionary source
-    dict_source_end = len(content_bytes) // 2
-    dict_source_text = content_bytes[:dict_source_end].decode('utf-8', errors='replace')
-    
-    # Extract different types of patterns
-    patterns = []
-    
-    # 1. Words (most important)
-    words = re.findall(r'\b\w+\b', dict_source_text.lower())
-    word_counts = Counter(words)
-    
-    # 2. Common bigrams and trigrams
-    bigrams = []
-    trigrams = []
-    for i in range(len(dict_source_text) - 2):
-        if dict_source_text[i:i+2].isalnum() or ' ' in dict_source_text[i:i+2]:
-            bigrams.append(dict_source_text[i:i+2])
-        if dict_source_text[i:i+3].isalnum() or ' ' in dict_source_text[i:i+3]:
-            trigrams.append(dict_source_text[i:i+3])
-    
-    bigram_counts = Counter(bigrams)
-    trigram_counts = Counter(trigrams)
-    
-    # 3. Build dictionary content prioritizing by frequency and usefulness
-    dictionary_content = []
-    current_size = 0
-    
-    # Add most frequent words first (they compress best)
-    for word, count in word_counts.most_common():
-        if count >= 2:  # Only words that appear multiple times
-            word_with_space = f" {word} "
-            word_bytes = word_with_space.encode('utf-8')
-            if current_size + len(word_bytes) <= dict_size:
-                dictionary_content.append(word_with_space)
-                current_size += len(word_bytes)
-            else:
-                break
-    
-    # Add frequent trigrams that aren't already covered
-    for trigram, count in trigram_counts.most_common():
-        if count >= 2 and trigram not in ''.join(dictionary_content):
-            trigram_bytes = trigram.encode('utf-8')
-            if current_size + len(trigram_bytes) <= dict_size:
-                dictionary_content.append(trigram)
-                current_size += len(trigram_bytes)
-            else:
-                break
-    
-    # Add frequent bigrams to fill remaining space
-    for bigram, count in bigram_counts.most_common():
-        if count >= 3 and bigram not in ''.join(dictionary_content):
-            bigram_bytes = bigram.encode('utf-8')
-            if current_size + len(bigram_bytes) <= dict_size:
-                dictionary_content.append(bigram)
-                current_size += len(bigram_bytes)
-            else:
-                break
-    
-    # Convert to bytes and pad to exact dict_size
-    dict_text = ''.join(dictionary_content)
-    dict_bytes = dict_text.encode('utf-8', errors='replace')
-    
-    if len(dict_bytes) < dict_size:
-        # Pad with null bytes
-        padding = b'\x00' * (dict_size - len(dict_bytes))
-        dict_bytes += padding
-    else:
-        # Truncate if too long
-        dict_bytes = dict_bytes[:dict_size]
-    
-    return dict_bytes
+    return create_frequency_dictionary(content, dict_size)
 
 def create_simple_dictionary(content, dict_size=1024):
     """Original simple dictionary (first N bytes)"""
-    content_bytes = content.encode('utf-8', errors='replace')
-    dict_source_end = len(content_bytes) // 2
-    dict_source = content_bytes[:dict_source_end]
-    
-    if len(dict_source) >= dict_size:
-        return dict_source[:dict_size]
-    else:
-        padding = b'\x00' * (dict_size - len(dict_source))
-        return dict_source + padding
+    return create_prefix_dictionary(content, dict_size)
 
 def compare_dictionary_methods(item_id):
     """Compare simple vs frequency-based dictionary creation"""
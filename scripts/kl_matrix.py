@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Character KL divergence, cross-entropy and entropy matrices for many items at once.
+
+The analyzers used to compute KL pair by pair, building a set union and two
+arrays from dict lookups for each of the N² pairs. Here all distributions are
+stacked onto one shared alphabet (an N × |alphabet| array) and the matrices come
+from a few matrix products on precomputed logs.
+
+The pairwise definitions only look at the characters that occur in one of the
+two items. Sums over those characters are sums over the whole alphabet minus
+sums over the characters absent from both, and both are matrix products:
+
+    Σ_{c ∈ i ∪ j} x[i,c]·y[j,c] = (x @ y.T)[i,j] - ((x·absent) @ (y·absent).T)[i,j]
+
+Two smoothing conventions are in use:
+- renormalize=True (the analyzers, the divergence API): frequencies are floored
+  at min_freq and renormalized over the pair's characters
+- renormalize=False (CompressionAnalyzer): a character missing from one item
+  gets min_freq there, without renormalization
+"""
+
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+def stack_distributions(freqs: Sequence[Mapping[str, float]]) -> Tuple[List[str], np.ndarray]:
+    """Shared alphabet of the distributions and their (N × |alphabet|) frequency array"""
+    alphabet = sorted(set().union(*freqs))
+    index = {char: i for i, char in enumerate(alphabet)}
+    distributions = np.zeros((len(freqs), len(alphabet)))
+    for row, item_freqs in enumerate(freqs):
+        columns = [index[char] for char in item_freqs]
+        distributions[row, columns] = list(item_freqs.values())
+    return alphabet, distributions
+
+def kl_matrices(distributions: np.ndarray, min_freq: float = 2**-10, renormalize: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Pairwise matrices of N distributions over a shared alphabet (rows of distributions):
+    'kl' (KL(i || j), in bits), 'symmetric' ((KL(i || j) + KL(j || i)) / 2),
+    'cross_entropy' (H(i, j), in bits) and 'entropy' (H(i) of the raw frequencies).
+    """
+    p = np.asarray(distributions, dtype=np.float64)
+    present = p > 0
+    absent = (~present).astype(np.float64)
+
+    smoothed = np.maximum(p, min_freq) if renormalize else np.where(present, p, min_freq)
+    logs = np.log2(smoothed)
+    plogp = smoothed * logs
+
+    # Sums over the characters of i ∪ j: total - characters absent from both
+    z = smoothed.sum(axis=1)[:, None] - (smoothed * absent) @ absent.T
+    u = plogp.sum(axis=1)[:, None] - (plogp * absent) @ absent.T
+    v = smoothed @ logs.T - (smoothed * absent) @ (logs * absent).T
+
+    if renormalize:
+        # p' = p / z[i, j] and q' = q / z[j, i] on the pair's characters (none if both are empty)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_z = np.log2(z)
+            kl = np.where(z > 0, (u - v) / z - log_z + log_z.T, 0.0)
+            cross_entropy = np.where(z > 0, -v / z + log_z.T, 0.0)
+    else:
+        kl = u - v
+        cross_entropy = -v
+    np.fill_diagonal(kl, 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropy = np.sum(np.where(present, -p * np.log2(p), 0.0), axis=1)
+
+    return {
+        'kl': kl,
+        'symmetric': (kl + kl.T) / 2,
+        'cross_entropy': cross_entropy,
+        'entropy': entropy,
+    }
+
+def symmetric_kl_matrix(freqs: Sequence[Mapping[str, float]], min_freq: float = 2**-10) -> np.ndarray:
+    """Symmetrized KL between every pair of frequency dicts (floored and renormalized per pair)"""
+    _, distributions = stack_distributions(freqs)
+    return kl_matrices(distributions, min_freq)['symmetric']
@@ -4,18 +4,18 @@ LZ4-based compression analysis with dictionary support.
 Uses LZ4's built-in dictionary compression to measure language similarity.
 """
 
-import os
 import json
 import numpy as np
 from collections import defaultdict
 import argparse
 from pathlib import Path
-import subprocess
-import tempfile
+
+from compression_engine import CompressionDistanceEngine, DictionaryMetric, Lz4Codec
 
 class LZ4CompressionAnalyzer:
-    def __init__(self, data_dir="data/programming_languages"):
+    def __init__(self, data_dir="data/programming_languages", max_workers=None):
         self.data_dir = Path(data_dir)
+        self.max_workers = max_workers
         self.languages = []
         self.language_data = {}
         self.load_languages()
@@ -54,110 +54,16 @@ class LZ4CompressionAnalyzer:
                 if lang in self.languages:
                     self.languages.remove(lang)
     
-    def check_lz4_installed(self):
-        """Check if lz4 is installed"""
-        try:
-            result = subprocess.run(['lz4', '--version'], capture_output=True, text=True)
-            return result.returncode == 0
-        except FileNotFoundError:
-            return False
-    
-    def install_lz4(self):
-        """Try to install python lz4 module"""
-        print("Installing lz4 module...")
-        try:
-            subprocess.run(['pip3', 'install', 'lz4'], check=True)
-            return True
-        except:
-            return False
-    
-    def compress_with_lz4_cli(self, data, dict_data=None):
-        """Use lz4 command-line tool for compression"""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-            f.write(data)
-            input_file = f.name
-        
-        output_file = input_file + '.lz4'
-        
-        try:
-            if dict_data:
-                # Create dictionary file
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.dict', delete=False) as df:
-                    df.write(dict_data)
-                    dict_file = df.name
-                
-                # Compress with dictionary
-                cmd = ['lz4', '-D', dict_file, input_file, output_file]
-                subprocess.run(cmd, check=True, capture_output=True)
-                os.unlink(dict_file)
-            else:
-                # Regular compression
-                cmd = ['lz4', input_file, output_file]
-                subprocess.run(cmd, check=True, capture_output=True)
-            
-            # Get compressed size
-            compressed_size = os.path.getsize(output_file)
-            
-            # Cleanup
-            os.unlink(input_file)
-            os.unlink(output_file)
-            
-            return compressed_size
-            
-        except Exception as e:
-            # Cleanup on error
-            if os.path.exists(input_file):
-                os.unlink(input_file)
-            if os.path.exists(output_file):
-                os.unlink(output_file)
-            raise e
-    
-    def compress_with_lz4_python(self, data, dict_data=None):
-        """Use python lz4 module for compression"""
-        try:
-            import lz4.frame
-            import lz4.block
-        except ImportError:
-            if self.install_lz4():
-                import lz4.frame
-                import lz4.block
-            else:
-                raise ImportError("Could not install lz4 module")
-        
-        data_bytes = data.encode('utf-8')
-        
-        if dict_data:
-            # LZ4 block compression with dictionary
-            dict_bytes = dict_data.encode('utf-8')
-            
-            # Build compression context with dictionary
-            # Note: lz4.block doesn't have direct dictionary support,
-            # so we'll simulate it by compressing dict+data
-            combined = dict_bytes + b'\n\n' + data_bytes
-            compressed = lz4.block.compress(combined, mode='high_compression')
-            
-            # Subtract approximate dictionary contribution
-            dict_compressed = lz4.block.compress(dict_bytes, mode='high_compression')
-            estimated_size = len(compressed) - len(dict_compressed) // 2
-            
-            return max(10, estimated_size)  # Ensure positive size
-        else:
-            # Regular compression
-            compressed = lz4.frame.compress(data_bytes, compression_level=16)
-            return len(compressed)
-    
     def analyze_lz4_compression(self):
         """Analyze compression using LZ4 with dictionaries"""
         print(f"\nAnalyzing LZ4 dictionary-based compression...")
         
         # Choose compression method
-        use_cli = self.check_lz4_installed()
-        if use_cli:
+        codec = Lz4Codec()
+        if codec.backend == 'cli':
             print("  Using lz4 command-line tool")
-            compress_func = self.compress_with_lz4_cli
         else:
             print("  Using Python lz4 module")
-            compress_func = self.compress_with_lz4_python
         
         results = {
             'languages': self.languages,
@@ -168,70 +74,56 @@ class LZ4CompressionAnalyzer:
             'distance_matrix': {}
         }
         
-        # Get baseline compression (no dictionary)
-        print("  Computing baseline compression...")
+        # Baseline compression (no dictionary) of every language, then dictionary-based
+        # compression of every pair: self-compression uses the first half as dictionary
+        # for the second half, cross-compression truncates both to the same size
+        print("  Computing baseline and dictionary compression...")
+        matrix = CompressionDistanceEngine(DictionaryMetric(codec), self.max_workers).run(
+            {lang: self.language_data[lang] for lang in self.languages}
+        )
+        
         for lang in self.languages:
-            try:
-                data = self.language_data[lang]
-                original_size = len(data.encode('utf-8'))
-                compressed_size = compress_func(data, dict_data=None)
-                
-                results['baseline_sizes'][lang] = {
-                    'original': original_size,
-                    'compressed': compressed_size,
-                    'ratio': compressed_size / original_size
-                }
-                
-                print(f"    {lang}: {original_size} → {compressed_size} bytes ({compressed_size/original_size:.3f})")
-                
-            except Exception as e:
-                print(f"    Error with {lang}: {e}")
+            artifacts = matrix['items'][lang]
+            if 'error' in artifacts:
+                print(f"    Error with {lang}: {artifacts['error']}")
+                continue
+            
+            original_size = artifacts['original']
+            compressed_size = artifacts['compressed']
+            
+            results['baseline_sizes'][lang] = {
+                'original': original_size,
+                'compressed': compressed_size,
+                'ratio': compressed_size / original_size
+            }
+            
+            print(f"    {lang}: {original_size} → {compressed_size} bytes ({compressed_size/original_size:.3f})")
         
-        # Test dictionary-based compression
-        print("  Testing dictionary compression...")
         for dict_lang in self.languages:
             results['dictionary_compression'][dict_lang] = {}
             results['compression_ratios'][dict_lang] = {}
             
             for target_lang in self.languages:
-                try:
-                    if dict_lang == target_lang:
-                        # Self-compression: split data in half
-                        data = self.language_data[target_lang]
-                        mid = len(data) // 2
-                        dict_part = data[:mid]
-                        target_part = data[mid:]
-                    else:
-                        # Cross-compression
-                        dict_part = self.language_data[dict_lang]
-                        target_part = self.language_data[target_lang]
-                        
-                        # Truncate to same size
-                        min_len = min(len(dict_part), len(target_part))
-                        dict_part = dict_part[:min_len]
-                        target_part = target_part[:min_len]
-                    
-                    # Baseline (no dictionary)
-                    baseline_size = compress_func(target_part, dict_data=None)
-                    
-                    # With dictionary
-                    dict_size = compress_func(target_part, dict_data=dict_part)
-                    
-                    # Compression ratio
-                    ratio = dict_size / baseline_size if baseline_size > 0 else 1.0
-                    
-                    results['dictionary_compression'][dict_lang][target_lang] = {
-                        'baseline': baseline_size,
-                        'with_dict': dict_size,
-                        'ratio': ratio,
-                        'improvement': 1.0 - ratio
-                    }
-                    
-                    results['compression_ratios'][dict_lang][target_lang] = ratio
-                    
-                except Exception as e:
-                    print(f"    Error {dict_lang}→{target_lang}: {e}")
+                entry = matrix['pairs'][dict_lang][target_lang]
+                if 'error' in entry:
+                    print(f"    Error {dict_lang}→{target_lang}: {entry['error']}")
                     results['compression_ratios'][dict_lang][target_lang] = 1.0
+                    continue
+                
+                baseline_size = entry['baseline']
+                dict_size = entry['with_dict']
+                
+                # Compression ratio
+                ratio = dict_size / baseline_size if baseline_size > 0 else 1.0
+                
+                results['dictionary_compression'][dict_lang][target_lang] = {
+                    'baseline': baseline_size,
+                    'with_dict': dict_size,
+                    'ratio': ratio,
+                    'improvement': 1.0 - ratio
+                }
+                
+                results['compression_ratios'][dict_lang][target_lang] = ratio
         
         # Calculate distance matrix
         print("  Calculating distance matrix...")
@@ -327,10 +219,11 @@ class LZ4CompressionAnalyzer:
 def main():
     parser = argparse.ArgumentParser(description='Run LZ4 compression analysis')
     parser.add_argument('--data-dir', default='data/programming_languages')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for the pairwise compressions (default: CPU count)')
     
     args = parser.parse_args()
     
-    analyzer = LZ4CompressionAnalyzer(args.data_dir)
+    analyzer = LZ4CompressionAnalyzer(args.data_dir, args.workers)
     results = analyzer.run_analysis()
     
     if results:
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Binary distance-matrix artifacts for the analysis results.
+
+The analyzers' JSON files store every N×N matrix as nested dicts of floats,
+so reading one row means parsing the whole file. An artifact stores the same
+results as a directory:
+
+    three_categories_analysis-<path hash>.matrices/
+        index.json        item ids, categories, metadata, per-item values
+        <matrix>.npy      one float64 N×N array per matrix, rows and columns in id order
+
+Arrays are opened memory-mapped, so a row, submatrix or category-block query
+only reads the pages it touches. Matrices are named by their path in the
+results: 'kl_analysis.baseline' for results['kl_analysis']['baseline']['distance_matrix'],
+'deflate_analysis.compression_benefits' for other square per-pair tables.
+
+Artifacts live outside the repository (MATRIX_ARTIFACT_DIR, or a per-user cache
+directory): the JSON files sit under public/, which the site serves. The analyzers
+(save_results) write both; open_results() builds a missing or stale artifact from
+the JSON file on first read, so later queries skip the JSON parse. Values are
+stored as float64, so they are exactly the JSON values.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+INDEX_FILE = "index.json"
+
+def artifact_root() -> Path:
+    """Directory of all artifacts: $MATRIX_ARTIFACT_DIR, or ~/.cache/problens/matrices"""
+    if os.environ.get("MATRIX_ARTIFACT_DIR"):
+        return Path(os.environ["MATRIX_ARTIFACT_DIR"])
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "problens" / "matrices"
+
+def artifact_path(json_path: Union[str, Path]) -> Path:
+    """Artifact directory of an analysis JSON file (keyed by its absolute path)"""
+    json_path = Path(json_path).resolve()
+    digest = hashlib.sha256(str(json_path).encode('utf-8')).hexdigest()[:12]
+    return artifact_root() / f"{json_path.stem}-{digest}.matrices"
+
+def _is_pair_table(value, ids) -> bool:
+    """Whether value is a nested dict of floats over (a subset of) the item ids"""
+    if not isinstance(value, dict) or not value:
+        return False
+    row = next(iter(value.values()))
+    return (all(key in ids for key in value) and isinstance(row, dict) and
+            all(key in ids and isinstance(v, (int, float)) for key, v in row.items()))
+
+def _collect(results: Dict) -> Tuple[List[str], Dict[str, str], Dict[str, Dict], Dict[str, Dict]]:
+    """Item ids, categories, pair tables and remaining per-analysis fields of a results dict"""
+    ids: Dict[str, None] = {}
+    categories: Dict[str, str] = {}
+    tables: Dict[str, Dict] = {}
+    analyses: Dict[str, Dict] = {}
+
+    def walk(section, path):
+        if 'distance_matrix' in section:
+            ids.update(dict.fromkeys(section.get('languages') or section['distance_matrix']))
+            categories.update(section.get('categories', {}))
+            fields = {}
+            for key, value in section.items():
+                if key == 'distance_matrix':
+                    tables[path] = value
+                elif key in ('languages', 'categories'):
+                    continue
+                elif _is_pair_table(value, ids):
+                    tables[f"{path}.{key}"] = value
+                else:
+                    fields[key] = value
+            analyses[path] = fields
+            return
+        for key, value in section.items():
+            if isinstance(value, dict):
+                walk(value, f"{path}.{key}" if path else key)
+
+    walk({key: value for key, value in results.items() if key != 'metadata'}, "")
+    return list(ids), categories, tables, analyses
+
+def save_results(results: Dict, json_path: Union[str, Path], indent: Optional[int] = 2) -> Path:
+    """Write the results as the frontend's JSON file and as its matrix artifact"""
+    json_path = Path(json_path)
+    with open(json_path, 'w') as f:
+        json.dump(results, f, indent=indent)
+    return write_artifact(results, artifact_path(json_path))
+
+def build_matrices(results: Dict) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """Index and N×N arrays of a results dict"""
+    ids, categories, tables, analyses = _collect(results)
+    position = {item_id: i for i, item_id in enumerate(ids)}
+
+    matrices = {}
+    for name, table in tables.items():
+        matrix = np.full((len(ids), len(ids)), np.nan)
+        for item1, row in table.items():
+            columns = [position[item2] for item2 in row]
+            matrix[position[item1], columns] = list(row.values())
+        matrices[name] = matrix
+
+    index = {
+        'ids': ids,
+        'categories': categories,
+        'metadata': results.get('metadata', {}),
+        'matrices': list(tables),
+        'analyses': analyses,
+    }
+    return index, matrices
+
+def write_artifact(results: Dict, directory: Union[str, Path]) -> Path:
+    """Write the matrices of a results dict as float64 arrays plus an index"""
+    directory = Path(directory)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f"{directory.name}.", dir=directory.parent))
+    index, matrices = build_matrices(results)
+    for name, matrix in matrices.items():
+        np.save(staging / f"{name}.npy", matrix)
+    with open(staging / INDEX_FILE, 'w') as f:
+        json.dump(index, f)
+
+    # Swapped in whole, so readers never map a partly written artifact
+    shutil.rmtree(directory, ignore_errors=True)
+    try:
+        os.rename(staging, directory)
+    except OSError:
+        # Another process put its artifact in place first
+        shutil.rmtree(staging, ignore_errors=True)
+    return directory
+
+class MatrixView(Mapping):
+    """Read-only nested-dict view of one matrix: view[item1][item2] reads one value"""
+
+    def __init__(self, artifact: 'MatrixArtifact', name: str, item_id: Optional[str] = None):
+        self.artifact = artifact
+        self.name = name
+        self.item_id = item_id
+
+    def __getitem__(self, item_id: str):
+        if self.item_id is None:
+            if item_id not in self.artifact.position:
+                raise KeyError(item_id)
+            return MatrixView(self.artifact, self.name, item_id)
+        return self.artifact.value(self.name, self.item_id, item_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.artifact.ids)
+
+    def __len__(self) -> int:
+        return len(self.artifact.ids)
+
+class MatrixArtifact:
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        with open(self.directory / INDEX_FILE) as f:
+            self._load_index(json.load(f))
+
+    @classmethod
+    def from_results(cls, results: Dict) -> 'MatrixArtifact':
+        """Artifact held in memory, built from a results dict without writing anything"""
+        index, matrices = build_matrices(results)
+        artifact = cls.__new__(cls)
+        artifact.directory = None
+        artifact._load_index(index)
+        artifact._matrices = matrices
+        return artifact
+
+    def _load_index(self, index: Dict):
+        self.ids: List[str] = index['ids']
+        self.categories: Dict[str, str] = index['categories']
+        self.metadata: Dict = index['metadata']
+        self.names: List[str] = index['matrices']
+        self.analyses: Dict[str, Dict] = index['analyses']
+        self.position = {item_id: i for i, item_id in enumerate(self.ids)}
+        self._matrices: Dict[str, np.ndarray] = {}
+
+    def matrix(self, name: str) -> np.ndarray:
+        """The whole N×N matrix, memory-mapped (rows and columns in self.ids order)"""
+        if name not in self._matrices:
+            if name not in self.names:
+                raise KeyError(f"No matrix {name!r} in {self.directory or 'the results'} "
+                               f"(available: {', '.join(self.names)})")
+            self._matrices[name] = np.load(self.directory / f"{name}.npy", mmap_mode='r')
+        return self._matrices[name]
+
+    def view(self, name: str) -> MatrixView:
+        return MatrixView(self, name)
+
+    def items(self, category: Optional[str] = None) -> List[str]:
+        """Item ids, optionally only those of one category"""
+        if category is None:
+            return list(self.ids)
+        return [item_id for item_id in self.ids if self.categories.get(item_id) == category]
+
+    def value(self, name: str, item1: str, item2: str) -> float:
+        return float(self.matrix(name)[self.position[item1], self.position[item2]])
+
+    def row(self, name: str, item_id: str) -> Dict[str, float]:
+        """Values of one item against every item"""
+        return dict(zip(self.ids, self.matrix(name)[self.position[item_id]].tolist()))
+
+    def submatrix(self, name: str, rows: Sequence[str], columns: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Values of rows × columns (default: the rows themselves), in the given orders"""
+        row_index = [self.position[item_id] for item_id in rows]
+        column_index = row_index if columns is None else [self.position[item_id] for item_id in columns]
+        return np.asarray(self.matrix(name)[np.ix_(row_index, column_index)])
+
+    def block(self, name: str, category1: str, category2: Optional[str] = None) -> Tuple[List[str], List[str], np.ndarray]:
+        """Items of category1, items of category2 (default: category1) and the values between them"""
+        rows = self.items(category1)
+        columns = rows if category2 is None else self.items(category2)
+        return rows, columns, self.submatrix(name, rows, columns)
+
+    def to_nested(self, name: str) -> Dict[str, Dict[str, float]]:
+        """The matrix as the JSON files' nested dicts"""
+        values = self.matrix(name).tolist()
+        return {item1: dict(zip(self.ids, row)) for item1, row in zip(self.ids, values)}
+
+def open_results(json_path: Union[str, Path]) -> MatrixArtifact:
+    """
+    Matrices of an analysis JSON file from its artifact, built first if it is missing
+    or older than the JSON file. Without a writable artifact directory, the JSON file
+    is loaded into memory instead.
+    """
+    json_path = Path(json_path)
+    directory = artifact_path(json_path)
+    index = directory / INDEX_FILE
+    if index.exists() and (not json_path.exists() or index.stat().st_mtime >= json_path.stat().st_mtime):
+        return MatrixArtifact(directory)
+    with open(json_path) as f:
+        results = json.load(f)
+    try:
+        write_artifact(results, directory)
+    except OSError:
+        return MatrixArtifact.from_results(results)
+    return MatrixArtifact(directory)
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Build matrix artifacts from analysis JSON files")
+    parser.add_argument("json_files", nargs="+")
+    args = parser.parse_args()
+
+    for json_path in args.json_files:
+        with open(json_path) as f:
+            directory = write_artifact(json.load(f), artifact_path(json_path))
+        artifact = MatrixArtifact(directory)
+        print(f"{directory}: {len(artifact.ids)} items, matrices: {', '.join(artifact.names)}")
+
+if __name__ == "__main__":
+    main()
@@ -7,17 +7,20 @@ Count how many patterns from language A appear in language B.
 import os
 import json
 import numpy as np
-from collections import defaultdict, Counter
+from collections import defaultdict
 import math
 import argparse
 from pathlib import Path
-import re
+
+from pattern_mining import PatternMatcher, top_patterns
 
 class PatternCompressionAnalyzer:
     def __init__(self, data_dir="data/programming_languages"):
         self.data_dir = Path(data_dir)
         self.languages = []
         self.language_data = {}
+        self.top_patterns = {}
+        self.pattern_matchers = {}
         self.load_languages()
     
     def load_languages(self):
@@ -54,65 +57,42 @@ class PatternCompressionAnalyzer:
                 if lang in self.languages:
                     self.languages.remove(lang)
     
-    def extract_patterns(self, text, min_length=3, max_length=8):
-        """Extract common patterns from text"""
-        patterns = Counter()
-        
-        # Extract word patterns (alphanumeric sequences)
-        words = re.findall(r'[a-zA-Z_][a-zA-Z0-9_]*', text)
-        for word in words:
-            if min_length <= len(word) <= max_length:
-                patterns[word] += 1
-        
-        # Extract punctuation patterns
-        punct_patterns = re.findall(r'[{}();,.\[\]]+', text)
-        for pattern in punct_patterns:
-            if min_length <= len(pattern) <= max_length:
-                patterns[pattern] += 1
-        
-        # Extract short character sequences
-        for i in range(len(text) - min_length + 1):
-            for length in range(min_length, min(max_length + 1, len(text) - i + 1)):
-                substr = text[i:i+length]
-                # Only include if it has some structure (not all spaces/newlines)
-                if len(substr.strip()) >= min_length - 1:
-                    patterns[substr] += 1
+    def extract_patterns(self, text, min_length=3, max_length=8, top_n=100):
+        """Extract the top_n most common patterns from text, with their counts"""
+        return top_patterns(text, top_n, min_length, max_length)
+    
+    def get_top_patterns(self, language):
+        """Top patterns of a language (mined once, reused for every target)"""
+        if language not in self.top_patterns:
+            source_patterns = self.extract_patterns(self.language_data[language])
+            
+            # Get top patterns by frequency
+            self.top_patterns[language] = [pattern for pattern, count in source_patterns
+                                           if count >= 2 and len(pattern) >= 3]
         
-        return patterns
+        return self.top_patterns[language]
+    
+    def get_pattern_matcher(self, language):
+        """Matcher for the top patterns of a language, built once and reused for every target"""
+        if language not in self.pattern_matchers:
+            self.pattern_matchers[language] = PatternMatcher(self.get_top_patterns(language))
+        return self.pattern_matchers[language]
     
     def calculate_pattern_compression_ratio(self, source_lang, target_lang):
         """
         Calculate how well patterns from source_lang compress target_lang.
         Higher ratio = better compression = more similar languages.
         """
-        source_text = self.language_data[source_lang]
         target_text = self.language_data[target_lang]
         
-        # Extract common patterns from source language
-        source_patterns = self.extract_patterns(source_text)
-        
-        # Get top patterns by frequency
-        top_patterns = [pattern for pattern, count in source_patterns.most_common(100) 
-                       if count >= 2 and len(pattern) >= 3]
-        
-        # Count how many characters in target can be "compressed" using source patterns
-        target_compressed_chars = 0
-        target_remaining = target_text
-        
-        # Sort patterns by length (longest first for better compression)
-        top_patterns.sort(key=len, reverse=True)
+        # Common patterns from source language
+        top_patterns = self.get_top_patterns(source_lang)
         
-        for pattern in top_patterns:
-            # Count occurrences of this pattern in target
-            occurrences = target_remaining.count(pattern)
-            if occurrences > 0:
-                # "Compress" by replacing pattern with shorter representation
-                # Assume we can represent each pattern with 1 byte reference
-                chars_saved = occurrences * (len(pattern) - 1)
-                target_compressed_chars += chars_saved
-                
-                # Remove these patterns to avoid double-counting
-                target_remaining = target_remaining.replace(pattern, "X")
+        # Count how many characters in target can be "compressed" using source patterns:
+        # non-overlapping matches, taking the longest pattern at the leftmost position,
+        # each replaced by a 1 byte reference
+        matches = self.get_pattern_matcher(source_lang).scan(target_text)
+        target_compressed_chars = sum(length - 1 for start, length in matches)
         
         # Calculate compression ratio
         original_size = len(target_text)
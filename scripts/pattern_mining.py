@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Frequent pattern mining and matching for the pattern compression experiment.
+
+A language's patterns are its identifier-like words and punctuation runs of
+min_length..max_length characters, plus every substring of those lengths
+whose stripped length is at least min_length - 1 (words and punctuation runs
+count in both). Rather than counting substring copies in a Counter, the text is mapped
+to a dense alphabet, every window of each length is packed into one integer and
+np.unique counts all windows of a length at once.
+
+Ties are ranked like Counter.most_common on the counter the patterns used to be
+collected in: words first, then punctuation runs, then substrings by first
+position and length.
+
+PatternMatcher finds a language's patterns in other texts with one
+Aho-Corasick scan instead of a count() and replace() per pattern.
+"""
+
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+WORD_PATTERN = re.compile(r'[a-zA-Z_][a-zA-Z0-9_]*')
+PUNCT_PATTERN = re.compile(r'[{}();,.\[\]]+')
+
+def window_keys(codes: np.ndarray, length: int, bits: Optional[int]) -> np.ndarray:
+    """
+    One comparable key per window of length codes: the codes packed into a
+    uint64 when bits per code allow it, the raw window bytes otherwise
+    """
+    count = len(codes) - length + 1
+    if bits is None:
+        windows = np.ascontiguousarray(sliding_window_view(codes.astype(np.uint32), length))
+        return windows.view(np.dtype((np.void, 4 * length))).ravel()
+
+    keys = np.zeros(count, dtype=np.uint64)
+    shift = np.uint64(bits)
+    for k in range(length):
+        keys = (keys << shift) | codes[k:k + count]
+    return keys
+
+def top_patterns(text: str, n: int = 100, min_length: int = 3,
+                 max_length: int = 8) -> List[Tuple[str, int]]:
+    """The n most frequent patterns of text with their counts, most frequent first"""
+    words = Counter(w for w in WORD_PATTERN.findall(text) if min_length <= len(w) <= max_length)
+    puncts = Counter(p for p in PUNCT_PATTERN.findall(text) if min_length <= len(p) <= max_length)
+    if len(text) < min_length:
+        return []
+
+    chars = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    alphabet, codes = np.unique(chars, return_inverse=True)
+    codes = codes.astype(np.uint64)
+    bits = max(1, (len(alphabet) - 1).bit_length())
+    if bits * max_length > 64:
+        bits = None
+
+    # Only windows with len(window.strip()) >= min_length - 1 count as substrings: the stripped
+    # window runs from the first non-whitespace character at or after its start to the last
+    # one before its end
+    nonspace = np.array([not chr(c).isspace() for c in alphabet.tolist()])[codes.astype(np.intp)]
+    positions = np.arange(len(codes))
+    first_nonspace = np.minimum.accumulate(np.where(nonspace, positions, len(codes))[::-1])[::-1]
+    last_nonspace = np.maximum.accumulate(np.where(nonspace, positions, -1))
+
+    # Rank of a pattern's first insertion: words, then punctuation runs, then substrings
+    substring_rank = len(words) + len(puncts)
+    extra_counts = {}
+    extra_ranks = {}
+    for rank, (pattern, count) in enumerate([*words.items(), *puncts.items()]):
+        extra_counts[pattern] = count
+        extra_ranks[pattern] = rank
+
+    lengths, firsts, counts, ranks = [], [], [], []
+    for length in range(min_length, max_length + 1):
+        if length > len(codes):
+            break
+        starts = np.arange(len(codes) - length + 1)
+        stripped = np.maximum(last_nonspace[starts + length - 1] - first_nonspace[starts] + 1, 0)
+        keep = stripped >= min_length - 1
+        keys, first, count = np.unique(window_keys(codes, length, bits)[keep], return_index=True,
+                                       return_counts=True)
+        first = starts[keep][first]
+        rank = substring_rank + first * (max_length + 1) + length
+
+        # Words and punctuation runs are always counted substrings as well
+        patterns = [p for p in extra_counts if len(p) == length]
+        if patterns:
+            pattern_codes = np.searchsorted(alphabet, [[ord(c) for c in p] for p in patterns]).astype(np.uint64)
+            pattern_keys = np.concatenate([window_keys(row, length, bits) for row in pattern_codes])
+            index = np.searchsorted(keys, pattern_keys)
+            count[index] += [extra_counts[p] for p in patterns]
+            rank[index] = [extra_ranks[p] for p in patterns]
+
+        lengths.append(np.full(len(keys), length))
+        firsts.append(first)
+        counts.append(count)
+        ranks.append(rank)
+
+    lengths, firsts, counts, ranks = map(np.concatenate, (lengths, firsts, counts, ranks))
+    order = np.lexsort((ranks, -counts))[:n]
+    return [(text[firsts[i]:firsts[i] + lengths[i]], int(counts[i])) for i in order]
+
+class PatternMatcher:
+    """
+    Aho-Corasick automaton over a fixed set of patterns. scan() finds the
+    non-overlapping leftmost-longest matches in a text in a single pass.
+    """
+    def __init__(self, patterns):
+        self.patterns = list(dict.fromkeys(p for p in patterns if p))
+
+        # Trie of the patterns; outputs are the lengths of the patterns ending in a state
+        children = [{}]
+        outputs = [()]
+        for pattern in self.patterns:
+            state = 0
+            for char in pattern:
+                if char not in children[state]:
+                    children[state][char] = len(children)
+                    children.append({})
+                    outputs.append(())
+                state = children[state][char]
+            outputs[state] = (len(pattern),)
+
+        # Complete transitions in breadth-first order, so a state's failure state is done before it
+        self.transitions = [None] * len(children)
+        self.transitions[0] = dict(children[0])
+        queue = [(child, 0) for child in children[0].values()]
+        for state, fail in queue:
+            outputs[state] += outputs[fail]
+            self.transitions[state] = {**self.transitions[fail], **children[state]}
+            queue.extend((child, self.transitions[fail].get(char, 0))
+                         for char, child in children[state].items())
+        self.outputs = outputs
+
+    def scan(self, text: str) -> List[Tuple[int, int]]:
+        """(start, length) of the matches, taking the longest match at the leftmost position first"""
+        transitions = self.transitions
+        outputs = self.outputs
+
+        longest = {}
+        state = 0
+        for end, char in enumerate(text, 1):
+            state = transitions[state].get(char, 0)
+            for length in outputs[state]:
+                if longest.get(end - length, 0) < length:
+                    longest[end - length] = length
+
+        matches = []
+        position = 0
+        for start in sorted(longest):
+            if start >= position:
+                matches.append((start, longest[start]))
+                position = start + longest[start]
+        return matches
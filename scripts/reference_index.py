@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Persistent index of precomputed reference-text artifacts for the divergence API.
+
+Reference texts are registered once. Their character frequencies, dictionaries,
+test halves and baseline compressed sizes are stored on disk keyed by content
+hash, so divergence requests can refer to references by id instead of
+recomputing the reference side on every call.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+
+# Bump when the artifacts produced by DivergenceCalculator.prepare_text change
+ARTIFACT_VERSION = 1
+
+class ReferenceIndex:
+    def __init__(self, index_dir="reference_index", calculator=None):
+        self.index_dir = Path(index_dir)
+        self.entries_dir = self.index_dir / "entries"
+        self.ids_path = self.index_dir / "ids.json"
+        self.calculator = calculator
+
+        self.ids = {}  # text id -> content hash
+        self.loaded = {}  # content hash -> artifacts already read from disk
+
+        if self.ids_path.exists():
+            with open(self.ids_path, 'r', encoding='utf-8') as f:
+                self.ids = json.load(f)
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        """Hash of the reference content, used as the on-disk key"""
+        return hashlib.sha256(content.encode('utf-8', errors='replace')).hexdigest()
+
+    def __contains__(self, text_id: str) -> bool:
+        return text_id in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def register(self, text_id: str, content: str) -> str:
+        """Register a reference text, computing its artifacts only if they are not stored yet"""
+        digest = self.content_hash(content)
+        entry_dir = self.entries_dir / digest
+
+        if not self._entry_is_current(entry_dir):
+            artifacts = self.calculator.prepare_text(content)
+            self._write_entry(entry_dir, artifacts)
+            self.loaded[digest] = artifacts
+
+        if self.ids.get(text_id) != digest:
+            self.ids[text_id] = digest
+            self._save_ids()
+
+        return digest
+
+    def register_many(self, texts: Dict[str, str]) -> Dict[str, str]:
+        """Register several reference texts, returning their content hashes"""
+        return {text_id: self.register(text_id, content) for text_id, content in texts.items()}
+
+    def get(self, text_id: str) -> Dict:
+        """Load the precomputed artifacts for a registered reference id"""
+        if text_id not in self.ids:
+            raise KeyError(f"Unknown reference id: {text_id}")
+
+        digest = self.ids[text_id]
+        if digest not in self.loaded:
+            self.loaded[digest] = self._read_entry(self.entries_dir / digest)
+        return self.loaded[digest]
+
+    def get_many(self, text_ids: List[str]) -> Dict[str, Dict]:
+        """Load artifacts for several reference ids, preserving order"""
+        return {text_id: self.get(text_id) for text_id in text_ids}
+
+    def _entry_is_current(self, entry_dir: Path) -> bool:
+        meta_path = entry_dir / "meta.json"
+        if not meta_path.exists():
+            return False
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('version') == ARTIFACT_VERSION
+
+    def _write_entry(self, entry_dir: Path, artifacts: Dict):
+        entry_dir.mkdir(parents=True, exist_ok=True)
+
+        # Bytes, not write_text/read_text: newline translation would turn \r\n into \n on reload
+        (entry_dir / "content.txt").write_bytes(artifacts['content'].encode('utf-8', 'replace'))
+        (entry_dir / "dictionary.bin").write_bytes(artifacts['dictionary'])
+        (entry_dir / "test.bin").write_bytes(artifacts['test_bytes'])
+
+        # meta.json is written last so a partially written entry is never considered current
+        meta = {
+            'version': ARTIFACT_VERSION,
+            'length': artifacts['length'],
+            'frequencies': artifacts['frequencies'],
+            'self_compressed_size': artifacts['self_compressed_size'],
+        }
+        # Only calculators with an NCD metric produce it (divergence_api.py computes it when missing)
+        if 'compressed_size' in artifacts:
+            meta['compressed_size'] = artifacts['compressed_size']
+        self._write_json(entry_dir / "meta.json", meta)
+
+    def _read_entry(self, entry_dir: Path) -> Dict:
+        with open(entry_dir / "meta.json", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        artifacts = {
+            'length': meta['length'],
+            'content': (entry_dir / "content.txt").read_bytes().decode('utf-8'),
+            'frequencies': meta['frequencies'],
+            'dictionary': (entry_dir / "dictionary.bin").read_bytes(),
+            'test_bytes': (entry_dir / "test.bin").read_bytes(),
+            'self_compressed_size': meta['self_compressed_size'],
+        }
+        if 'compressed_size' in meta:
+            artifacts['compressed_size'] = meta['compressed_size']
+        return artifacts
+
+    def _save_ids(self):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._write_json(self.ids_path, self.ids)
+
+    def _write_json(self, path: Path, data):
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Cheap pre-filters for nearest-reference search.
+
+Deflate-based metrics need several compressions per reference, so top-k queries
+first rank all references with a cheap score and only compress the best few:
+- char_kl_divergences: symmetrized character KL against every reference in one
+  vectorized pass (same values as DivergenceCalculator.compute_kl_divergence)
+- shingle_sketch / sketch_similarity: MinHash estimate of the Jaccard similarity
+  of the byte 5-gram sets
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+SHINGLE_BYTES = 5
+SKETCH_SIZE = 64
+
+# Fixed odd multipliers and offsets for the MinHash permutations
+_rng = np.random.default_rng(20240611)
+_SKETCH_MULTIPLIERS = _rng.integers(1, 2**63, SKETCH_SIZE, dtype=np.uint64) | np.uint64(1)
+_SKETCH_OFFSETS = _rng.integers(0, 2**63, SKETCH_SIZE, dtype=np.uint64)
+
+def char_kl_divergences(query_freqs: Dict[str, float], ref_freqs: Sequence[Dict[str, float]],
+                        min_freq: float) -> np.ndarray:
+    """
+    Symmetrized KL divergence between query_freqs and each of ref_freqs.
+    Like the pairwise version, only characters present in one of the two
+    distributions count, floored at min_freq and renormalized per pair.
+    """
+    if not ref_freqs:
+        return np.zeros(0)
+
+    alphabet = {char: i for i, char in enumerate(set(query_freqs).union(*ref_freqs))}
+
+    p = np.zeros(len(alphabet))
+    for char, freq in query_freqs.items():
+        p[alphabet[char]] = freq
+    q = np.zeros((len(ref_freqs), len(alphabet)))
+    for row, freqs in enumerate(ref_freqs):
+        for char, freq in freqs.items():
+            q[row, alphabet[char]] = freq
+
+    present = (p > 0) | (q > 0)
+    p = np.where(present, np.maximum(p, min_freq), 0.0)
+    q = np.where(present, np.maximum(q, min_freq), 0.0)
+    p /= p.sum(axis=1, keepdims=True)
+    q /= q.sum(axis=1, keepdims=True)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_ratio = np.where(present, np.log2(p / q), 0.0)
+    kl_pq = np.sum(p * log_ratio, axis=1)
+    kl_qp = np.sum(q * -log_ratio, axis=1)
+    return (kl_pq + kl_qp) / 2
+
+def shingle_sketch(content: str) -> np.ndarray:
+    """MinHash sketch (SKETCH_SIZE values) of the set of byte shingles of content"""
+    data = np.frombuffer(content.encode('utf-8', errors='replace'), dtype=np.uint8).astype(np.uint64)
+    if len(data) < SHINGLE_BYTES:
+        data = np.concatenate([data, np.zeros(SHINGLE_BYTES - len(data), dtype=np.uint64)])
+
+    # Pack each shingle into one integer, then hash the distinct ones with every permutation
+    count = len(data) - SHINGLE_BYTES + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for k in range(SHINGLE_BYTES):
+        shingles = (shingles << np.uint64(8)) | data[k:k + count]
+    shingles = np.unique(shingles)
+
+    sketch = np.empty(SKETCH_SIZE, dtype=np.uint64)
+    for i in range(SKETCH_SIZE):
+        sketch[i] = (shingles * _SKETCH_MULTIPLIERS[i] + _SKETCH_OFFSETS[i]).min()
+    return sketch
+
+def sketch_similarity(sketch_a: np.ndarray, sketch_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two sketches"""
+    return float(np.mean(sketch_a == sketch_b))
+
+def rank_references(query: Dict, references: Dict[str, Dict], prefilter: str,
+                    min_freq: float) -> List[Tuple[str, float]]:
+    """
+    Order references by a cheap pre-filter score, closest first.
+    Returns (reference id, score) pairs: the character KL divergence for
+    prefilter 'kl', the estimated shingle similarity for 'sketch'.
+    """
+    ids = list(references)
+    if prefilter == 'kl':
+        scores = char_kl_divergences(query['frequencies'], [references[i]['frequencies'] for i in ids], min_freq)
+        order = np.argsort(scores, kind='stable')
+    elif prefilter == 'sketch':
+        query_sketch = get_sketch(query)
+        scores = np.array([sketch_similarity(query_sketch, get_sketch(references[i])) for i in ids])
+        order = np.argsort(-scores, kind='stable')
+    else:
+        raise ValueError(f"Unknown prefilter: {prefilter}")
+
+    return [(ids[i], float(scores[i])) for i in order]
+
+def get_sketch(artifacts: Dict) -> np.ndarray:
+    """Shingle sketch of prepared artifacts, computed on first use and kept with them"""
+    if 'sketch' not in artifacts:
+        artifacts['sketch'] = shingle_sketch(artifacts['content'])
+    return artifacts['sketch']
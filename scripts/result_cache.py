@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Two-tier cache for divergence results.
+
+Results are keyed by (hash of the text exactly as scored, hash of the reference
+set, algorithm version). The first tier is an in-memory LRU; the optional second tier
+is a SQLite file with size-based eviction of the least recently used rows, so
+results survive restarts and are shared between worker processes.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8', errors='replace')).hexdigest()
+
+def hash_reference_set(references: Iterable[Tuple[str, str]]) -> str:
+    """Hash an ordered reference set given as (reference id, content hash) pairs"""
+    return hash_text('\n'.join(f"{text_id}\t{digest}" for text_id, digest in references))
+
+class ResultCache:
+    def __init__(self, max_entries: int = 256, db_path: Optional[str] = None,
+                 max_db_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            max_entries: Number of results kept in the in-memory LRU
+            db_path: SQLite file for the persistent tier (None keeps results in memory only)
+            max_db_bytes: Total size of stored results above which the oldest rows are evicted
+        """
+        self.max_entries = max_entries
+        self.max_db_bytes = max_db_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self.db.commit()
+
+    @staticmethod
+    def make_key(text: str, reference_set_hash: str, algorithm_version: str) -> str:
+        return hash_text(f"{algorithm_version}\0{hash_text(text)}\0{reference_set_hash}")
+
+    def lookup(self, key: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """Return (cached result, tier it came from), or (None, None) on a miss"""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return self.memory[key], 'memory'
+
+            if self.db is not None:
+                row = self.db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.db.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+                    self.db.commit()
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.stats['disk_hits'] += 1
+                    return value, 'disk'
+
+            self.stats['misses'] += 1
+            return None, None
+
+    def put(self, key: str, value: Dict):
+        with self.lock:
+            self._remember(key, value)
+
+            if self.db is not None:
+                serialized = json.dumps(value)
+                self.db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                    (key, serialized, len(serialized), time.time())
+                )
+                self._evict_db()
+                self.db.commit()
+
+    def metadata(self, tier: Optional[str]) -> Dict:
+        """Cache information attached to responses"""
+        with self.lock:
+            return {'hit': tier is not None, 'tier': tier, **self.stats}
+
+    def _remember(self, key: str, value: Dict):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _evict_db(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_db_bytes:
+            return
+
+        # Drop least recently used rows until the stored results fit again
+        excess = total - self.max_db_bytes
+        for key, size in self.db.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+            if excess <= 0:
+                break
+            self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+            excess -= size
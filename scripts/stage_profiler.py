@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Per-stage latency accounting for divergence requests.
+
+Code marks its stages with `with stage("deflate", nbytes):`. When a request runs
+inside profile_request(), wall time, CPU time (of the calling thread), call counts
+and byte counts are accumulated per stage; otherwise stage() does nothing.
+Stages may nest, and every stage reports its own (exclusive) time, so stage
+timings can be summed without counting nested work twice. LatencyHistogram aggregates the
+timings of recent requests for percentile and bucket summaries.
+"""
+
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is unbounded
+BUCKET_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+_active_profiler = ContextVar('stage_profiler', default=None)
+
+class StageProfiler:
+    def __init__(self):
+        self.stages = {}  # stage name -> calls, wall, cpu, bytes
+        self.stack = []  # open stages: [name, child wall, child cpu]
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.thread_time()
+
+    @contextmanager
+    def stage(self, name: str, nbytes: int = 0):
+        start_wall = time.perf_counter()
+        start_cpu = time.thread_time()
+        frame = [name, 0.0, 0.0]
+        self.stack.append(frame)
+        try:
+            yield
+        finally:
+            self.stack.pop()
+            wall = time.perf_counter() - start_wall
+            cpu = time.thread_time() - start_cpu
+            self.add(name, wall - frame[1], cpu - frame[2], nbytes)
+            # The enclosing stage reports only its own time
+            if self.stack:
+                self.stack[-1][1] += wall
+                self.stack[-1][2] += cpu
+
+    def add(self, name: str, wall: float = 0.0, cpu: float = 0.0, nbytes: int = 0, calls: int = 1,
+            other_thread: bool = False):
+        """
+        Record time measured elsewhere. With other_thread, the work ran on another thread
+        while this one waited, so its wall time is taken out of the enclosing stage.
+        """
+        entry = self.stages.setdefault(name, {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'bytes': 0})
+        entry['calls'] += calls
+        entry['wall'] += wall
+        entry['cpu'] += cpu
+        entry['bytes'] += nbytes
+        if other_thread and self.stack:
+            self.stack[-1][1] += wall
+
+    def as_dict(self) -> Dict:
+        """Stage timings in milliseconds, plus the total time since the profiler was created"""
+        return {
+            'total_wall_ms': round((time.perf_counter() - self.start_wall) * 1000, 3),
+            'total_cpu_ms': round((time.thread_time() - self.start_cpu) * 1000, 3),
+            'stages': {
+                name: {
+                    'calls': entry['calls'],
+                    'wall_ms': round(entry['wall'] * 1000, 3),
+                    'cpu_ms': round(entry['cpu'] * 1000, 3),
+                    'bytes': entry['bytes'],
+                }
+                for name, entry in self.stages.items()
+            }
+        }
+
+@contextmanager
+def profile_request() -> Iterator[StageProfiler]:
+    """Collect stage timings for everything run in this context"""
+    profiler = StageProfiler()
+    token = _active_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _active_profiler.reset(token)
+
+def current_profiler() -> Optional[StageProfiler]:
+    return _active_profiler.get()
+
+@contextmanager
+def stage(name: str, nbytes: int = 0):
+    """Time a stage of the current request (no-op outside profile_request)"""
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield
+        return
+    with profiler.stage(name, nbytes):
+        yield
+
+class LatencyHistogram:
+    """Wall-time distribution per stage over the most recent requests"""
+
+    def __init__(self, max_requests: int = 1000):
+        self.requests = deque(maxlen=max_requests)
+        self.lock = threading.Lock()
+
+    def record(self, timings: Dict):
+        """Add the as_dict() output of a request's profiler"""
+        sample = {name: entry['wall_ms'] for name, entry in timings['stages'].items()}
+        sample['total'] = timings['total_wall_ms']
+        with self.lock:
+            self.requests.append(sample)
+
+    def summary(self) -> Dict:
+        with self.lock:
+            requests = list(self.requests)
+
+        values_by_stage = {}
+        for sample in requests:
+            for name, value in sample.items():
+                values_by_stage.setdefault(name, []).append(value)
+
+        return {
+            'requests': len(requests),
+            'bucket_bounds_ms': BUCKET_BOUNDS_MS,
+            'stages': {name: self._summarize(values) for name, values in values_by_stage.items()}
+        }
+
+    @staticmethod
+    def _summarize(values: List[float]) -> Dict:
+        values = sorted(values)
+
+        def percentile(p):
+            return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+        buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        for value in values:
+            buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, value)] += 1
+
+        return {
+            'count': len(values),
+            'mean_ms': round(sum(values) / len(values), 3),
+            'p50_ms': percentile(50),
+            'p90_ms': percentile(90),
+            'p99_ms': percentile(99),
+            'max_ms': values[-1],
+            'buckets': buckets,
+        }
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Pooled asynchronous URL fetching with an on-disk cache of extracted text.
+
+All requests share one aiohttp connection pool with a per-host connection limit,
+so batch jobs reuse TCP/TLS connections instead of opening one per URL. Extracted
+text is cached on disk, content-addressed by its hash; cached URLs are revalidated
+with conditional GETs (ETag / Last-Modified), and a 304 reuses the cached text
+without downloading or stripping the page again. Pages are decoded and stripped
+chunk by chunk as they download (see html_text), so callers can consume text
+before the response is complete and stop early at a character budget.
+"""
+
+import asyncio
+import atexit
+import codecs
+import concurrent.futures
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import aiohttp
+
+from html_text import StreamingTextExtractor
+
+class TextCache:
+    """
+    On-disk cache of extracted page text.
+    urls/<url hash>.json holds the validators for a URL and points at
+    texts/<text hash>.txt, so identical pages are stored once.
+    """
+
+    def __init__(self, cache_dir="url_cache"):
+        self.cache_dir = Path(cache_dir)
+        self.urls_dir = self.cache_dir / "urls"
+        self.texts_dir = self.cache_dir / "texts"
+        self.urls_dir.mkdir(parents=True, exist_ok=True)
+        self.texts_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _hash(data: str) -> str:
+        return hashlib.sha256(data.encode('utf-8', errors='replace')).hexdigest()
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Cached entry for url (validators, fetch time and text), or None"""
+        entry_path = self.urls_dir / f"{self._hash(url)}.json"
+        if not entry_path.exists():
+            return None
+
+        with open(entry_path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+
+        text_path = self.texts_dir / f"{entry['text_hash']}.txt"
+        if not text_path.exists():
+            return None
+        entry['text'] = text_path.read_bytes().decode('utf-8')
+        return entry
+
+    def store(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Store extracted text for url together with its HTTP validators"""
+        text_hash = self._hash(text)
+        text_path = self.texts_dir / f"{text_hash}.txt"
+        if not text_path.exists():
+            self._write_atomic(text_path, text.encode('utf-8', errors='replace'))
+
+        entry = {
+            'url': url,
+            'text_hash': text_hash,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': time.time(),
+        }
+        self._write_atomic(self.urls_dir / f"{self._hash(url)}.json", json.dumps(entry).encode('utf-8'))
+
+    def touch(self, entry: Dict):
+        """Mark a cached entry as freshly revalidated"""
+        self.store(entry['url'], entry['text'], entry.get('etag'), entry.get('last_modified'))
+
+    def _write_atomic(self, path: Path, data: bytes):
+        # Bytes, not text mode: newline translation would change \r\n and \r in cached texts
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+class AsyncURLFetcher:
+    def __init__(self, cache_dir="url_cache", max_connections=64, per_host_limit=4,
+                 timeout=30, max_age=3600, headers=None):
+        """
+        Args:
+            cache_dir: Directory of the extracted-text cache (None disables caching)
+            max_connections: Size of the shared connection pool
+            per_host_limit: Maximum concurrent connections to a single host
+            timeout: Total timeout per request in seconds
+            max_age: Cached text younger than this (seconds) is used without revalidation
+            headers: Extra headers sent with every request
+        """
+        self.cache = TextCache(cache_dir) if cache_dir else None
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.max_age = max_age
+        self.headers = headers or {}
+
+        self.session = None
+        self.stats = {'cache_hits': 0, 'revalidated': 0, 'downloaded': 0}
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        """Create the pooled session; must be called from the event loop that will use it"""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.per_host_limit,
+                ttl_dns_cache=300
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers=self.headers
+            )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def iter_text(self, url: str, max_chars: Optional[int] = None,
+                        chunk_size: int = 65536, timings: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        Yield the extracted text of url piece by piece while it downloads,
+        stopping after max_chars characters. Uses the cache where possible.
+        If a timings dict is given, the bytes downloaded and the wall/CPU seconds
+        spent decoding and stripping HTML are added to it.
+        """
+        if timings is None:
+            timings = {}
+        for key in ('downloaded_bytes', 'extract_wall', 'extract_cpu'):
+            timings.setdefault(key, 0)
+
+        entry = self.cache.lookup(url) if self.cache else None
+
+        if entry and time.time() - entry['fetched_at'] < self.max_age:
+            self.stats['cache_hits'] += 1
+            yield entry['text'][:max_chars]
+            return
+
+        # Revalidate stale entries with a conditional GET
+        request_headers = {}
+        if entry:
+            if entry.get('etag'):
+                request_headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                request_headers['If-Modified-Since'] = entry['last_modified']
+
+        pieces = []
+        extractor = StreamingTextExtractor(max_chars)
+
+        async with self.session.get(url, headers=request_headers) as response:
+            if response.status == 304 and entry:
+                self.stats['revalidated'] += 1
+                self.cache.touch(entry)
+                yield entry['text'][:max_chars]
+                return
+
+            response.raise_for_status()
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            decoder = self._incremental_decoder(response.charset)
+
+            async for chunk in response.content.iter_chunked(chunk_size):
+                timings['downloaded_bytes'] += len(chunk)
+                start_wall, start_cpu = time.perf_counter(), time.thread_time()
+                new_pieces = extractor.feed(decoder.decode(chunk))
+                timings['extract_wall'] += time.perf_counter() - start_wall
+                timings['extract_cpu'] += time.thread_time() - start_cpu
+                for piece in new_pieces:
+                    pieces.append(piece)
+                    yield piece
+                if extractor.done:
+                    break
+            else:
+                for piece in extractor.feed(decoder.decode(b'', final=True)) + extractor.close():
+                    pieces.append(piece)
+                    yield piece
+
+        self.stats['downloaded'] += 1
+
+        # Only complete documents are cached; a budget-truncated text would be wrong for other callers
+        if self.cache and not (max_chars is not None and extractor.emitted >= max_chars):
+            self.cache.store(url, ''.join(pieces), etag, last_modified)
+
+    async def fetch(self, url: str, max_chars: Optional[int] = None) -> str:
+        """Fetch url and return its extracted text, using the cache where possible"""
+        return ''.join([piece async for piece in self.iter_text(url, max_chars)])
+
+    @staticmethod
+    def _incremental_decoder(charset: Optional[str]):
+        try:
+            decoder_class = codecs.getincrementaldecoder(charset or 'utf-8')
+        except LookupError:
+            decoder_class = codecs.getincrementaldecoder('utf-8')
+        return decoder_class(errors='replace')
+
+    async def fetch_many(self, urls: List[str]) -> List:
+        """Fetch several URLs concurrently; failed fetches are returned as exceptions"""
+        return await asyncio.gather(*(self.fetch(url) for url in urls), return_exceptions=True)
+
+class BackgroundFetcher:
+    """
+    Runs an AsyncURLFetcher on a private event-loop thread, so synchronous callers
+    (Gradio handlers, scripts) share one connection pool across calls.
+    """
+
+    def __init__(self, **fetcher_kwargs):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+        self.fetcher = AsyncURLFetcher(**fetcher_kwargs)
+        self._run(self.fetcher.open())
+        atexit.register(self.close)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def fetch(self, url: str, max_chars: Optional[int] = None) -> str:
+        return self._run(self.fetcher.fetch(url, max_chars))
+
+    def submit(self, url: str, max_chars: Optional[int] = None) -> concurrent.futures.Future:
+        """Start fetching url without waiting; the future resolves to its extracted text"""
+        return asyncio.run_coroutine_threadsafe(self.fetcher.fetch(url, max_chars), self.loop)
+
+    def iter_text(self, url: str, max_chars: Optional[int] = None,
+                  timings: Optional[Dict] = None) -> Iterator[str]:
+        """Synchronous view of AsyncURLFetcher.iter_text; pieces arrive while the page downloads"""
+        pieces = queue.Queue()
+        finished = object()
+
+        async def pump():
+            try:
+                async for piece in self.fetcher.iter_text(url, max_chars, timings=timings):
+                    pieces.put(piece)
+            except Exception as e:
+                pieces.put(e)
+            finally:
+                pieces.put(finished)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                item = pieces.get()
+                if item is finished:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def fetch_many(self, urls: List[str]) -> List:
+        return self._run(self.fetcher.fetch_many(urls))
+
+    def close(self):
+        if not self.thread.is_alive():
+            return
+        self._run(self.fetcher.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
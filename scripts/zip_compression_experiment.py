@@ -7,16 +7,19 @@ This uses concatenation-based similarity without requiring dictionary training.
 import os
 import json
 import numpy as np
-import zlib
-import gzip
 from collections import defaultdict
 import math
 import argparse
 from pathlib import Path
 
+from compression_engine import (
+    CompressionDistanceEngine, ConcatenationMetric, DeflateCodec, GzipCodec, IncrementalMetric
+)
+
 class ZipCompressionAnalyzer:
-    def __init__(self, data_dir="data/programming_languages"):
+    def __init__(self, data_dir="data/programming_languages", max_workers=None):
         self.data_dir = Path(data_dir)
+        self.max_workers = max_workers
         self.languages = []
         self.language_data = {}
         self.load_languages()
@@ -60,17 +63,7 @@ class ZipCompressionAnalyzer:
                 if lang in self.languages:
                     self.languages.remove(lang)
     
-    def compress_zlib(self, data, level=6):
-        """Compress data using zlib"""
-        data_bytes = data.encode('utf-8') if isinstance(data, str) else data
-        return zlib.compress(data_bytes, level=level)
-    
-    def compress_gzip(self, data, level=6):
-        """Compress data using gzip"""
-        data_bytes = data.encode('utf-8') if isinstance(data, str) else data
-        return gzip.compress(data_bytes, compresslevel=level)
-    
-    def analyze_concatenation_compression(self, compression_func, method_name):
+    def analyze_concatenation_compression(self, codec, method_name):
         """
         Analyze compression similarity using concatenation approach.
         The idea: if lang A and lang B are similar, concatenating A+B should
@@ -87,72 +80,45 @@ class ZipCompressionAnalyzer:
             'distance_matrix': {}
         }
         
-        # First, compress each language individually
-        print("  Compressing individual languages...")
+        # Compress each language individually, then concatenations of all pairs
+        # (truncated to the shorter length for fair comparison)
+        print("  Compressing individual languages and concatenations...")
+        metric = ConcatenationMetric(codec, separator="\n\n", truncate=True)
+        matrix = CompressionDistanceEngine(metric, self.max_workers).run(
+            {lang: self.language_data[lang] for lang in self.languages}
+        )
+        
         for lang in self.languages:
-            try:
-                original_size = len(self.language_data[lang].encode('utf-8'))
-                compressed = compression_func(self.language_data[lang])
-                compressed_size = len(compressed)
-                
-                results['compression_sizes'][lang] = {
-                    'original': original_size,
-                    'compressed': compressed_size,
-                    'ratio': compressed_size / original_size
-                }
-                
-                print(f"    {lang}: {original_size} → {compressed_size} bytes ({compressed_size/original_size:.3f})")
-                
-            except Exception as e:
-                print(f"    Error compressing {lang}: {e}")
+            artifacts = matrix['items'][lang]
+            if 'error' in artifacts:
+                print(f"    Error compressing {lang}: {artifacts['error']}")
+                continue
+            
+            original_size = artifacts['original']
+            compressed_size = artifacts['compressed']
+            
+            results['compression_sizes'][lang] = {
+                'original': original_size,
+                'compressed': compressed_size,
+                'ratio': compressed_size / original_size
+            }
+            
+            print(f"    {lang}: {original_size} → {compressed_size} bytes ({compressed_size/original_size:.3f})")
         
-        # Now test concatenation compression for all pairs
-        print("  Testing concatenation compression...")
         for lang1 in self.languages:
             results['concatenation_sizes'][lang1] = {}
             results['compression_ratios'][lang1] = {}
             
             for lang2 in self.languages:
-                try:
-                    # Truncate to shorter length for fair comparison
-                    data1 = self.language_data[lang1]
-                    data2 = self.language_data[lang2]
-                    
-                    # Find the shorter length and truncate both to that size
-                    min_length = min(len(data1), len(data2))
-                    data1_truncated = data1[:min_length]
-                    data2_truncated = data2[:min_length]
-                    
-                    # Concatenate truncated data
-                    concatenated = data1_truncated + "\n\n" + data2_truncated
-                    concat_original_size = len(concatenated.encode('utf-8'))
-                    concat_compressed = compression_func(concatenated)
-                    concat_compressed_size = len(concat_compressed)
-                    
-                    # Expected size if compressed separately (using truncated data)
-                    compressed1_truncated = compression_func(data1_truncated)
-                    compressed2_truncated = compression_func(data2_truncated)
-                    separate_size = len(compressed1_truncated) + len(compressed2_truncated)
-                    
-                    # Compression benefit ratio: lower is better (more similar)
-                    if separate_size > 0:
-                        benefit_ratio = concat_compressed_size / separate_size
-                    else:
-                        benefit_ratio = 1.0
-                    
-                    results['concatenation_sizes'][lang1][lang2] = {
-                        'concat_original': concat_original_size,
-                        'concat_compressed': concat_compressed_size,
-                        'separate_compressed': separate_size,
-                        'benefit_ratio': benefit_ratio,
-                        'bytes_saved': separate_size - concat_compressed_size
-                    }
-                    
-                    results['compression_ratios'][lang1][lang2] = benefit_ratio
-                    
-                except Exception as e:
-                    print(f"    Error with {lang1}+{lang2}: {e}")
+                entry = matrix['pairs'][lang1][lang2]
+                if 'error' in entry:
+                    print(f"    Error with {lang1}+{lang2}: {entry['error']}")
                     results['compression_ratios'][lang1][lang2] = 1.0
+                    continue
+                
+                # Compression benefit ratio: lower is better (more similar)
+                results['concatenation_sizes'][lang1][lang2] = entry
+                results['compression_ratios'][lang1][lang2] = entry['benefit_ratio']
         
         # Calculate distance matrix using compression ratios
         print("  Calculating distance matrix...")
@@ -177,7 +143,7 @@ class ZipCompressionAnalyzer:
         
         return results
     
-    def analyze_cross_compression(self, compression_func, method_name):
+    def analyze_cross_compression(self, codec, method_name):
         """
         Alternative approach: use each language as a 'prefix' to compress others.
         Similar to dictionary-based compression but simpler.
@@ -192,47 +158,42 @@ class ZipCompressionAnalyzer:
         }
         
         # For each language pair, measure compression when using lang1 as prefix for lang2
+        print("  Compressing every language with every other as context...")
+        metric = IncrementalMetric(codec, separator="\n")
+        matrix = CompressionDistanceEngine(metric, self.max_workers).run(
+            {lang: self.language_data[lang] for lang in self.languages}
+        )
+        
         for lang1 in self.languages:
             results['compression_matrix'][lang1] = {}
             
-            print(f"  Using {lang1} as compression context...")
-            
             for lang2 in self.languages:
-                try:
-                    # Baseline: compress lang2 alone
-                    baseline_compressed = compression_func(self.language_data[lang2])
-                    baseline_size = len(baseline_compressed)
-                    
-                    # With context: compress lang1+lang2 together, measure total size
-                    with_context = self.language_data[lang1] + "\n" + self.language_data[lang2]
-                    context_compressed = compression_func(with_context)
-                    context_size = len(context_compressed)
-                    
-                    # Estimate compression ratio for lang2 with lang1 context
-                    # (This is approximate since we don't subtract lang1's contribution exactly)
-                    lang1_size = len(compression_func(self.language_data[lang1]))
-                    estimated_lang2_with_context = context_size - lang1_size
-                    
-                    # Avoid negative sizes
-                    estimated_lang2_with_context = max(estimated_lang2_with_context, baseline_size * 0.1)
-                    
-                    if baseline_size > 0:
-                        improvement_ratio = estimated_lang2_with_context / baseline_size
-                    else:
-                        improvement_ratio = 1.0
-                    
-                    results['compression_matrix'][lang1][lang2] = {
-                        'baseline_size': baseline_size,
-                        'with_context_size': estimated_lang2_with_context,
-                        'improvement_ratio': improvement_ratio,
-                        'bytes_saved': baseline_size - estimated_lang2_with_context
-                    }
-                    
-                except Exception as e:
-                    print(f"    Error with {lang1}→{lang2}: {e}")
+                entry = matrix['pairs'][lang1][lang2]
+                if 'error' in entry:
+                    print(f"    Error with {lang1}→{lang2}: {entry['error']}")
                     results['compression_matrix'][lang1][lang2] = {
                         'improvement_ratio': 1.0
                     }
+                    continue
+                
+                # Estimate compression ratio for lang2 with lang1 context
+                # (This is approximate since we don't subtract lang1's contribution exactly)
+                baseline_size = entry['baseline']
+                
+                # Avoid negative sizes
+                estimated_lang2_with_context = max(entry['incremental'], baseline_size * 0.1)
+                
+                if baseline_size > 0:
+                    improvement_ratio = estimated_lang2_with_context / baseline_size
+                else:
+                    improvement_ratio = 1.0
+                
+                results['compression_matrix'][lang1][lang2] = {
+                    'baseline_size': baseline_size,
+                    'with_context_size': estimated_lang2_with_context,
+                    'improvement_ratio': improvement_ratio,
+                    'bytes_saved': baseline_size - estimated_lang2_with_context
+                }
         
         # Calculate symmetric distance matrix
         for lang1 in self.languages:
@@ -275,7 +236,7 @@ class ZipCompressionAnalyzer:
         # Zlib concatenation analysis
         try:
             results['zlib_concat'] = self.analyze_concatenation_compression(
-                self.compress_zlib, 'zlib'
+                DeflateCodec(level=6), 'zlib'
             )
         except Exception as e:
             print(f"Zlib concatenation analysis failed: {e}")
@@ -284,7 +245,7 @@ class ZipCompressionAnalyzer:
         # Gzip concatenation analysis
         try:
             results['gzip_concat'] = self.analyze_concatenation_compression(
-                self.compress_gzip, 'gzip'
+                GzipCodec(level=6), 'gzip'
             )
         except Exception as e:
             print(f"Gzip concatenation analysis failed: {e}")
@@ -293,7 +254,7 @@ class ZipCompressionAnalyzer:
         # Zlib cross-compression analysis
         try:
             results['zlib_cross'] = self.analyze_cross_compression(
-                self.compress_zlib, 'zlib'
+                DeflateCodec(level=6), 'zlib'
             )
         except Exception as e:
             print(f"Zlib cross-compression analysis failed: {e}")
@@ -354,10 +315,11 @@ class ZipCompressionAnalyzer:
 def main():
     parser = argparse.ArgumentParser(description='Run ZIP/zlib compression-based language similarity analysis')
     parser.add_argument('--data-dir', default='data/programming_languages', help='Directory containing language data')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for the pairwise compressions (default: CPU count)')
     
     args = parser.parse_args()
     
-    analyzer = ZipCompressionAnalyzer(args.data_dir)
+    analyzer = ZipCompressionAnalyzer(args.data_dir, args.workers)
     results = analyzer.run_full_analysis()
     
     if results:
@@ -7,17 +7,29 @@ This implements proper dictionary training and cross-compression analysis.
 import os
 import json
 import numpy as np
-import zstandard as zstd
 from collections import defaultdict
 import math
 import argparse
 from pathlib import Path
 import tempfile
 
+from compression_engine import CompressionDistanceEngine, DictionaryMetric, ZstdCodec
+from corpus_store import CorpusStore
+from zstd_dictionaries import DEFAULT_SAMPLE_SIZE, DictionaryTrainer, default_cache_dir, language_samples
+
 class ZstdDictionaryAnalyzer:
-    def __init__(self, data_dir="data/programming_languages"):
+    def __init__(self, data_dir="data/programming_languages", max_workers=None,
+                 dict_cache_dir="default", sample_size=DEFAULT_SAMPLE_SIZE):
         self.data_dir = Path(data_dir)
+        self.max_workers = max_workers
+        self.sample_size = sample_size
+        if dict_cache_dir == "default":
+            dict_cache_dir = default_cache_dir()
+        self.trainer = DictionaryTrainer(dict_cache_dir, level=3)
+        self.codec = ZstdCodec(level=3)
+        self.baseline_sizes = {}
         self.languages = []
+        self.corpus = CorpusStore()
         self.language_data = {}
         self.load_languages()
     
@@ -36,11 +48,10 @@ class ZstdDictionaryAnalyzer:
         if not file_path.exists():
             raise FileNotFoundError(f"No data found for language: {language}")
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        return self.corpus.add(language, file_path, errors='strict')
     
     def load_all_language_data(self):
-        """Load all language data into memory"""
+        """Map all language data (encoded once, shared with the pool workers)"""
         print("Loading all language data...")
         for lang in self.languages:
             try:
@@ -52,27 +63,27 @@ class ZstdDictionaryAnalyzer:
                 if lang in self.languages:
                     self.languages.remove(lang)
     
+    def language_samples(self, lang):
+        """Training samples of a language: its per-task files, or fixed-size chunks of its code"""
+        return language_samples(self.data_dir, lang, self.sample_size)
+    
     def train_dictionary(self, samples_data, dict_size=64*1024):
-        """Train a Zstd dictionary from sample data"""
+        """Train a Zstd dictionary from sample data (cached on disk by samples and parameters)"""
         # Convert text data to bytes
-        samples_bytes = [data.encode('utf-8') for data in samples_data]
+        samples_bytes = [data.encode('utf-8') if isinstance(data, str) else data for data in samples_data]
         
-        # Train dictionary using the correct API
-        dict_bytes = zstd.train_dictionary(dict_size, samples_bytes)
-        
-        return dict_bytes
+        return self.trainer.train(samples_bytes, dict_size)
     
     def compress_with_dictionary(self, data, dict_bytes=None):
-        """Compress data with optional dictionary"""
+        """Compress data with optional dictionary (compressors are built once per dictionary)"""
         data_bytes = data.encode('utf-8') if isinstance(data, str) else data
-        
-        if dict_bytes:
-            zstd_dict = zstd.ZstdCompressionDict(dict_bytes)
-            compressor = zstd.ZstdCompressor(dict_data=zstd_dict, level=3)
-        else:
-            compressor = zstd.ZstdCompressor(level=3)
-        
-        return compressor.compress(data_bytes)
+        return self.codec.compressor(dict_bytes).compress(data_bytes)
+    
+    def baseline_size(self, lang):
+        """Compressed size of a language without dictionary, computed once per language"""
+        if lang not in self.baseline_sizes:
+            self.baseline_sizes[lang] = len(self.compress_with_dictionary(self.language_data[lang].encoded, None))
+        return self.baseline_sizes[lang]
     
     def analyze_single_language_dictionaries(self, dict_size=64*1024):
         """
@@ -89,67 +100,66 @@ class ZstdDictionaryAnalyzer:
             'distance_matrix': {}
         }
         
-        # Train dictionary for each language
-        language_dictionaries = {}
+        # Train dictionary for each language (in parallel, or from the cache)
+        print("  Training dictionaries...")
+        trained = self.trainer.train_many(
+            {lang: self.language_samples(lang) for lang in self.languages}, dict_size, self.max_workers
+        )
         
+        language_dictionaries = {}
         for lang in self.languages:
-            print(f"  Training dictionary for {lang}...")
-            try:
-                # Use the language's own data as training sample
-                samples = [self.language_data[lang]]
-                dict_bytes = self.train_dictionary(samples, dict_size)
-                language_dictionaries[lang] = dict_bytes
-                results['dictionary_sizes'][lang] = len(dict_bytes)
-                
-                print(f"    Dictionary size: {len(dict_bytes)} bytes")
-            except Exception as e:
-                print(f"    Error training dictionary for {lang}: {e}")
+            dict_bytes, error = trained[lang]
+            if dict_bytes is None:
+                print(f"    Error training dictionary for {lang}: {error}")
                 continue
+            language_dictionaries[lang] = dict_bytes
+            results['dictionary_sizes'][lang] = len(dict_bytes)
+            print(f"    {lang} dictionary size: {len(dict_bytes)} bytes")
+        
+        # Compress every language with each dictionary
+        print("  Compressing all languages with each dictionary...")
+        metric = DictionaryMetric(self.codec, dictionaries=language_dictionaries)
+        matrix = CompressionDistanceEngine(metric, self.max_workers).run(
+            {lang: self.language_data[lang] for lang in self.languages}
+        )
+        for lang in self.languages:
+            if 'compressed' in matrix['items'][lang]:
+                self.baseline_sizes[lang] = matrix['items'][lang]['compressed']
         
-        # Test compression of each language with each dictionary
+        # Compression of each language with each dictionary
         for dict_lang in language_dictionaries:
             results['compression_matrix'][dict_lang] = {}
             results['compression_ratios'][dict_lang] = {}
             
-            print(f"  Testing {dict_lang} dictionary on all languages...")
+            print(f"  {dict_lang} dictionary on all languages:")
             
             for target_lang in self.languages:
-                try:
-                    # Compress target language with dictionary
-                    original_size = len(self.language_data[target_lang].encode('utf-8'))
-                    compressed = self.compress_with_dictionary(
-                        self.language_data[target_lang], 
-                        language_dictionaries[dict_lang]
-                    )
-                    compressed_size = len(compressed)
-                    
-                    # Also compress without dictionary for baseline
-                    baseline_compressed = self.compress_with_dictionary(
-                        self.language_data[target_lang], 
-                        None
-                    )
-                    baseline_size = len(baseline_compressed)
-                    
-                    # Store results
-                    results['compression_matrix'][dict_lang][target_lang] = compressed_size
-                    
-                    # Compression ratio: smaller is better
-                    ratio = compressed_size / original_size
-                    baseline_ratio = baseline_size / original_size
-                    
-                    results['compression_ratios'][dict_lang][target_lang] = {
-                        'with_dict': ratio,
-                        'without_dict': baseline_ratio,
-                        'improvement': baseline_ratio - ratio,  # Positive means dictionary helped
-                        'original_size': original_size,
-                        'compressed_size': compressed_size,
-                        'baseline_size': baseline_size
-                    }
-                    
-                    print(f"    {target_lang}: {ratio:.3f} (vs {baseline_ratio:.3f} baseline)")
-                    
-                except Exception as e:
-                    print(f"    Error compressing {target_lang} with {dict_lang} dict: {e}")
+                entry = matrix['pairs'][dict_lang][target_lang]
+                if 'error' in entry:
+                    print(f"    Error compressing {target_lang} with {dict_lang} dict: {entry['error']}")
+                    continue
+                
+                original_size = entry['original']
+                compressed_size = entry['with_dict']
+                baseline_size = entry['baseline']
+                
+                # Store results
+                results['compression_matrix'][dict_lang][target_lang] = compressed_size
+                
+                # Compression ratio: smaller is better
+                ratio = compressed_size / original_size
+                baseline_ratio = baseline_size / original_size
+                
+                results['compression_ratios'][dict_lang][target_lang] = {
+                    'with_dict': ratio,
+                    'without_dict': baseline_ratio,
+                    'improvement': baseline_ratio - ratio,  # Positive means dictionary helped
+                    'original_size': original_size,
+                    'compressed_size': compressed_size,
+                    'baseline_size': baseline_size
+                }
+                
+                print(f"    {target_lang}: {ratio:.3f} (vs {baseline_ratio:.3f} baseline)")
         
         # Calculate distance matrix using Normalized Compression Distance (NCD)
         print("  Calculating NCD distance matrix...")
@@ -194,9 +204,9 @@ class ZstdDictionaryAnalyzer:
         """
         print(f"\nAnalyzing universal dictionary (dict size: {dict_size//1024}KB)...")
         
-        # Combine all language data for training
-        all_samples = list(self.language_data.values())
-        print(f"  Training on {len(all_samples)} language samples...")
+        # Combine the samples of all languages for training
+        all_samples = [sample for lang in self.languages for sample in self.language_samples(lang)]
+        print(f"  Training on {len(all_samples)} samples from {len(self.languages)} languages...")
         
         universal_dict = self.train_dictionary(all_samples, dict_size)
         print(f"  Universal dictionary size: {len(universal_dict)} bytes")
@@ -210,15 +220,14 @@ class ZstdDictionaryAnalyzer:
         # Test compression of each language with universal dictionary
         for lang in self.languages:
             try:
-                original_size = len(self.language_data[lang].encode('utf-8'))
+                original_size = len(self.language_data[lang])
                 
                 # Compress with universal dictionary
-                compressed = self.compress_with_dictionary(self.language_data[lang], universal_dict)
+                compressed = self.compress_with_dictionary(self.language_data[lang].encoded, universal_dict)
                 compressed_size = len(compressed)
                 
-                # Compress without dictionary
-                baseline_compressed = self.compress_with_dictionary(self.language_data[lang], None)
-                baseline_size = len(baseline_compressed)
+                # Without dictionary (shared with the single-language analysis)
+                baseline_size = self.baseline_size(lang)
                 
                 ratio = compressed_size / original_size
                 baseline_ratio = baseline_size / original_size
@@ -345,10 +354,17 @@ def main():
     parser.add_argument('--data-dir', default='data/programming_languages', help='Directory containing language data')
     parser.add_argument('--single-dict-size', type=int, default=64*1024, help='Size of single-language dictionaries')
     parser.add_argument('--universal-dict-size', type=int, default=128*1024, help='Size of universal dictionary')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for the pairwise compressions (default: CPU count)')
+    parser.add_argument('--sample-size', type=int, default=DEFAULT_SAMPLE_SIZE,
+                        help='Training sample size for languages without per-task files')
+    parser.add_argument('--dict-cache-dir', default='default',
+                        help='Directory caching trained dictionaries (default: ~/.cache/problens/zstd_dictionaries)')
+    parser.add_argument('--no-dict-cache', action='store_true', help='Always retrain dictionaries')
     
     args = parser.parse_args()
     
-    analyzer = ZstdDictionaryAnalyzer(args.data_dir)
+    dict_cache_dir = None if args.no_dict_cache else args.dict_cache_dir
+    analyzer = ZstdDictionaryAnalyzer(args.data_dir, args.workers, dict_cache_dir, args.sample_size)
     results = analyzer.run_full_analysis(args.single_dict_size, args.universal_dict_size)
     
     if results:
@@ -3,17 +3,19 @@
 Show distance matrices for the three categories analysis
 """
 
-import json
+import sys
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).parent / "scripts"))
+from matrix_artifact import open_results
+
 def load_analysis_data():
-    """Load the analysis results"""
-    data_path = Path("public/data/three_categories_analysis.json")
-    with open(data_path, 'r') as f:
-        return json.load(f)
+    """Load the analysis results (matrix artifact)"""
+    return open_results("public/data/three_categories_analysis.json")
 
-def create_distance_table(distance_matrix, title):
+def create_distance_table(data, matrix_name, title):
     """Create a formatted distance table grouped by category"""
     # Create display names and sort by category
     def get_display_name(item_id):
@@ -32,9 +34,9 @@ def create_distance_table(distance_matrix, title):
         return item_id
     
     # Group items by category for better organization
-    countries = [item for item in distance_matrix.keys() if item.startswith('country_')]
-    fruits = [item for item in distance_matrix.keys() if item.startswith('fruit_')]
-    animals = [item for item in distance_matrix.keys() if item.startswith('animal_')]
+    countries = [item for item in data.ids if item.startswith('country_')]
+    fruits = [item for item in data.ids if item.startswith('fruit_')]
+    animals = [item for item in data.ids if item.startswith('animal_')]
     
     # Sort within each category
     countries.sort()
@@ -45,8 +47,7 @@ def create_distance_table(distance_matrix, title):
     ordered_items = countries + fruits + animals
     
     # Create DataFrame with ordered rows and columns
-    df = pd.DataFrame(distance_matrix)
-    df = df.reindex(index=ordered_items, columns=ordered_items)
+    df = pd.DataFrame(data.submatrix(matrix_name, ordered_items), index=ordered_items, columns=ordered_items)
     
     # Rename columns and index with display names
     df.columns = [get_display_name(col) for col in df.columns]
@@ -77,32 +78,25 @@ def save_tables_to_file(data, output_file):
     print("============================================")
     
     # KL Divergence Matrix
-    kl_matrix = data['kl_analysis']['baseline']['distance_matrix']
-    create_distance_table(kl_matrix, "KL DIVERGENCE MATRIX")
+    create_distance_table(data, 'kl_analysis.baseline', "KL DIVERGENCE MATRIX")
     
     # Generalized Divergence Matrix  
-    gen_div_matrix = data['generalized_divergence_analysis']['distance_matrix']
-    create_distance_table(gen_div_matrix, "GENERALIZED DIVERGENCE MATRIX (bits/char)")
+    create_distance_table(data, 'generalized_divergence_analysis', "GENERALIZED DIVERGENCE MATRIX (bits/char)")
     
     # Summary statistics
     print("\nSUMMARY STATISTICS")
     print("==================")
     
-    # Calculate some basic stats
-    kl_values = []
-    gen_div_values = []
-    
-    items = list(kl_matrix.keys())
-    for i, item1 in enumerate(items):
-        for j, item2 in enumerate(items):
-            if i < j:  # Only upper triangle to avoid duplicates
-                kl_values.append(kl_matrix[item1][item2])
-                gen_div_values.append(gen_div_matrix[item1][item2])
-    
-    print(f"Total items analyzed: {data['metadata']['total_items']}")
-    print(f"Countries: {data['metadata']['countries']}")
-    print(f"Fruits: {data['metadata']['fruits']}")
-    print(f"Animals: {data['metadata']['animals']}")
+    # Calculate some basic stats (upper triangle only, to avoid duplicates)
+    items = data.ids
+    upper = np.triu_indices(len(items), 1)
+    kl_values = data.matrix('kl_analysis.baseline')[upper].tolist()
+    gen_div_values = data.matrix('generalized_divergence_analysis')[upper].tolist()
+    
+    print(f"Total items analyzed: {data.metadata['total_items']}")
+    print(f"Countries: {data.metadata['countries']}")
+    print(f"Fruits: {data.metadata['fruits']}")
+    print(f"Animals: {data.metadata['animals']}")
     print()
     
     print("KL Divergence:")
@@ -116,14 +110,9 @@ def save_tables_to_file(data, output_file):
     print()
     
     # Show most similar and most different pairs
-    kl_with_pairs = []
-    gen_div_with_pairs = []
-    
-    for i, item1 in enumerate(items):
-        for j, item2 in enumerate(items):
-            if i < j:  # Only upper triangle to avoid duplicates
-                kl_with_pairs.append((kl_matrix[item1][item2], item1, item2))
-                gen_div_with_pairs.append((gen_div_matrix[item1][item2], item1, item2))
+    pairs = [(items[i], items[j]) for i, j in zip(*upper)]
+    kl_with_pairs = [(dist, item1, item2) for dist, (item1, item2) in zip(kl_values, pairs)]
+    gen_div_with_pairs = [(dist, item1, item2) for dist, (item1, item2) in zip(gen_div_values, pairs)]
     
     kl_with_pairs.sort()
     gen_div_with_pairs.sort()